@@ -0,0 +1,87 @@
+"""
+Benchmark: full decode vs. fast decode (EXIF thumbnail / 1/8 JPEG draft) for pHash.
+Reports throughput and how well the fast hashes agree with the full-decode hashes.
+
+Usage: python benchmarks/bench_decode.py [FOLDER] [--limit N]
+Without FOLDER a few synthetic 24 MP JPEGs are generated in a temp folder.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import imagehash  # noqa: E402
+from PIL import Image, ImageDraw, ImageFilter  # noqa: E402
+
+from logic import open_for_phash, phash_to_int, ImageScanner  # noqa: E402
+from hashindex import hamming_distance  # noqa: E402
+
+
+def make_jpegs(folder, count=8, size=(6000, 4000), seed=7):
+    """Smooth random shapes (photo-like frequency content), saved as JPEG."""
+    rnd = random.Random(seed)
+    paths = []
+    for i in range(count):
+        img = Image.new("RGB", (size[0] // 4, size[1] // 4), tuple(rnd.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(img)
+        for _ in range(40):
+            x, y = rnd.randrange(img.width), rnd.randrange(img.height)
+            r = rnd.randrange(20, img.width // 3)
+            draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(rnd.randrange(256) for _ in range(3)))
+        img = img.filter(ImageFilter.GaussianBlur(6)).resize(size, Image.BICUBIC)
+        path = os.path.join(folder, f"synthetic_{i}.jpg")
+        img.save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+def hash_all(paths, fast_decode):
+    hashes = []
+    t0 = time.perf_counter()
+    for path in paths:
+        with open_for_phash(path, fast_decode) as img:
+            hashes.append(phash_to_int(imagehash.phash(img)))
+    return time.perf_counter() - t0, hashes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("folder", nargs="?")
+    parser.add_argument("--limit", type=int, default=200)
+    args = parser.parse_args()
+
+    tmp = None
+    if args.folder:
+        paths = [p for p in ImageScanner().find_images(args.folder)
+                 if os.path.splitext(p)[1].lower() in (".jpg", ".jpeg")][:args.limit]
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        print("Generating synthetic JPEGs...")
+        paths = make_jpegs(tmp.name)
+
+    if not paths:
+        print("No JPEG files found.")
+        return
+
+    t_full, full = hash_all(paths, fast_decode=False)
+    t_fast, fast = hash_all(paths, fast_decode=True)
+
+    dists = [hamming_distance(a, b) for a, b in zip(full, fast)]
+    n = len(paths)
+    print(f"files: {n}")
+    print(f"full decode: {n / t_full:8.2f} files/s")
+    print(f"fast decode: {n / t_fast:8.2f} files/s  ({t_full / t_fast:.1f}x)")
+    print(f"hash agreement: identical {sum(d == 0 for d in dists) / n:.1%}, "
+          f"<=2 bits {sum(d <= 2 for d in dists) / n:.1%}, "
+          f"<=6 bits {sum(d <= 6 for d in dists) / n:.1%}, max {max(dists)} bits")
+
+    if tmp:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
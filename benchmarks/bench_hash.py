@@ -0,0 +1,68 @@
+"""
+Benchmark: content-hash backends used for exact matching.
+Reports bytes/sec for every backend available here (md5, blake2b, and
+xxh128 / blake3 when the optional packages are installed).
+
+Usage: python benchmarks/bench_hash.py [FILE ...] [--size-mb N] [--repeat N]
+Without FILE an in-memory random buffer is hashed (pure hashing speed, no I/O).
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logic import available_hash_algorithms, new_hasher  # noqa: E402
+
+BLOCK = 65536
+
+
+def hash_buffer(algorithm, data):
+    hasher = new_hasher(algorithm)
+    view = memoryview(data)
+    for start in range(0, len(view), BLOCK):
+        hasher.update(view[start:start + BLOCK])
+    return hasher.digest()
+
+
+def hash_files(algorithm, paths):
+    for path in paths:
+        hasher = new_hasher(algorithm)
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(BLOCK), b''):
+                hasher.update(block)
+        hasher.digest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.files:
+        total = sum(os.path.getsize(p) for p in args.files)
+        run = lambda algo: hash_files(algo, args.files)  # noqa: E731
+        source = f"{len(args.files)} file(s)"
+    else:
+        data = os.urandom(args.size_mb * 1024 * 1024)
+        total = len(data)
+        run = lambda algo: hash_buffer(algo, data)  # noqa: E731
+        source = "in-memory buffer"
+
+    print(f"{source}, {total / 1e6:.1f} MB, best of {args.repeat}")
+    print(f"{'algorithm':<10} {'seconds':>9} {'MB/s':>10}")
+    for algo in available_hash_algorithms():
+        best = None
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            run(algo)
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{algo:<10} {best:>9.3f} {total / best / 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark: near-duplicate search over 64-bit pHashes.
+Compares the old all-pairs loop ('linear') with the BK-tree, multi-index hashing
+and the vectorized NumPy kernel, plus a full tiled self-compare ('numpy-tiled').
+
+Usage: python benchmarks/bench_index.py [N ...] [--threshold 0.9]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hashindex import build_index, pack_hashes, search_pairs, threshold_to_radius, INDEX_TYPES  # noqa: E402
+
+
+def make_hashes(n, seed=42, dup_ratio=0.1, max_flips=8):
+    """Random hashes plus a share of near-duplicates (a few flipped bits)."""
+    rnd = random.Random(seed)
+    hashes = [rnd.getrandbits(64) for _ in range(n)]
+    for i in range(int(n * dup_ratio)):
+        h = hashes[rnd.randrange(n)]
+        for _ in range(rnd.randint(0, max_flips)):
+            h ^= 1 << rnd.randrange(64)
+        hashes[rnd.randrange(n)] = h
+    return hashes
+
+
+def run(index_type, hashes, radius, max_queries):
+    t0 = time.perf_counter()
+    index = build_index(index_type, ((h, j) for j, h in enumerate(hashes)))
+    t_build = time.perf_counter() - t0
+
+    queries = hashes[:max_queries]
+    t0 = time.perf_counter()
+    pairs = 0
+    for h in queries:
+        pairs += len(index.query(h, radius))
+    t_query = time.perf_counter() - t0
+    return t_build, t_query, len(queries), pairs
+
+
+def run_tiled(hashes, radius):
+    """Exhaustive self-compare through the tiled XOR/popcount kernel (measured, not extrapolated)."""
+    t0 = time.perf_counter()
+    pairs = sum(len(p) for _, p in search_pairs('numpy', pack_hashes(hashes), None, radius, self_compare=True))
+    return time.perf_counter() - t0, pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("sizes", nargs="*", type=int, default=[10000, 50000, 200000])
+    parser.add_argument("--threshold", type=float, default=0.90)
+    parser.add_argument("--queries", type=int, default=2000, help="queries timed per run (extrapolated to N)")
+    args = parser.parse_args()
+
+    radius = threshold_to_radius(args.threshold)
+    print(f"threshold={args.threshold} -> radius={radius}")
+    print(f"{'N':>8} {'index':>8} {'build s':>9} {'query ms':>9} {'est. full s':>12} {'speedup':>8}")
+
+    for n in args.sizes:
+        hashes = make_hashes(n)
+        baseline = None
+        found = {}
+        for index_type in INDEX_TYPES:
+            t_build, t_query, nq, pairs = run(index_type, hashes, radius, args.queries)
+            est_full = t_build + t_query / nq * n
+            if baseline is None:
+                baseline = est_full
+            found[index_type] = pairs
+            print(f"{n:>8} {index_type:>8} {t_build:>9.3f} {t_query / nq * 1000:>9.3f} "
+                  f"{est_full:>12.1f} {baseline / est_full:>7.1f}x")
+        t_tiled, tiled_pairs = run_tiled(hashes, radius)
+        print(f"{n:>8} {'numpy-tiled':>8} {'-':>9} {'-':>9} {t_tiled:>12.1f} {baseline / t_tiled:>7.1f}x"
+              f"  ({tiled_pairs} pairs)")
+        if len(set(found.values())) != 1:
+            print(f"  !! result mismatch between indexes: {found}")
+
+
+if __name__ == "__main__":
+    main()
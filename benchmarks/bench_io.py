@@ -0,0 +1,71 @@
+"""
+Benchmark: bytes read per image with separate digest + pHash reads vs. single-read hashing.
+Runs process_file_hashes in this process and measures what the OS actually
+delivered (rchar in /proc/self/io, Linux only), plus the wall time.
+
+Usage: python benchmarks/bench_io.py [FOLDER] [--limit N]
+Without FOLDER a few synthetic 24 MP JPEGs are generated in a temp folder.
+Note: rchar counts bytes handed to the process, page cache hits included;
+drop caches (or use a network share) to see the cold-cache wall-time effect.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logic import ImageScanner, process_file_hashes  # noqa: E402
+from bench_decode import make_jpegs  # noqa: E402
+
+
+def read_bytes():
+    """Bytes read by this process so far, or None where /proc/self/io is missing."""
+    try:
+        with open('/proc/self/io') as f:
+            for line in f:
+                if line.startswith('rchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def run(paths, single_read):
+    before = read_bytes()
+    t0 = time.perf_counter()
+    for path in paths:
+        process_file_hashes((path, True, True, False, 'md5', single_read))
+    elapsed = time.perf_counter() - t0
+    after = read_bytes()
+    return elapsed, (after - before) if before is not None else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("folder", nargs="?")
+    parser.add_argument("--limit", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.folder:
+        paths = ImageScanner().find_images(args.folder)[:args.limit]
+    else:
+        tmp = tempfile.mkdtemp(prefix="bench_io_")
+        print(f"Generating synthetic JPEGs in {tmp} ...")
+        paths = make_jpegs(tmp)
+    if not paths:
+        print("No images found.")
+        return
+
+    on_disk = sum(os.path.getsize(p) for p in paths)
+    print(f"{len(paths)} images, {on_disk / len(paths) / 1e6:.2f} MB average on disk")
+    print(f"{'mode':<12} {'seconds':>9} {'MB read / image':>16}")
+    for label, single_read in (("two reads", False), ("single read", True)):
+        elapsed, nbytes = run(paths, single_read)
+        per_image = f"{nbytes / len(paths) / 1e6:.2f}" if nbytes is not None else "n/a"
+        print(f"{label:<12} {elapsed:>9.3f} {per_image:>16}")
+
+
+if __name__ == "__main__":
+    main()
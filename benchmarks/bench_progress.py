@@ -0,0 +1,56 @@
+"""
+Benchmark: cost of progress reporting inside the scanner.
+Times ImageScanner._report per call with no consumer, with a ProgressChannel
+(what the GUI uses) and with a callback (what the CLI uses), plus the cost of
+one snapshot() as done by the GUI poll.
+
+Usage: python benchmarks/bench_progress.py [--calls N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logic import ImageScanner  # noqa: E402
+from progress import ProgressChannel  # noqa: E402
+
+
+def per_call_ns(func, calls):
+    t0 = time.perf_counter()
+    for i in range(calls):
+        func(i)
+    return (time.perf_counter() - t0) / calls * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+    calls = args.calls
+
+    baseline = per_call_ns(lambda i: None, calls)
+
+    scanner = ImageScanner()
+    silent = per_call_ns(lambda i: scanner._report("status_analyzing", i, calls), calls)
+
+    channel = ProgressChannel()
+    scanner = ImageScanner(progress=channel)
+    published = per_call_ns(lambda i: scanner._report("status_analyzing", i, calls), calls)
+
+    delivered = []
+    scanner = ImageScanner(callback_progress=lambda current, total, message: delivered.append(current))
+    callback = per_call_ns(lambda i: scanner._report("status_analyzing", i, calls), calls)
+
+    snapshot = per_call_ns(lambda i: channel.snapshot(), calls)
+
+    print(f"{'empty loop':<28} {baseline:>8.0f} ns/call")
+    print(f"{'_report, no consumer':<28} {silent - baseline:>8.0f} ns/call (over the empty loop)")
+    print(f"{'_report, ProgressChannel':<28} {published - baseline:>8.0f} ns/call")
+    print(f"{'_report, callback':<28} {callback - baseline:>8.0f} ns/call ({len(delivered)} of {calls} delivered)")
+    print(f"{'snapshot()':<28} {snapshot - baseline:>8.0f} ns/call")
+
+
+if __name__ == "__main__":
+    main()
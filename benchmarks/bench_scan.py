@@ -0,0 +1,202 @@
+"""
+Benchmark: end-to-end scan and compare on a synthetic corpus with known duplicates.
+Times find_images, scan_folders_parallel and compare_folders separately and
+reports files/s, MB/s, peak RSS and precision / recall against the ground
+truth. Results are printed and optionally saved as JSON so runs can be
+compared over time (see --output / --compare).
+
+Usage: python benchmarks/bench_scan.py [--corpus DIR] [--output results.json] [--compare old.json]
+       [corpus options, see benchmarks/corpus.py] [--threshold 0.9] [--workers N] [--read-threads N]
+       [--hash md5] [--fast-decode] [--streaming] [--exact-only] [--cascade dhash,phash,whash]
+       [--rotation-invariant]
+Without --corpus a corpus is generated in a temp folder (reused if DIR/truth.json exists).
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from logic import ImageScanner, DEFAULT_HASH_ALGORITHM, HASH_ALGORITHMS, DEFAULT_CASCADE  # noqa: E402
+from corpus import generate_corpus, add_corpus_args, corpus_kwargs  # noqa: E402
+
+
+def peak_rss_mb():
+    """(this process, largest child process) peak resident set size in MB, or None."""
+    if resource is None:
+        return None, None
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / 1e6
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit / 1e6
+    return round(own, 1), round(children, 1)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except Exception:
+        return None
+
+
+def timed(name, files, nbytes, func):
+    t0 = time.perf_counter()
+    cpu0 = time.process_time()
+    result = func()
+    elapsed = time.perf_counter() - t0
+    own, children = peak_rss_mb()
+    phase = {
+        'phase': name,
+        'seconds': round(elapsed, 4),
+        'cpu_seconds_main': round(time.process_time() - cpu0, 4),
+        'files_per_s': round(files / elapsed, 1) if elapsed else None,
+        'mb_per_s': round(nbytes / elapsed / 1e6, 2) if elapsed else None,
+        'peak_rss_mb': own,
+        'peak_rss_children_mb': children,
+    }
+    return phase, result
+
+
+def score(matches, truth, folder_a):
+    """Precision / recall over (A file, B file) pairs; exact groups count every A x B member pair."""
+    expected = {(a, b) for a, b, _ in truth['pairs']}
+    kind_of = {(a, b): kind for a, b, kind in truth['pairs']}
+
+    predicted = set()
+    for m in matches:
+        group = m.get('group')
+        if group:
+            members_a = [p for p in group if p.startswith(folder_a + os.sep)]
+            members_b = [p for p in group if not p.startswith(folder_a + os.sep)]
+            predicted.update((a, b) for a in members_a for b in members_b)
+        else:
+            predicted.add((m['file_a'], m['file_b']))
+
+    hits = predicted & expected
+    result = {
+        'predicted_pairs': len(predicted),
+        'expected_pairs': len(expected),
+        'true_positives': len(hits),
+        'precision': round(len(hits) / len(predicted), 4) if predicted else 1.0,
+        'recall': round(len(hits) / len(expected), 4) if expected else 1.0,
+        'recall_by_kind': {},
+    }
+    for kind in sorted(set(kind_of.values())):
+        wanted = [p for p, k in kind_of.items() if k == kind]
+        result['recall_by_kind'][kind] = round(sum(p in hits for p in wanted) / len(wanted), 4)
+    return result
+
+
+def print_report(report, previous=None):
+    old = {p['phase']: p for p in previous['phases']} if previous else {}
+    print(f"{'phase':<22} {'seconds':>9} {'files/s':>10} {'MB/s':>9} {'RSS MB':>8} {'child MB':>9}")
+    for p in report['phases']:
+        line = (f"{p['phase']:<22} {p['seconds']:>9.3f} {p['files_per_s'] or 0:>10.1f} "
+                f"{p['mb_per_s'] or 0:>9.2f} {p['peak_rss_mb'] or 0:>8.1f} {p['peak_rss_children_mb'] or 0:>9.1f}")
+        if p['phase'] in old and old[p['phase']]['seconds']:
+            line += f"   ({p['seconds'] / old[p['phase']]['seconds']:.2f}x vs. previous)"
+        print(line)
+    acc = report['accuracy']
+    print(f"precision {acc['precision']:.3f}  recall {acc['recall']:.3f}  "
+          + "  ".join(f"{k}: {v:.2f}" for k, v in acc['recall_by_kind'].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Corpus folder (generated here if it has no truth.json)")
+    parser.add_argument("--output", help="Save the results as JSON")
+    parser.add_argument("--compare", help="Previous results JSON to compare timings with")
+    parser.add_argument("--threshold", type=float, default=0.90)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--read-threads", type=int, default=0,
+                        help="Read-ahead threads in front of the hashing processes (0: workers read)")
+    parser.add_argument("--hash", default=DEFAULT_HASH_ALGORITHM, choices=HASH_ALGORITHMS)
+    parser.add_argument("--fast-decode", action="store_true")
+    parser.add_argument("--streaming", action="store_true")
+    parser.add_argument("--exact-only", action="store_true")
+    parser.add_argument("--cascade", type=lambda text: tuple(text.split(",")), default=DEFAULT_CASCADE,
+                        help="Similarity hash cascade, e.g. dhash,phash,whash")
+    parser.add_argument("--rotation-invariant", action="store_true",
+                        help="Also match rotated / mirrored copies (8 pHash orientations per file)")
+    add_corpus_args(parser)
+    args = parser.parse_args()
+
+    root = args.corpus or os.path.join(tempfile.gettempdir(), f"photo_comparator_corpus_{args.seed}")
+    truth_path = os.path.join(root, "truth.json")
+    if os.path.exists(truth_path):
+        with open(truth_path, encoding="utf-8") as f:
+            truth = json.load(f)
+        print(f"Using corpus in {root}")
+    else:
+        print(f"Generating corpus in {root} ...")
+        truth = generate_corpus(root, **corpus_kwargs(args))
+
+    folder_a, folder_b = os.path.join(root, "a"), os.path.join(root, "b")
+    scanner = ImageScanner(workers=args.workers, read_threads=args.read_threads, hash_algorithm=args.hash,
+                           fast_decode=args.fast_decode, streaming=args.streaming, cascade=args.cascade,
+                           rotation_invariant=args.rotation_invariant)
+    check_similar = not args.exact_only
+
+    phases = []
+    phase, found = timed("find_images", 0, 0,
+                         lambda: scanner.find_images(folder_a) + scanner.find_images(folder_b))
+    files = len(found)
+    nbytes = sum(os.path.getsize(p) for p in found)
+    phase['files_per_s'] = round(files / phase['seconds'], 1) if phase['seconds'] else None
+    phase['mb_per_s'] = None  # Nothing is read while walking
+    phases.append(phase)
+
+    phase, _ = timed("scan_folders_parallel", files, nbytes,
+                     lambda: scanner.scan_folders_parallel([folder_a, folder_b], use_phash=check_similar))
+    phases.append(phase)
+
+    phase, (matches, unique) = timed("compare_folders", files, nbytes,
+                                     lambda: scanner.compare_folders([folder_a], [folder_b],
+                                                                     threshold=args.threshold,
+                                                                     check_similar=check_similar))
+    phases.append(phase)
+
+    report = {
+        'timestamp': datetime.datetime.now().isoformat(timespec="seconds"),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'corpus': {'root': root, 'files': files, 'megabytes': round(nbytes / 1e6, 2),
+                   'params': truth.get('params')},
+        'settings': {'threshold': args.threshold, 'workers': args.workers, 'read_threads': args.read_threads,
+                     'hash': args.hash, 'fast_decode': args.fast_decode, 'streaming': args.streaming, 'exact_only': args.exact_only,
+                     'cascade': list(args.cascade), 'rotation_invariant': args.rotation_invariant},
+        'phases': phases,
+        'exact_stats': scanner.exact_stats,
+        'accuracy': score(matches, truth, folder_a),
+        'unique_reported': len(unique),
+        'metrics': scanner.metrics.to_dict(),
+    }
+
+    previous = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+    print_report(report, previous)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
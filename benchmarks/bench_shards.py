@@ -0,0 +1,113 @@
+"""
+Benchmark: sharded library build, run locally.
+Starts K `python -m cli --build-library PART --shard I/K` processes side by
+side on the corpus archive (group B), merges the parts with --merge and checks
+the result against a single-process build: same rows, same hashes, and the
+same matches when group A is compared against either library.
+
+Usage: python benchmarks/bench_shards.py [--corpus DIR] [--shards K] [--workers N]
+       [corpus options, see benchmarks/corpus.py]
+Without --corpus a corpus is generated in a temp folder (reused if DIR/truth.json exists).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from logic import ImageScanner  # noqa: E402
+from corpus import generate_corpus, add_corpus_args, corpus_kwargs  # noqa: E402
+
+
+def cli(*args):
+    return subprocess.Popen([sys.executable, "-m", "cli", "-q"] + list(args), cwd=ROOT)
+
+
+def wait_all(procs):
+    codes = [p.wait() for p in procs]
+    failed = [code for code in codes if code not in (0, 1)]
+    if failed:
+        sys.exit(f"cli exited with {failed}")
+
+
+def rows(store):
+    """Order-independent content of a library: path -> (size, digest, pHash, extra hashes)."""
+    return {rec.path: (rec.size, rec.digest, rec.phash, tuple(store.hash(name, rec.row) for name in store.extra_hashes))
+            for rec in store}
+
+
+def normalize(matches):
+    return sorted((m['type'], tuple(sorted(m.get('group') or (m['file_a'], m['file_b'])))) for m in matches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Corpus folder (generated here if it has no truth.json)")
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--workers", type=int, help="Hashing processes per shard (default: CPU count / shards)")
+    add_corpus_args(parser)
+    args = parser.parse_args()
+
+    root = args.corpus or os.path.join(tempfile.gettempdir(), f"photo_comparator_corpus_{args.seed}")
+    if os.path.exists(os.path.join(root, "truth.json")):
+        print(f"Using corpus in {root}")
+    else:
+        print(f"Generating corpus in {root} ...")
+        generate_corpus(root, **corpus_kwargs(args))
+    folder_a, folder_b = os.path.join(root, "a"), os.path.join(root, "b")
+    k = args.shards
+    workers = args.workers or max(1, (os.cpu_count() or 1) // k)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        parts = [os.path.join(tmp, f"part{i}.idx") for i in range(k)]
+        merged_path = os.path.join(tmp, "merged.idx")
+        single_path = os.path.join(tmp, "single.idx")
+
+        t0 = time.perf_counter()
+        wait_all([cli("-b", folder_b, "--build-library", part, "--shard", f"{i}/{k}", "--workers", str(workers))
+                  for i, part in enumerate(parts)])
+        t_shards = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        wait_all([cli("--build-library", merged_path, "--merge", *parts)])
+        t_merge = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        wait_all([cli("-b", folder_b, "--build-library", single_path, "--workers", str(workers * k))])
+        t_single = time.perf_counter() - t0
+
+        scanner = ImageScanner(workers=workers * k)
+        merged, single = scanner.load_library(merged_path), scanner.load_library(single_path)
+        part_sizes = []
+        for part in parts:
+            store = scanner.load_library(part)
+            part_sizes.append(len(store))
+            store.close()
+        same_rows = rows(merged) == rows(single)
+        with_merged, _ = scanner.compare_folders([folder_a], [], library=merged)
+        with_single, _ = scanner.compare_folders([folder_a], [], library=single)
+        same_matches = normalize(with_merged) == normalize(with_single)
+        merged.close()
+        single.close()
+
+    report = {
+        'shards': k,
+        'workers_per_shard': workers,
+        'files_per_shard': part_sizes,
+        'seconds': {'shards': round(t_shards, 3), 'merge': round(t_merge, 3), 'single': round(t_single, 3)},
+        'identical_rows': same_rows,
+        'identical_matches': same_matches,
+        'matches': len(with_merged),
+    }
+    print(json.dumps(report, indent=2))
+    if not (same_rows and same_matches):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Synthetic image corpus with known ground truth for the benchmarks.
+
+Layout under ROOT:
+  b/          originals (the "archive")
+  a/          incoming batch: exact copies, resized, recompressed and cropped
+              versions of some originals, plus unique images
+  truth.json  {"pairs": [[a_path, b_path, kind], ...], "unique": [a_path, ...]}
+
+Usage: python benchmarks/corpus.py ROOT [--originals N] [--exact N] [--resized N]
+       [--recompressed N] [--cropped N] [--unique N] [--size WxH] [--seed S]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+
+from PIL import Image, ImageDraw, ImageFilter
+
+KINDS = ('exact', 'resized', 'recompressed', 'cropped')
+
+
+def make_image(rnd, size):
+    """Smooth random shapes (photo-like frequency content)."""
+    small = (max(16, size[0] // 4), max(16, size[1] // 4))
+    img = Image.new("RGB", small, tuple(rnd.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(40):
+        x, y = rnd.randrange(small[0]), rnd.randrange(small[1])
+        r = rnd.randrange(4, max(5, small[0] // 3))
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(rnd.randrange(256) for _ in range(3)))
+    return img.filter(ImageFilter.GaussianBlur(3)).resize(size, Image.BICUBIC)
+
+
+def derive(kind, src_path, dst_path, rnd):
+    """Write a near-duplicate (or exact copy) of src_path."""
+    if kind == 'exact':
+        shutil.copyfile(src_path, dst_path)
+        return
+    with Image.open(src_path) as img:
+        img = img.convert("RGB")
+        if kind == 'resized':
+            scale = rnd.uniform(0.4, 0.8)
+            img = img.resize((max(8, int(img.width * scale)), max(8, int(img.height * scale))), Image.LANCZOS)
+            img.save(dst_path, quality=90)
+        elif kind == 'recompressed':
+            img.save(dst_path, quality=rnd.randint(40, 70))
+        elif kind == 'cropped':
+            dx, dy = int(img.width * rnd.uniform(0.02, 0.05)), int(img.height * rnd.uniform(0.02, 0.05))
+            img.crop((dx, dy, img.width - dx, img.height - dy)).save(dst_path, quality=90)
+
+
+def generate_corpus(root, originals=200, exact=40, resized=40, recompressed=40, cropped=40, unique=100,
+                    size=(1024, 768), seed=1):
+    """
+    Build the corpus (see module docstring) and return the truth dict.
+    Derived images are taken from distinct originals, so each A file has at
+    most one true partner in B.
+    """
+    counts = {'exact': exact, 'resized': resized, 'recompressed': recompressed, 'cropped': cropped}
+    if sum(counts.values()) > originals:
+        raise ValueError("Not enough originals for the requested duplicates")
+
+    rnd = random.Random(seed)
+    dir_a, dir_b = os.path.join(root, "a"), os.path.join(root, "b")
+    os.makedirs(dir_a, exist_ok=True)
+    os.makedirs(dir_b, exist_ok=True)
+
+    b_paths = []
+    for i in range(originals):
+        path = os.path.join(dir_b, f"sub{i % 10}", f"orig_{i:06d}.jpg")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        make_image(rnd, size).save(path, quality=90)
+        b_paths.append(path)
+
+    pairs = []
+    sources = iter(rnd.sample(b_paths, sum(counts.values())))
+    for kind in KINDS:
+        for i in range(counts[kind]):
+            src = next(sources)
+            dst = os.path.join(dir_a, f"{kind}_{i:06d}.jpg")
+            derive(kind, src, dst, rnd)
+            pairs.append([dst, src, kind])
+
+    unique_paths = []
+    for i in range(unique):
+        path = os.path.join(dir_a, f"unique_{i:06d}.jpg")
+        make_image(rnd, size).save(path, quality=90)
+        unique_paths.append(path)
+
+    truth = {'pairs': pairs, 'unique': unique_paths,
+             'params': dict(counts, originals=originals, unique=unique, size=list(size), seed=seed)}
+    with open(os.path.join(root, "truth.json"), "w", encoding="utf-8") as f:
+        json.dump(truth, f, indent=1)
+    return truth
+
+
+def parse_size(text):
+    w, h = text.lower().split("x")
+    return int(w), int(h)
+
+
+def add_corpus_args(parser):
+    parser.add_argument("--originals", type=int, default=200)
+    parser.add_argument("--exact", type=int, default=40)
+    parser.add_argument("--resized", type=int, default=40)
+    parser.add_argument("--recompressed", type=int, default=40)
+    parser.add_argument("--cropped", type=int, default=40)
+    parser.add_argument("--unique", type=int, default=100)
+    parser.add_argument("--size", type=parse_size, default=(1024, 768), metavar="WxH")
+    parser.add_argument("--seed", type=int, default=1)
+
+
+def corpus_kwargs(args):
+    return dict(originals=args.originals, exact=args.exact, resized=args.resized, recompressed=args.recompressed,
+                cropped=args.cropped, unique=args.unique, size=args.size, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root")
+    add_corpus_args(parser)
+    args = parser.parse_args()
+    truth = generate_corpus(args.root, **corpus_kwargs(args))
+    print(f"{len(truth['pairs'])} duplicate pairs, {len(truth['unique'])} unique images in {args.root}")
+
+
+if __name__ == "__main__":
+    main()
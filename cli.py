@@ -0,0 +1,314 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+
+import logic
+from hashindex import INDEX_TYPES
+from incremental import IncrementalScanner, POLL_INTERVAL
+
+# Copyright (c) 2025 Photo Comparator. All rights reserved.
+# Licensed under the MIT License. See LICENSE file in the project root for full license information.
+
+# Headless entry point: python -m cli -a FOLDER [...] [-b FOLDER ...]
+# Never imports tkinter / customtkinter, so it runs on servers without a display.
+
+# Exit codes
+EXIT_NO_MATCHES = 0     # Finished, no duplicates / similar images found
+EXIT_MATCHES = 1        # Finished, at least one match written
+EXIT_USAGE = 2          # Bad arguments or missing folders (argparse uses 2 as well)
+EXIT_ERROR = 3          # The scan failed
+EXIT_INTERRUPTED = 130  # Stopped with Ctrl+C
+EXIT_BROKEN_PIPE = 141  # The reader of stdout went away (e.g. piped into head), like a shell on SIGPIPE
+
+CSV_FIELDS = ['kind', 'type', 'score', 'file_a', 'file_b', 'group', 'orientation']
+
+
+class NdjsonWriter:
+    """
+    One JSON object per line: {"kind": "match", ...} or {"kind": "unique", "path": ...}.
+    Watch mode adds {"kind": "removed", ...} for matches that no longer hold.
+    """
+
+    def __init__(self, out):
+        self.out = out
+
+    def match(self, match):
+        self._write(dict(kind='match', **match))
+
+    def removed(self, match):
+        self._write(dict(kind='removed', **match))
+
+    def unique(self, path):
+        self._write({'kind': 'unique', 'path': path})
+
+    def _write(self, obj):
+        self.out.write(json.dumps(obj, ensure_ascii=False) + "\n")
+        self.out.flush()
+
+
+class CsvWriter:
+    """CSV with CSV_FIELDS columns; group members are joined with '|', unique rows only fill file_a."""
+
+    def __init__(self, out):
+        self.out = out
+        self.writer = csv.writer(out)
+        self.writer.writerow(CSV_FIELDS)
+
+    def match(self, match, kind='match'):
+        self.writer.writerow([kind, match['type'], match['score'], match['file_a'], match['file_b'],
+                              "|".join(match.get('group', [])), match.get('orientation', '')])
+        self.out.flush()
+
+    def removed(self, match):
+        self.match(match, kind='removed')
+
+    def unique(self, path):
+        self.writer.writerow(['unique', '', '', path, '', '', ''])
+        self.out.flush()
+
+
+WRITERS = {'ndjson': NdjsonWriter, 'csv': CsvWriter}
+
+
+def parse_cascade(text):
+    names = tuple(name.strip() for name in text.split(",") if name.strip())
+    unknown = [name for name in names if name not in logic.PERCEPTUAL_HASHES]
+    if unknown or 'phash' not in names or len(set(names)) != len(names):
+        raise argparse.ArgumentTypeError(f"expected distinct names from {', '.join(logic.PERCEPTUAL_HASHES)}, "
+                                         "including phash")
+    return names
+
+
+def parse_shard(text):
+    index, sep, count = text.partition("/")
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected INDEX/COUNT, e.g. 0/4")
+    if not sep or count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError("expected INDEX/COUNT with 0 <= INDEX < COUNT, e.g. 0/4")
+    return index, count
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m cli",
+        description="Find identical and visually similar images without the GUI. "
+                    "Results are streamed as NDJSON or CSV while the comparison runs.",
+        epilog=f"Exit codes: {EXIT_NO_MATCHES} no matches, {EXIT_MATCHES} matches found, "
+               f"{EXIT_USAGE} usage error, {EXIT_ERROR} scan failed, {EXIT_INTERRUPTED} interrupted, "
+               f"{EXIT_BROKEN_PIPE} output closed early."
+    )
+    parser.add_argument("-a", "--group-a", nargs="+", default=[], metavar="FOLDER",
+                        help="Folders of group A (checked for duplicates)")
+    parser.add_argument("-b", "--group-b", nargs="+", default=[], metavar="FOLDER",
+                        help="Folders of group B (reference). Without it, group A is compared with itself")
+    parser.add_argument("-t", "--threshold", type=float, default=0.90,
+                        help="Similarity threshold 0-1 (default: 0.90)")
+    parser.add_argument("--exact-only", action="store_true",
+                        help="Only report identical files (no pHash, faster)")
+    parser.add_argument("--min-size", type=float, default=0, metavar="KB", help="Skip files smaller than this")
+    parser.add_argument("--max-size", type=float, default=None, metavar="KB", help="Skip files larger than this")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="Hashing processes (default: CPU count - 1)")
+    parser.add_argument("--read-threads", type=int, default=logic.DEFAULT_READ_THREADS, metavar="N",
+                        help="Threads reading files ahead of the hashing processes (for network storage or fast "
+                             "SSDs; default: %(default)s = the processes read the files themselves)")
+    parser.add_argument("--hash", default=logic.DEFAULT_HASH_ALGORITHM, choices=logic.HASH_ALGORITHMS,
+                        help="Content hash for exact matching (default: %(default)s)")
+    parser.add_argument("--fast-decode", action="store_true",
+                        help="Reduced-resolution JPEG decode for pHash (faster, hashes may differ by a few bits)")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Hash while walking (skips the size prefilter)")
+    parser.add_argument("--cascade", type=parse_cascade, default=logic.DEFAULT_CASCADE, metavar="HASH,...",
+                        help="Similarity hash cascade: candidates from the first hash, verified by the others in "
+                             f"order; must include phash. Hashes: {', '.join(logic.PERCEPTUAL_HASHES)} "
+                             "(e.g. dhash,phash,whash; default: phash)")
+    parser.add_argument("--rotation-invariant", action="store_true",
+                        help="Also match rotated / mirrored copies (phash cascade only; reported as 'orientation')")
+    parser.add_argument("--index", default="auto", choices=['auto'] + list(INDEX_TYPES),
+                        help="Near-neighbour index for the similarity search (default: %(default)s)")
+    parser.add_argument("--cache", metavar="DB", help="Persistent hash cache file (SQLite)")
+    parser.add_argument("--library", metavar="FILE",
+                        help="Use a saved library index as group B instead of scanning -b folders")
+    parser.add_argument("--build-library", metavar="FILE",
+                        help="Scan the -b folders, save them as a library index and exit")
+    parser.add_argument("--shard", type=parse_shard, metavar="I/K",
+                        help="With --build-library: index only shard I of K (by path hash); "
+                             "run K of these side by side, then --merge the parts")
+    parser.add_argument("--merge", nargs="+", metavar="PART",
+                        help="With --build-library: join the K shard parts into that library index and exit")
+    parser.add_argument("--state", metavar="FILE",
+                        help="Incremental mode: reuse and update the snapshot saved here by the previous run")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and stream match changes as files change (implies incremental mode)")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, metavar="SEC",
+                        help="Watch mode rescan period when inotify is not available (default: %(default)s)")
+    parser.add_argument("-f", "--format", default="ndjson", choices=list(WRITERS), help="Output format")
+    parser.add_argument("-o", "--output", metavar="FILE", help="Write results here instead of stdout")
+    parser.add_argument("--no-unique", action="store_true", help="Do not list files of group A without a match")
+    parser.add_argument("--report", metavar="FILE",
+                        help="Write a JSON run report (phase timings, counters, failures, cache hit rate; "
+                             "with --watch: of the last rescan)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="No progress messages on stderr")
+    return parser
+
+
+def run_incremental(scanner, writer, args, min_size, max_size):
+    """Incremental rescan (and optional watch loop). Returns True if any match was written."""
+    inc = IncrementalScanner(scanner, args.group_a, args.group_b, threshold=args.threshold,
+                             check_similar=not args.exact_only, min_size=min_size, max_size=max_size,
+                             state_path=args.state, index_type=args.index)
+    if inc.rescan() is None:
+        raise KeyboardInterrupt
+    found = False
+    for match in inc.matches():
+        found = True
+        writer.match(match)
+    if not args.no_unique:
+        for path in inc.unique():
+            writer.unique(path)
+
+    if args.watch:
+        def on_change(summary):
+            nonlocal found
+            for match in summary['matches_removed']:
+                writer.removed(match)
+            for match in summary['matches_added']:
+                found = True
+                writer.match(match)
+
+        inc.watch(on_change, interval=args.interval)
+    return found
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if (args.shard or args.merge) and not args.build_library:
+        parser.error("--shard / --merge need --build-library")
+    if args.build_library and (args.state or args.watch or args.library):
+        parser.error("--build-library cannot be combined with --state / --watch / --library")
+    if args.merge:
+        if args.shard or args.group_a or args.group_b:
+            parser.error("--merge only joins existing parts, do not pass --shard / -a / -b")
+        missing = [part for part in args.merge if not os.path.isfile(part)]
+        if missing:
+            parser.error("shard part not found: " + ", ".join(missing))
+    elif args.build_library:
+        if not args.group_b:
+            parser.error("--build-library needs the -b folders to index")
+        if args.group_a:
+            parser.error("--build-library only indexes the -b folders, do not pass -a")
+    elif not args.group_a:
+        parser.error("the following arguments are required: -a/--group-a")
+    if args.library:
+        if args.group_b:
+            parser.error("--library replaces -b, do not pass both")
+        if args.state or args.watch:
+            parser.error("--library cannot be combined with --state / --watch")
+        if not os.path.isfile(args.library):
+            parser.error(f"library index not found: {args.library}")
+
+    missing = [f for f in args.group_a + args.group_b if not os.path.isdir(f)]
+    if missing:
+        parser.error("folder not found: " + ", ".join(missing))
+    if not 0.0 <= args.threshold <= 1.0:
+        parser.error("--threshold must be between 0 and 1")
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.read_threads < 0:
+        parser.error("--read-threads cannot be negative")
+    if args.rotation_invariant and args.cascade != ('phash',):
+        parser.error("--rotation-invariant only works with the phash cascade")
+    if args.hash not in logic.available_hash_algorithms():
+        parser.error(f"hash algorithm not available here: {args.hash}")
+
+    def progress(current, total, message):
+        sys.stderr.write(f"\r{message}\033[K")
+        sys.stderr.flush()
+
+    out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    scanner = None
+    found = False
+    try:
+        scanner = logic.ImageScanner(
+            callback_progress=None if args.quiet else progress,
+            cache_path=args.cache,
+            fast_decode=args.fast_decode,
+            streaming=args.streaming,
+            hash_algorithm=args.hash,
+            workers=args.workers,
+            read_threads=args.read_threads,
+            cascade=args.cascade,
+            rotation_invariant=args.rotation_invariant,
+        )
+        writer = WRITERS[args.format](out)
+        min_size = int(args.min_size * 1024)
+        max_size = int(args.max_size * 1024) if args.max_size is not None else None
+        if args.merge:
+            scanner.merge_libraries(args.merge, args.build_library)
+        elif args.build_library:
+            if scanner.build_library(args.group_b, args.build_library, min_size=min_size, max_size=max_size,
+                                     use_phash=not args.exact_only, shard=args.shard) is None:
+                raise KeyboardInterrupt
+        elif args.state or args.watch:
+            found = run_incremental(scanner, writer, args, min_size, max_size)
+        else:
+            library = scanner.load_library(args.library) if args.library else None
+            for kind, item in scanner.iter_compare(
+                args.group_a,
+                args.group_b,
+                threshold=args.threshold,
+                check_similar=not args.exact_only,
+                min_size=min_size,
+                max_size=max_size,
+                index_type=args.index,
+                library=library,
+            ):
+                if kind == 'match':
+                    found = True
+                    writer.match(item)
+                elif not args.no_unique:
+                    writer.unique(item)
+        exit_code = EXIT_MATCHES if found else EXIT_NO_MATCHES
+    except KeyboardInterrupt:
+        if scanner:
+            scanner.stop_requested = True
+        sys.stderr.write("\nInterrupted\n")
+        exit_code = EXIT_INTERRUPTED
+    except BrokenPipeError:
+        if scanner:
+            scanner.stop_requested = True
+        # Nobody reads the results any more: stop quietly, and point stdout at devnull
+        # so the final flush at interpreter exit does not raise again.
+        if not args.output:
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, sys.stdout.fileno())
+            os.close(devnull)
+        exit_code = EXIT_BROKEN_PIPE
+    except Exception as e:
+        sys.stderr.write(f"\nError: {e}\n")
+        exit_code = EXIT_ERROR
+    finally:
+        if not args.quiet:
+            sys.stderr.write("\n")
+        if args.output:
+            out.close()
+
+    if scanner:
+        if args.report:
+            scanner.metrics.save(args.report, cache_stats=scanner.cache.stats() if scanner.cache else None,
+                                 extra={'exit_code': exit_code, 'argv': sys.argv[1:] if argv is None else argv})
+        if scanner.cache:
+            scanner.cache.close()
+    return exit_code
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
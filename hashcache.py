@@ -0,0 +1,192 @@
+import os
+import sqlite3
+import threading
+
+# Copyright (c) 2025 Photo Comparator. All rights reserved.
+# Licensed under the MIT License. See LICENSE file in the project root for full license information.
+
+SCHEMA_VERSION = 4
+
+# Upsert condition: the stored row describes the same unchanged file
+_SAME_FILE = "files.size = excluded.size AND files.mtime_ns = excluded.mtime_ns AND files.inode = excluded.inode"
+
+
+class HashCache:
+    """
+    Persistent on-disk hash cache (SQLite).
+
+    One row per path. A row is only valid while (size, mtime_ns, inode) still
+    match the file on disk, so a modified or replaced file is simply a miss and
+    gets overwritten on the next store().
+
+    Concurrency: pool workers never touch the database. They return their
+    hashes to the parent process, which is the single writer and flushes in
+    batched transactions. WAL mode + busy timeout keep it safe when several
+    scanner processes share the same cache file.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._lock = threading.Lock()
+
+        folder = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(folder, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._init_schema()
+
+    def _init_schema(self):
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'schema'").fetchone()
+            if row and int(row[0]) != SCHEMA_VERSION:
+                # Old layout: start over rather than trying to migrate hashes
+                self._conn.execute("DROP TABLE IF EXISTS files")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                " path TEXT PRIMARY KEY,"
+                " size INTEGER NOT NULL,"
+                " mtime_ns INTEGER NOT NULL,"
+                " inode INTEGER NOT NULL,"
+                " digest TEXT,"
+                " digest_algo TEXT,"
+                " phash TEXT,"
+                " phash_mode TEXT,"
+                " extra TEXT)"
+            )
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('schema', ?)", (str(SCHEMA_VERSION),))
+
+    def lookup(self, path, size, mtime_ns, inode, use_phash=True, use_digest=True, phash_mode='full',
+               digest_algo='md5', extra_hashes=()):
+        """
+        Return (digest_hex, phash_hex, extra) if a valid entry holds every requested hash, else None.
+        A digest only counts when it was computed with the same digest_algo, a
+        pHash only when it was computed with the same phash_mode ('full' or
+        'fast' decode). extra_hashes names the cascade hashes needed next to the
+        pHash (see logic.PERCEPTUAL_HASHES); extra maps name -> hex.
+        Counted in the hit/miss statistics.
+        """
+        row = self.peek(path, size, mtime_ns, inode, use_phash, use_digest, phash_mode, digest_algo, extra_hashes)
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return row
+
+    def peek(self, path, size, mtime_ns, inode, use_phash=False, use_digest=False, phash_mode='full',
+             digest_algo='md5', extra_hashes=()):
+        """Like lookup(), but without touching the statistics."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, inode, digest, digest_algo, phash, phash_mode, extra FROM files WHERE path = ?",
+                (path,)
+            ).fetchone()
+
+        if (row is None
+                or row[0] != size or row[1] != mtime_ns or row[2] != inode
+                or (use_digest and (row[3] is None or row[4] != digest_algo))
+                or (use_phash and (row[5] is None or row[6] != phash_mode))):
+            return None
+        # Extra hashes share the pHash's decode (and phash_mode)
+        extra = decode_extra(row[7]) if row[6] == phash_mode else {}
+        if use_phash and any(name not in extra for name in extra_hashes):
+            return None
+        return (row[3] if row[4] == digest_algo else None), (row[5] if row[6] == phash_mode else None), extra
+
+    def store(self, entries):
+        """
+        Write a batch of entries in one transaction.
+        entries: iterable of (path, size, mtime_ns, inode, digest_hex, digest_algo, phash_hex, phash_mode,
+                 extra) with extra a string from encode_extra() or None
+        A None hash does not erase a value cached for the same unchanged file
+        (e.g. an exact-only run keeps the pHash of an earlier similarity run).
+        The extra hashes are replaced together with the pHash.
+        """
+        entries = list(entries)
+        if not entries:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO files (path, size, mtime_ns, inode, digest, digest_algo, phash, phash_mode, extra)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(path) DO UPDATE SET"
+                "  digest = CASE WHEN excluded.digest IS NULL AND " + _SAME_FILE + " THEN files.digest ELSE excluded.digest END,"
+                "  digest_algo = CASE WHEN excluded.digest IS NULL AND " + _SAME_FILE + " THEN files.digest_algo ELSE excluded.digest_algo END,"
+                "  phash = CASE WHEN excluded.phash IS NULL AND " + _SAME_FILE + " THEN files.phash ELSE excluded.phash END,"
+                "  phash_mode = CASE WHEN excluded.phash IS NULL AND " + _SAME_FILE + " THEN files.phash_mode ELSE excluded.phash_mode END,"
+                "  extra = CASE WHEN excluded.phash IS NULL AND " + _SAME_FILE + " THEN files.extra ELSE excluded.extra END,"
+                "  size = excluded.size, mtime_ns = excluded.mtime_ns, inode = excluded.inode",
+                entries
+            )
+            self.writes += len(entries)
+
+    def invalidate(self, paths=None):
+        """Drop the given paths from the cache, or everything if paths is None."""
+        with self._lock, self._conn:
+            if paths is None:
+                self._conn.execute("DELETE FROM files")
+            else:
+                self._conn.executemany("DELETE FROM files WHERE path = ?", ((p,) for p in paths))
+
+    def prune(self):
+        """
+        Remove entries whose file is gone or no longer matches (size, mtime, inode).
+        Returns the number of removed rows.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT path, size, mtime_ns, inode FROM files").fetchall()
+
+        stale = []
+        for path, size, mtime_ns, inode in rows:
+            try:
+                st = os.stat(path)
+            except OSError:
+                stale.append(path)
+                continue
+            # inode 0 = not recorded (Windows walker), compare size and mtime only
+            if st.st_size != size or st.st_mtime_ns != mtime_ns or (inode and st.st_ino != inode):
+                stale.append(path)
+
+        self.invalidate(stale)
+        return len(stale)
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            'writes': self.writes,
+            'entries': entries,
+        }
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def encode_extra(names, values):
+    """Extra cascade hashes as stored in the cache: "dhash:0123...;whash:..." (None if there are none)."""
+    if not names:
+        return None
+    return ";".join(f"{name}:{value:016x}" for name, value in zip(names, values))
+
+
+def decode_extra(text):
+    """Inverse of encode_extra: name -> hex string."""
+    if not text:
+        return {}
+    return dict(item.split(":", 1) for item in text.split(";"))
@@ -0,0 +1,523 @@
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import struct
+import time
+
+from hashindex import search_pairs, pack_hashes, threshold_to_radius, hamming_distance, best_variant_pairs
+from logic import DIHEDRAL_VARIANTS, DIHEDRAL_INVERSE
+
+# Copyright (c) 2025 Photo Comparator. All rights reserved.
+# Licensed under the MIT License. See LICENSE file in the project root for full license information.
+
+# Incremental comparison: keep the hashes and the match set of the previous
+# scan, and on every rescan only hash what was added or modified.
+
+STATE_VERSION = 3
+
+# Watch mode: polling period without inotify, and how long to wait for a
+# burst of file events (e.g. a folder copy) to settle before rescanning
+POLL_INTERVAL = 30.0
+DEBOUNCE = 2.0
+
+# inotify event bits (linux/inotify.h)
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_IGNORED = 0x8000
+WATCH_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF)
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class FileState:
+    """
+    What the previous scan knew about a file: its stat key and hashes.
+    extra holds the scanner's extra cascade hashes (aligned with
+    scanner.extra_hashes) whenever phash is set.
+    """
+    __slots__ = ('size', 'mtime_ns', 'inode', 'digest', 'phash', 'extra')
+
+    def __init__(self, size, mtime_ns, inode, digest=None, phash=None, extra=None):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.inode = inode
+        self.digest = digest
+        self.phash = phash
+        self.extra = extra
+
+    def same_file(self, rec):
+        return self.size == rec.size and self.mtime_ns == rec.mtime_ns and self.inode == rec.inode
+
+
+class IncrementalScanner:
+    """
+    Compare group A against group B (or A against itself) and keep the result
+    up to date across rescans.
+
+    rescan() walks both groups, diffs the tree against the previous snapshot,
+    hashes only added / modified files and drops deleted ones. Exact groups are
+    rebuilt only for the digests that were touched, and similar pairs are only
+    searched for the changed files (changed x other side), so unchanged pairs
+    are never recomputed. With state_path the snapshot, hashes and similar
+    pairs are saved after each rescan and reloaded by the next run.
+
+    scanner: a logic.ImageScanner (its cache, hash settings and progress
+    callback are used for the hashing).
+    index_type: pair search index for the similar pairs, see hashindex.INDEX_TYPES
+    (default 'auto').
+    """
+
+    def __init__(self, scanner, folders_a, folders_b=(), threshold=0.90, check_similar=True, min_size=0,
+                 max_size=None, state_path=None, index_type='auto'):
+        self.scanner = scanner
+        self.folders_a = list(folders_a)
+        self.folders_b = list(folders_b)
+        self.self_compare = not self.folders_b
+        self.threshold = threshold
+        self.check_similar = check_similar
+        self.min_size = min_size
+        self.max_size = max_size
+        self.state_path = state_path
+        self.index_type = index_type
+
+        self.files = ({}, {})            # per side: path -> FileState
+        self.by_digest = ({}, {})        # per side: digest -> set(paths)
+        self.exact = {}                  # digest -> group match
+        self.similar = {}                # (path_a, path_b) -> match
+        self._pairs_of = {}              # path -> set of keys in self.similar
+
+        if state_path and os.path.exists(state_path):
+            self.load(state_path)
+
+    # --- Settings that make a saved state reusable ---
+    def _settings(self):
+        return {
+            'folders_a': self.folders_a,
+            'folders_b': self.folders_b,
+            'threshold': self.threshold,
+            'check_similar': self.check_similar,
+            'min_size': self.min_size,
+            'max_size': self.max_size,
+            'hash_algorithm': self.scanner.hash_algorithm,
+            'phash_mode': self.scanner.phash_mode,
+            'cascade': list(self.scanner.cascade),
+            # Radii of the verification stages decide which similar pairs are kept
+            'cascade_radii': {name: self.scanner.cascade_radii[name] for name in self.scanner.cascade_extras},
+        }
+
+    def rescan(self):
+        """
+        Bring the match set up to date with the folders on disk.
+        Returns a change summary dict (added / modified / deleted counts,
+        matches_added / matches_removed lists), or None if stopped.
+        """
+        scanner = self.scanner
+        scanner.metrics.reset()  # One report per rescan, not the sum of every watch cycle
+        trees = [{rec.path: rec for rec in scanner.iter_files(self.folders_a, self.min_size, self.max_size)}]
+        if scanner.stop_requested: return None
+        if not self.self_compare:
+            trees.append({rec.path: rec for rec in scanner.iter_files(self.folders_b, self.min_size, self.max_size)})
+            if scanner.stop_requested: return None
+
+        summary = {'added': 0, 'modified': 0, 'deleted': 0, 'matches_added': [], 'matches_removed': []}
+        changed = []
+        for side, tree in enumerate(trees):
+            known = self.files[side]
+            gone = [path for path in known if path not in tree]
+            todo = []
+            for path, rec in tree.items():
+                state = known.get(path)
+                if state is None:
+                    summary['added'] += 1
+                    todo.append(rec)
+                elif not state.same_file(rec):
+                    summary['modified'] += 1
+                    todo.append(rec)
+            summary['deleted'] += len(gone)
+            changed.append((gone, todo))
+
+        if not any(gone or todo for gone, todo in changed):
+            return summary
+
+        # Hash everything first, so a stop leaves the previous state untouched
+        hashed = []
+        for gone, todo in changed:
+            store = scanner.hash_files(todo, use_phash=self.check_similar) if todo else None
+            if scanner.stop_requested: return None
+            hashed.append(store)
+
+        removed = {}
+        added = {}
+        touched = set()
+        new_paths = ([], [])
+        for side, ((gone, todo), store) in enumerate(zip(changed, hashed)):
+            for path in gone:
+                touched.add(self._forget(side, path, removed))
+            for rec in todo:
+                touched.add(self._forget(side, rec.path, removed))
+                found = store.find(rec.path) if store is not None else None
+                phash = found.phash if found else None
+                extra = tuple(store.hash(name, found.row) for name in store.extra_hashes) if phash is not None else None
+                state = FileState(rec.size, rec.mtime_ns, rec.inode, found.digest if found else None, phash, extra)
+                self.files[side][rec.path] = state
+                if state.digest is not None:
+                    self.by_digest[side].setdefault(state.digest, set()).add(rec.path)
+                    touched.add(state.digest)
+                new_paths[side].append(rec.path)
+
+        touched.discard(None)
+        self._update_exact(touched, removed, added)
+        if self.check_similar:
+            self._update_similar(new_paths, added)
+
+        # A match that was dropped and found again is not a change
+        for key in set(removed) & set(added):
+            if removed[key] == added[key]:
+                del removed[key], added[key]
+        summary['matches_removed'] = list(removed.values())
+        summary['matches_added'] = list(added.values())
+
+        if self.state_path:
+            self.save(self.state_path)
+        return summary
+
+    def _forget(self, side, path, removed):
+        """Drop a file and its similar pairs. Returns its old digest (to regroup), or None."""
+        state = self.files[side].pop(path, None)
+        for key in self._pairs_of.pop(path, ()):
+            match = self.similar.pop(key, None)
+            if match is not None:
+                removed[('similar',) + key] = match
+            other = key[1] if key[0] == path else key[0]
+            peers = self._pairs_of.get(other)
+            if peers:
+                peers.discard(key)
+        if state is None or state.digest is None:
+            return None
+        paths = self.by_digest[side].get(state.digest)
+        if paths:
+            paths.discard(path)
+            if not paths:
+                del self.by_digest[side][state.digest]
+        return state.digest
+
+    def _update_exact(self, digests, removed, added):
+        """Rebuild the exact-match group of each touched digest."""
+        for digest in digests:
+            old = self.exact.pop(digest, None)
+            if old is not None:
+                removed[('exact', digest)] = old
+            group = self._exact_group(digest)
+            if group is not None:
+                self.exact[digest] = group
+                added[('exact', digest)] = group
+
+    def _exact_group(self, digest):
+        paths_a = sorted(self.by_digest[0].get(digest, ()))
+        if self.self_compare:
+            if len(paths_a) < 2:
+                return None
+            return self.scanner._make_group(paths_a, [], "完全相同")
+        paths_b = sorted(self.by_digest[1].get(digest, ()))
+        if not paths_a or not paths_b:
+            return None
+        return self.scanner._make_group(paths_a, paths_b, "完全相同")
+
+    def _update_similar(self, new_paths, added):
+        """
+        Search pairs for the changed files only: changed A x all B, then changed B x all A.
+        The search runs on the pHash; the scanner's other cascade hashes are then
+        checked per pair, which keeps exactly the pairs a full scan would keep.
+        With scanner.rotation_invariant the targets carry all 8 pHash orientations,
+        as in ImageScanner.iter_compare, so the changed files of the target side
+        are searched from the originals of the other side (A against itself:
+        both directions, keeping the closer one).
+        """
+        radius = threshold_to_radius(self.threshold)
+        cascade_extras = self.scanner.cascade_extras
+        radii = [self.scanner.cascade_radii[name] for name in cascade_extras]
+        oriented = self.scanner.rotation_invariant
+        variants = len(DIHEDRAL_VARIANTS) if oriented else 1
+
+        def hashed(side, paths):
+            return [p for p in paths if self.files[side][p].phash is not None]
+
+        changed = (hashed(0, new_paths[0]), hashed(1, new_paths[1]))
+        everything = (hashed(0, self.files[0]), hashed(1, self.files[1]))
+        # (source side, sources, target side, targets); only targets carry orientations
+        if self.self_compare:
+            jobs = [(0, changed[0], 0, everything[0])]
+            if oriented:
+                jobs.append((0, everything[0], 0, changed[0]))
+        else:
+            jobs = [(0, changed[0], 1, everything[1]),
+                    (0, everything[0], 1, changed[1]) if oriented else (1, changed[1], 0, everything[0])]
+
+        found = {}  # (path_a, path_b) -> (pHash distance, variant turning path_b into path_a)
+        for side, sources, other_side, targets in jobs:
+            if not sources or not targets:
+                continue
+            source_hashes = pack_hashes([self.files[side][p].phash for p in sources])
+            target_hashes = []
+            for p in targets:
+                state = self.files[other_side][p]
+                target_hashes.append(state.phash)
+                if oriented:
+                    # Position j * 8 + variant, like ScanStore.packed_columns
+                    target_hashes.extend(state.extra[len(cascade_extras):])
+            target_hashes = pack_hashes(target_hashes)
+
+            for _, pairs in search_pairs(self.index_type, source_hashes, target_hashes, radius):
+                pairs, orientation = best_variant_pairs(pairs, variants)
+                for i, j, dist in pairs:
+                    path, other = sources[i], targets[j]
+                    if path == other:
+                        continue
+                    # Variant of the target that matched; name it as the one turning path_b into path_a
+                    variant = orientation[(i, j)]
+                    if side == 0:
+                        path_a, path_b = path, other
+                    else:
+                        path_a, path_b = other, path
+                        variant = DIHEDRAL_INVERSE[variant]
+                    if self.self_compare and path_b < path_a:
+                        path_a, path_b = path_b, path_a
+                        variant = DIHEDRAL_INVERSE[variant]
+                    key = (path_a, path_b)
+                    if key in self.similar:
+                        continue
+                    old = found.get(key)
+                    if old is None or (dist, variant) < old:
+                        found[key] = (dist, variant)
+
+        for key, (dist, variant) in found.items():
+            path_a, path_b = key
+            state, other_state = self.files[0][path_a], self.files[0 if self.self_compare else 1][path_b]
+            if state.digest is not None and state.digest == other_state.digest:
+                continue  # Already an exact match
+            if radii and any(hamming_distance(h1, h2) > r
+                             for h1, h2, r in zip(state.extra, other_state.extra, radii)):
+                continue  # Pruned by a later cascade stage
+
+            match = self.scanner._make_match(path_a, path_b, "視覺相似", self.scanner._score_from_distance(dist))
+            if variant:
+                match['orientation'] = DIHEDRAL_VARIANTS[variant]
+            self.similar[key] = match
+            self._pairs_of.setdefault(path_a, set()).add(key)
+            self._pairs_of.setdefault(path_b, set()).add(key)
+            added[('similar',) + key] = match
+
+    # --- Current result ---
+    def matches(self):
+        return list(self.exact.values()) + list(self.similar.values())
+
+    def unique(self):
+        """Files of group A without any match."""
+        matched = set()
+        for digest in self.exact:
+            matched.update(self.by_digest[0].get(digest, ()))
+        for path_a, path_b in self.similar:
+            matched.add(path_a)
+            if self.self_compare:
+                matched.add(path_b)
+        return [path for path in self.files[0] if path not in matched]
+
+    # --- Persistence ---
+    def save(self, path):
+        """Write snapshot, hashes and similar pairs as JSON (atomic replace)."""
+        def dump(files):
+            return [[p, s.size, s.mtime_ns, s.inode,
+                     s.digest.hex() if s.digest is not None else None, s.phash,
+                     list(s.extra) if s.extra is not None else None]
+                    for p, s in files.items()]
+
+        state = {
+            'version': STATE_VERSION,
+            'settings': self._settings(),
+            'files': [dump(self.files[0]), dump(self.files[1])],
+            'similar': [[m['file_a'], m['file_b'], m['score'], m.get('orientation')] for m in self.similar.values()],
+        }
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def load(self, path):
+        """
+        Restore a saved state. Returns False (and keeps an empty state) when the
+        file is unreadable or was written with different folders / settings.
+        """
+        try:
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if state.get('version') != STATE_VERSION or state.get('settings') != self._settings():
+            return False
+
+        for side, rows in enumerate(state['files']):
+            for p, size, mtime_ns, inode, digest_hex, phash, extra in rows:
+                digest = bytes.fromhex(digest_hex) if digest_hex else None
+                self.files[side][p] = FileState(size, mtime_ns, inode, digest, phash,
+                                                tuple(extra) if extra is not None else None)
+                if digest is not None:
+                    self.by_digest[side].setdefault(digest, set()).add(p)
+
+        for digest in self.by_digest[0]:
+            group = self._exact_group(digest)
+            if group is not None:
+                self.exact[digest] = group
+
+        for path_a, path_b, score, orientation in state['similar']:
+            key = (path_a, path_b)
+            match = self.scanner._make_match(path_a, path_b, "視覺相似", score)
+            if orientation:
+                match['orientation'] = orientation
+            self.similar[key] = match
+            self._pairs_of.setdefault(path_a, set()).add(key)
+            self._pairs_of.setdefault(path_b, set()).add(key)
+        return True
+
+    # --- Watch mode ---
+    def watch(self, on_change, interval=POLL_INTERVAL, debounce=DEBOUNCE):
+        """
+        Keep the match set live until scanner.stop_requested is set.
+        Uses inotify where available (Linux) and falls back to rescanning every
+        `interval` seconds. on_change(summary) is called after each rescan that
+        found a change.
+        """
+        roots = self.folders_a + self.folders_b
+        watcher = InotifyWatcher.create()
+        try:
+            while not self.scanner.stop_requested:
+                if watcher is not None:
+                    watcher.refresh(_list_dirs(roots))
+                    if not watcher.wait(interval, debounce, lambda: self.scanner.stop_requested):
+                        continue
+                else:
+                    deadline = time.monotonic() + interval
+                    while time.monotonic() < deadline and not self.scanner.stop_requested:
+                        time.sleep(min(1.0, interval))
+                    if self.scanner.stop_requested:
+                        break
+
+                summary = self.rescan()
+                if summary and (summary['added'] or summary['modified'] or summary['deleted']):
+                    on_change(summary)
+        finally:
+            if watcher is not None:
+                watcher.close()
+
+
+def _list_dirs(roots):
+    """Every directory under the roots (symlinks not followed, like scan_tree)."""
+    dirs = []
+    stack = [root for root in roots if os.path.isdir(root)]
+    while stack:
+        folder = stack.pop()
+        dirs.append(folder)
+        try:
+            with os.scandir(folder) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+    return dirs
+
+
+class InotifyWatcher:
+    """
+    Minimal inotify binding through ctypes (no extra dependency).
+    inotify is not recursive, so every directory gets its own watch; refresh()
+    adds watches for directories created since the last call.
+    """
+
+    def __init__(self, libc, fd):
+        self._libc = libc
+        self._fd = fd
+        self._wd_path = {}
+        self._watched = set()
+        # Set when the kernel watch limit was hit: wait() then also times out
+        # into a rescan so the unwatched directories are still polled
+        self.incomplete = False
+
+    @classmethod
+    def create(cls):
+        """An InotifyWatcher, or None where inotify is not available."""
+        if not hasattr(os, 'O_NONBLOCK'):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            init = libc.inotify_init1
+        except (OSError, AttributeError):
+            return None
+        fd = init(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        return cls(libc, fd)
+
+    def refresh(self, dirs):
+        for folder in dirs:
+            if folder in self._watched:
+                continue
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(folder), WATCH_MASK)
+            if wd < 0:
+                self.incomplete = True
+                continue
+            self._wd_path[wd] = folder
+            self._watched.add(folder)
+
+    def _drain(self):
+        """Read pending events. Returns True if any event was read."""
+        got = False
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                return got
+            if not data:
+                return got
+            got = True
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size + length
+                if mask & IN_IGNORED:
+                    # Watch removed by the kernel (directory deleted / moved away)
+                    self._watched.discard(self._wd_path.pop(wd, None))
+
+    def wait(self, timeout, debounce=DEBOUNCE, should_stop=None):
+        """
+        Block until files change (True) or `timeout` passes (False, or True when
+        the watch set is incomplete). A burst of events is coalesced until it
+        has been quiet for `debounce` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            if should_stop and should_stop():
+                return False
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return self.incomplete
+            ready, _, _ = select.select([self._fd], [], [], min(remaining, 1.0))
+            if ready and self._drain():
+                break
+        while True:
+            ready, _, _ = select.select([self._fd], [], [], debounce)
+            if not ready or not self._drain():
+                return True
+
+    def close(self):
+        os.close(self._fd)
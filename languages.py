@@ -16,6 +16,7 @@ TRANSLATIONS = {
         "group_b_label": "群組 B (若空則自我比對):",
         "options_label": "選項",
         "check_similar": "尋找相似圖片",
+        "check_rotated": "包含旋轉 / 翻轉的圖片",
         "size_filter_min": "最小 KB:",
         "size_filter_max": "最大 KB:",
         
@@ -29,6 +30,12 @@ TRANSLATIONS = {
         "btn_stopping": "正在停止...",
         "btn_copy_unique": "複製獨有照片至 B",
         "btn_copy_unique_count": "複製 {} 張獨有照片至 B",
+        "copy_mode_label": "複製方式:",
+        "copy_mode_copy": "複製",
+        "copy_mode_reflink": "Reflink (共用區塊)",
+        "copy_mode_hardlink": "硬連結",
+        "copy_mode_symlink": "符號連結",
+        "copy_keep_layout": "保留資料夾結構",
         "btn_no_unique": "無獨有照片可複製",
         "btn_view": "檢視",
         "btn_select_all": "全選",
@@ -43,8 +50,13 @@ TRANSLATIONS = {
         "status_scanning_a": "正在掃描群組 A...",
         "status_scanning_b": "正在掃描群組 B...",
         "status_analyzing": "分析中 ({}/{})",
+        "status_prefilter": "快速預先比對中 ({}/{})",
+        "status_streaming": "已處理 {} / 已發現 {}",
         "status_comparing": "比對中 ({}/{})",
         "status_finished": "完成！",
+        "status_copying": "複製中 ({}/{})",
+        "status_rate": "{:.0f} 個/秒",
+        "status_eta": "剩餘 {}",
 
         # Results
         "res_header_type": "類型",
@@ -56,6 +68,18 @@ TRANSLATIONS = {
         "res_col_file_a": "檔案 A",
         "res_col_file_b": "檔案 B",
         "res_info_match": "判定: {} ({}%)",
+        "res_group_more": "(另有 {} 個相同檔案)",
+        "res_orientation": "(B 經 {} 後相似)",
+        "res_title": "比對結果",
+        "res_filter_type": "類型:",
+        "res_filter_all": "全部",
+        "res_min_score": "最低相似度:",
+        "res_sort": "排序:",
+        "res_sort_score_desc": "相似度 高→低",
+        "res_sort_score_asc": "相似度 低→高",
+        "res_sort_type": "類型",
+        "res_sort_name": "檔名",
+        "res_count": "顯示 {} / {} 筆",
 
         # Dialogs / Messages
         "msg_title_info": "資訊",
@@ -64,6 +88,8 @@ TRANSLATIONS = {
         "msg_title_stop": "停止",
         "msg_title_batch": "批次選擇資料夾",
         "msg_title_preview": "圖片預覽",
+        "preview_loading": "載入中...",
+        "preview_failed": "無法載入圖片",
         "msg_select_root": "選擇母資料夾 (將列出子資料夾)",
         "msg_no_subdirs": "該資料夾下沒有子資料夾！",
         "msg_added_folders": "已加入 {} 個資料夾。",
@@ -76,6 +102,9 @@ TRANSLATIONS = {
         "msg_no_unique_copy": "沒有獨有照片可複製。",
         "msg_err_create_dir": "無法建立資料夾: {}",
         "msg_copy_success": "已複製 {} 張照片到\n{}",
+        "msg_copy_partial": "已複製 {} 張照片到\n{}\n\n{} 張失敗，例如:\n{}",
+        "msg_copy_cancelled": "複製已取消，已完成 {} / {} 張。",
+        "msg_err_copy_mode": "所選的複製方式需要來源與目的地位於同一個檔案系統。",
         "msg_err_copy_fail": "複製失敗: {}",
         
         # UI
@@ -89,6 +118,7 @@ TRANSLATIONS = {
         "group_b_label": "Group B (Target, optional):",
         "options_label": "Options",
         "check_similar": "Find Similar Images",
+        "check_rotated": "Include Rotated / Mirrored",
         "size_filter_min": "Min KB:",
         "size_filter_max": "Max KB:",
         
@@ -102,6 +132,12 @@ TRANSLATIONS = {
         "btn_stopping": "Stopping...",
         "btn_copy_unique": "Copy Unique to B",
         "btn_copy_unique_count": "Copy {} Unique to B",
+        "copy_mode_label": "Copy mode:",
+        "copy_mode_copy": "Copy",
+        "copy_mode_reflink": "Reflink (clone)",
+        "copy_mode_hardlink": "Hard link",
+        "copy_mode_symlink": "Symbolic link",
+        "copy_keep_layout": "Keep folder layout",
         "btn_no_unique": "No Unique to Copy",
         "btn_view": "View",
         "btn_select_all": "Select All",
@@ -116,8 +152,13 @@ TRANSLATIONS = {
         "status_scanning_a": "Scanning Group A...",
         "status_scanning_b": "Scanning Group B...",
         "status_analyzing": "Analyzing ({}/{})",
+        "status_prefilter": "Pre-checking duplicates ({}/{})",
+        "status_streaming": "Processed {} / discovered {}",
         "status_comparing": "Comparing ({}/{})",
         "status_finished": "Finished!",
+        "status_copying": "Copying ({}/{})",
+        "status_rate": "{:.0f}/s",
+        "status_eta": "ETA {}",
 
         # Results
         "res_header_type": "Type",
@@ -129,6 +170,18 @@ TRANSLATIONS = {
         "res_col_file_a": "File A",
         "res_col_file_b": "File B",
         "res_info_match": "Verdict: {} ({}%)",
+        "res_group_more": "(+{} more identical)",
+        "res_orientation": "(B after {})",
+        "res_title": "Results",
+        "res_filter_type": "Type:",
+        "res_filter_all": "All",
+        "res_min_score": "Min score:",
+        "res_sort": "Sort:",
+        "res_sort_score_desc": "Score high → low",
+        "res_sort_score_asc": "Score low → high",
+        "res_sort_type": "Type",
+        "res_sort_name": "File name",
+        "res_count": "Showing {} of {}",
 
         # Dialogs / Messages
         "msg_title_info": "Info",
@@ -137,6 +190,8 @@ TRANSLATIONS = {
         "msg_title_stop": "Stop",
         "msg_title_batch": "Batch Select Folders",
         "msg_title_preview": "Image Preview",
+        "preview_loading": "Loading...",
+        "preview_failed": "Cannot load image",
         "msg_select_root": "Select Root Folder",
         "msg_no_subdirs": "No subdirectories found!",
         "msg_added_folders": "Added {} folders.",
@@ -149,6 +204,9 @@ TRANSLATIONS = {
         "msg_no_unique_copy": "No unique photos to copy.",
         "msg_err_create_dir": "Cannot create directory: {}",
         "msg_copy_success": "Copied {} photos to\n{}",
+        "msg_copy_partial": "Copied {} photos to\n{}\n\n{} failed, e.g.:\n{}",
+        "msg_copy_cancelled": "Copy cancelled after {} of {} photos.",
+        "msg_err_copy_mode": "The selected copy mode needs source and destination on the same filesystem.",
         "msg_err_copy_fail": "Copy failed: {}",
         
         # UI
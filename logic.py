@@ -1,266 +1,1796 @@
 import os
+import io
+import errno
 import hashlib
+import shutil
 import imagehash
-from PIL import Image
-from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from PIL import Image, ExifTags
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
 import multiprocessing
+from multiprocessing import resource_tracker, shared_memory
+import queue
+import threading
+import time
+from hashcache import HashCache, encode_extra
+from hashindex import search_pairs, fold_variant_batches, hamming_distance, threshold_to_radius, popcount64, HASH_BITS
+from scanstore import ScanStore, DIGEST_SIZE
+from metrics import ScanMetrics
+
+# Optional faster content-hash backends
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+try:
+    import fcntl  # reflink ioctl (Linux)
+except ImportError:
+    fcntl = None
 
 # Copyright (c) 2025 Photo Comparator. All rights reserved.
 # Licensed under the MIT License. See LICENSE file in the project root for full license information.
 
 IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp', '.tiff'}
 
+# Exact-match prefilter: bytes hashed from each end of a file
+PARTIAL_BLOCK = 65536
+
+# Pool scheduling: files per worker call, and chunks queued per worker
+MAX_CHUNK_SIZE = 64
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+# Streaming scan: walker -> pool queue bound, and how often the consumer polls it
+STREAM_QUEUE_SIZE = 4096
+STREAM_POLL_INTERVAL = 0.1
+
+# Two-tier hashing (see ReadAhead): threads read whole files into shared memory
+# ahead of the process pool. 0 threads: the pool workers read the files themselves
+DEFAULT_READ_THREADS = 0
+# File bytes read ahead but not yet hashed. Shared memory lives in /dev/shm on
+# Linux, which is only 64 MB in a default Docker container: keep below that
+READ_AHEAD_MAX_BYTES = 48 * 1024 * 1024
+
+# Shortest gap between two callback_progress calls of the same stage (seconds)
+CALLBACK_MIN_INTERVAL = 0.1
+
+# Perceptual hashes of the similarity cascade (see ImageScanner.iter_compare),
+# all packed into 64-bit ints. colorhash: 14 bins x 4 bits = 56 bits.
+PERCEPTUAL_HASHES = {
+    'ahash': imagehash.average_hash,
+    'dhash': imagehash.dhash,
+    'phash': imagehash.phash,
+    'whash': imagehash.whash,
+    'colorhash': lambda img: imagehash.colorhash(img, binbits=4),
+}
+# Default cascade: pHash alone. The pHash stage always uses the threshold's
+# radius (and gives the reported score); the other stages use these radii,
+# loose enough to keep resized / recompressed / lightly cropped copies
+# (see benchmarks/bench_scan.py --cascade).
+DEFAULT_CASCADE = ('phash',)
+DEFAULT_CASCADE_RADII = {'ahash': 10, 'dhash': 10, 'whash': 8, 'colorhash': 6}
+
+# Rotation / flip invariant matching: the 8 orientations of the dihedral group,
+# as operations on the pixel grid ("flip" mirrors left-right first, "rotN"
+# then turns N degrees counter-clockwise). Variant 0 is the image as displayed.
+DIHEDRAL_VARIANTS = ('identity', 'rot90', 'rot180', 'rot270', 'flip', 'flip_rot90', 'flip_rot180', 'flip_rot270')
+# Store / cache names of the non-identity pHash variants (extra ScanStore columns)
+# Variant undoing each variant: rotations by 90 / 270 swap, the mirrors undo themselves
+DIHEDRAL_INVERSE = (0, 3, 2, 1, 4, 5, 6, 7)
+DIHEDRAL_HASHES = tuple('phash_' + name for name in DIHEDRAL_VARIANTS[1:])
+# EXIF Orientation tag (0x0112) -> variant that turns the stored pixels upright
+EXIF_ORIENTATION_VARIANT = {1: 0, 2: 4, 3: 2, 4: 6, 5: 5, 6: 3, 7: 7, 8: 1}
+# DCT-II of a reversed sequence = coefficient k times (-1)^k
+_DCT_SIGNS = np.array([(-1) ** k for k in range(8)], dtype=np.float64)
+
+# Copy engine (see ImageScanner.copy_files): modes, threads and block size.
+# Link modes only work with source and destination on one filesystem.
+COPY_MODES = ('copy', 'reflink', 'hardlink', 'symlink')
+LINK_MODES = ('reflink', 'hardlink')
+DEFAULT_COPY_THREADS = 8
+COPY_BLOCK = 8 * 1024 * 1024
+COPY_NAME_RETRIES = 100
+_FICLONE = 0x40049409  # Linux ioctl: new file shares the source extents (btrfs, XFS, ...)
+
+# Root folders walked concurrently (I/O bound, mostly network round trips)
+DEFAULT_WALK_THREADS = 4
+
+# Single-read hashing: largest file read into one buffer for digest + decode
+SINGLE_READ_MAX = 32 * 1024 * 1024
+
+# Fast decode: smallest edge we accept as pHash input (phash itself works on 32x32)
+FAST_DECODE_MIN_EDGE = 128
+
+# Content-hash backends for exact matching. Every backend produces a 16-byte
+# digest so ScanStore / the cache can hold any of them; digests of different
+# algorithms are never compared (see ScanStore.digest_algo / HashCache).
+HASH_ALGORITHMS = ('md5', 'blake2b', 'xxh128', 'blake3')
+DEFAULT_HASH_ALGORITHM = 'md5'
+
+class _Blake3Digest:
+    """blake3 hasher truncated to a 16-byte digest (blake3 is an XOF)."""
+    def __init__(self):
+        self._h = blake3.blake3()
+
+    def update(self, data):
+        self._h.update(data)
+
+    def digest(self):
+        return self._h.digest(length=DIGEST_SIZE)
+
+def new_hasher(algorithm=DEFAULT_HASH_ALGORITHM):
+    """Return a hashlib-style object (update / digest) with a 16-byte digest."""
+    if algorithm == 'md5':
+        return hashlib.md5()
+    if algorithm == 'blake2b':
+        return hashlib.blake2b(digest_size=DIGEST_SIZE)
+    if algorithm == 'xxh128' and xxhash is not None:
+        return xxhash.xxh3_128()
+    if algorithm == 'blake3' and blake3 is not None:
+        return _Blake3Digest()
+    raise ValueError(f"Hash algorithm not available: {algorithm}")
+
+def available_hash_algorithms():
+    """Algorithms usable here (xxh128 / blake3 need the optional packages)."""
+    optional = {'xxh128': xxhash, 'blake3': blake3}
+    return [name for name in HASH_ALGORITHMS if optional.get(name, True) is not None]
+
 # --- Top Check Functions (Must be picklable for Multiprocessing) ---
 def process_file_hashes(args):
     """
     Worker function to calculate hashes for a single file.
-    Args: (filepath, use_phash)
-    Returns: (filepath, size, md5, phash)
+    Args: (filepath, use_phash[, use_digest[, fast_decode[, algorithm[, single_read[, extra_hashes[, data]]]]]])
+    Returns: (filepath, size, digest, phash, extra)
+    digest is the raw 16-byte content digest (see new_hasher), phash a 64-bit
+    int (both compact to pickle and stored as-is in ScanStore). digest is None
+    when use_digest is False.
+    extra_hashes names more PERCEPTUAL_HASHES computed from the same decoded
+    image as the pHash; extra is the tuple of their 64-bit ints (None without pHash).
+    The file is not stat'ed here (the walker already did); size is the number
+    of bytes hashed, or None when no digest was requested.
+
+    single_read: when both hashes are needed the file is opened once and read
+    once. Files up to SINGLE_READ_MAX go into one buffer that feeds both the
+    digest and the decoder (BytesIO shares the bytes object, no copy); larger
+    files are hashed block by block and the decoder rewinds the same handle.
+
+    data: the file content already read by the I/O tier (see ReadAhead); the
+    file is then not opened at all.
+
+    Unreadable or undecodable files raise; process_batch records the failure.
     """
-    filepath, use_phash = args
-    if not os.path.exists(filepath):
-        return None
+    filepath, use_phash = args[:2]
+    use_digest = args[2] if len(args) > 2 else True
+    fast_decode = args[3] if len(args) > 3 else False
+    algorithm = args[4] if len(args) > 4 else DEFAULT_HASH_ALGORITHM
+    single_read = args[5] if len(args) > 5 else False
+    extra_hashes = args[6] if len(args) > 6 else ()
+    data = args[7] if len(args) > 7 else None
+    color = 'colorhash' in extra_hashes
     
-    res_md5 = None
+    res_digest = None
     res_phash = None
-    file_size = 0
+    res_extra = None
+    file_size = None
+
+    if data is not None:
+        if use_digest:
+            hasher = new_hasher(algorithm)
+            hasher.update(data)
+            res_digest = hasher.digest()
+            file_size = len(data)
+        if use_phash:
+            with open_for_phash(io.BytesIO(data), fast_decode, color) as img:
+                res_phash, res_extra = _perceptual_hashes(img, extra_hashes)
+        return (filepath, file_size, res_digest, res_phash, res_extra)
     
-    try:
-        file_size = os.path.getsize(filepath)
-        
-        # MD5
-        md5 = hashlib.md5()
+    if single_read and use_digest and use_phash:
+        hasher = new_hasher(algorithm)
+        with open(filepath, 'rb') as f:
+            if os.fstat(f.fileno()).st_size <= SINGLE_READ_MAX:
+                data = f.read()
+                hasher.update(data)
+                source = io.BytesIO(data)
+            else:
+                # Too large to buffer: stream the digest, then decode from the same handle
+                for block in iter(lambda: f.read(65536), b''):
+                    hasher.update(block)
+                f.seek(0)
+                source = f
+            file_size = source.seek(0, os.SEEK_END)
+            source.seek(0)
+            res_digest = hasher.digest()
+            with open_for_phash(source, fast_decode, color) as img:
+                res_phash, res_extra = _perceptual_hashes(img, extra_hashes)
+        return (filepath, file_size, res_digest, res_phash, res_extra)
+
+    # Content digest (MD5 by default)
+    if use_digest:
+        hasher = new_hasher(algorithm)
+        file_size = 0
         with open(filepath, 'rb') as f:
             for block in iter(lambda: f.read(65536), b''):
-                md5.update(block)
-        res_md5 = md5.hexdigest()
-        
-        # PHash
-        if use_phash:
-            with Image.open(filepath) as img:
-                res_phash = imagehash.phash(img)
-                
-    except Exception as e:
-        # print(f"Error processing {filepath}: {e}")
+                hasher.update(block)
+                file_size += len(block)
+        res_digest = hasher.digest()
+    
+    # PHash
+    if use_phash:
+        with open_for_phash(filepath, fast_decode, color) as img:
+            res_phash, res_extra = _perceptual_hashes(img, extra_hashes)
+
+    return (filepath, file_size, res_digest, res_phash, res_extra)
+
+def _perceptual_hashes(img, extra_hashes):
+    """
+    (pHash, tuple of the extra hashes) of one image; PIL decodes it once and
+    every hash reuses the pixels. With the DIHEDRAL_HASHES requested the pHash
+    and its variants come from dihedral_phashes (EXIF orientation applied).
+    """
+    variants = {}
+    if DIHEDRAL_HASHES[0] in extra_hashes:
+        hashes = dihedral_phashes(img, _exif_orientation(img))
+        phash = hashes[0]
+        variants = dict(zip(DIHEDRAL_HASHES, hashes[1:]))
+    else:
+        phash = phash_to_int(imagehash.phash(img))
+    return phash, tuple(variants[name] if name in variants else phash_to_int(PERCEPTUAL_HASHES[name](img))
+                        for name in extra_hashes)
+
+def dihedral_phashes(img, orientation=1):
+    """
+    pHashes of the 8 DIHEDRAL_VARIANTS of an image from one decode, one resize
+    and one DCT. Mirroring the pixel grid only flips the sign of every odd DCT
+    coefficient along that axis, and a transpose transposes the coefficients,
+    so each variant is a signed / transposed copy of the same 8x8 low-frequency
+    block, thresholded at its own median as in imagehash.phash.
+    orientation: EXIF Orientation tag; variant 0 is the image as displayed.
+    With orientation 1 it is bit for bit imagehash.phash(img).
+    """
+    import scipy.fftpack
+    pixels = np.asarray(img.convert('L').resize((32, 32), imagehash.ANTIALIAS))
+    dct = scipy.fftpack.dct(scipy.fftpack.dct(pixels, axis=0), axis=1)
+    upright = _dihedral_block(dct[:8, :8], EXIF_ORIENTATION_VARIANT.get(orientation, 0))
+
+    hashes = []
+    for variant in range(len(DIHEDRAL_VARIANTS)):
+        block = _dihedral_block(upright, variant)
+        bits = np.packbits((block > np.median(block)).ravel())
+        hashes.append(int.from_bytes(bits.tobytes(), 'big'))
+    return tuple(hashes)
+
+def _dihedral_block(block, variant):
+    """A DIHEDRAL_VARIANTS operation on the pixels, applied to their 8x8 DCT block."""
+    if variant >= 4:
+        block = block * _DCT_SIGNS  # Mirror left-right: odd horizontal frequencies change sign
+    for _ in range(variant % 4):
+        block = (block * _DCT_SIGNS).T  # Rotate 90 degrees CCW = mirror left-right, then transpose
+    return block
+
+def _exif_orientation(img):
+    """EXIF Orientation (1-8) of an image opened by open_for_phash, 1 if missing."""
+    orientation = img.info.get('exif_orientation')
+    if orientation is None:
+        try:
+            orientation = img.getexif().get(0x0112, 1)
+        except Exception:
+            orientation = 1
+    return orientation if orientation in EXIF_ORIENTATION_VARIANT else 1
+
+def process_batch(args):
+    """
+    Worker function running another worker over a chunk of tasks in one call.
+    Args: (worker, [task, ...][, shared memory name, spans])
+    Returns: (results, busy_seconds, errors)
+    results is aligned with the chunk, each entry the worker's result without
+    its leading filepath (the caller still has it), None on failure.
+    errors lists (filepath, exception type name, message) of the failed tasks.
+    With a shared memory block filled by ReadAhead, spans holds an (offset,
+    length) per task, or None where the worker reads the file itself; the
+    bytes are passed to the worker as the task's last argument.
+    """
+    worker, chunk = args[:2]
+    shm = _attach_shared_memory(args[2]) if len(args) > 2 else None
+    spans = args[3] if shm is not None else None
+    results = []
+    errors = []
+    start = time.perf_counter()
+    try:
+        for k, task in enumerate(chunk):
+            try:
+                if spans and spans[k] is not None:
+                    offset, length = spans[k]
+                    task = task + (bytes(shm.buf[offset:offset + length]),)
+                result = worker(task)
+            except Exception as e:
+                errors.append((task[0], type(e).__name__, str(e)))
+                result = None
+            results.append(result[1:] if result else None)
+    finally:
+        if shm is not None:
+            shm.close()
+    return results, time.perf_counter() - start, errors
+
+def _attach_shared_memory(name):
+    try:
+        # Python 3.13+: the creating process alone owns (and unlinks) the block
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+def process_partial_hash(args):
+    """
+    Worker function for the exact-match prefilter.
+    Hashes only the first and last PARTIAL_BLOCK bytes of a file.
+    Args: (filepath, size[, algorithm])
+    Returns: (filepath, partial, full_digest)
+    full_digest is set when the file is small enough that head + tail already
+    cover every byte, so it never needs a second read.
+    Unreadable files raise; process_batch records the failure.
+    """
+    filepath, size = args[:2]
+    algorithm = args[2] if len(args) > 2 else DEFAULT_HASH_ALGORITHM
+    with open(filepath, 'rb') as f:
+        if size <= 2 * PARTIAL_BLOCK:
+            hasher = new_hasher(algorithm)
+            hasher.update(f.read())
+            digest = hasher.digest()
+            return (filepath, digest, digest)
+        partial = new_hasher(algorithm)
+        partial.update(f.read(PARTIAL_BLOCK))
+        f.seek(-PARTIAL_BLOCK, os.SEEK_END)
+        partial.update(f.read(PARTIAL_BLOCK))
+        return (filepath, partial.digest(), None)
+
+def open_for_phash(filepath, fast_decode=False, color=False):
+    """
+    Open an image as pHash input (filepath may also be an open binary file).
+    fast_decode (opt-in) only affects JPEGs: it uses the embedded EXIF thumbnail
+    when it is large enough and has the same aspect ratio, otherwise it asks
+    libjpeg for a 1/8 scale draft (DCT scaling, grayscale unless color is set,
+    which colorhash needs). Since phash shrinks
+    everything to 32x32 anyway the hashes mostly agree with a full decode, but
+    not always bit for bit: expect a distance of 0-2 bits on most photos, so
+    exact pHash equality between fast and full decodes is not guaranteed
+    (see benchmarks/bench_decode.py).
+    """
+    img = Image.open(filepath)
+    if fast_decode and img.format == 'JPEG':
+        thumb = _exif_thumbnail(img)
+        if thumb is not None:
+            # The thumbnail has no EXIF of its own (see _exif_orientation)
+            thumb.info['exif_orientation'] = img.getexif().get(0x0112, 1)
+            img.close()
+            return thumb
+        img.draft('RGB' if color else 'L', (max(FAST_DECODE_MIN_EDGE, img.width // 8), max(FAST_DECODE_MIN_EDGE, img.height // 8)))
+    return img
+
+def _exif_thumbnail(img):
+    """Embedded EXIF JPEG thumbnail (IFD1) if usable for hashing, else None."""
+    try:
+        raw = img.info.get('exif')
+        if not raw:
+            return None
+        ifd1 = img.getexif().get_ifd(ExifTags.IFD.IFD1)
+        offset, length = ifd1.get(0x0201), ifd1.get(0x0202)  # JPEGInterchangeFormat(Length)
+        if not offset or not length:
+            return None
+        if raw.startswith(b'Exif\x00\x00'):
+            raw = raw[6:]  # offsets are relative to the TIFF header
+
+        thumb = Image.open(io.BytesIO(raw[offset:offset + length]))
+        if min(thumb.size) < FAST_DECODE_MIN_EDGE:
+            return None
+        # Letterboxed thumbnails (black bars) would hash differently
+        aspect = img.width / img.height
+        if abs(thumb.width / thumb.height - aspect) > 0.02 * aspect:
+            return None
+        thumb.load()
+        return thumb
+    except Exception:
         return None
 
-    return (filepath, file_size, res_md5, res_phash)
+class FileRecord:
+    """
+    Compact per-file record produced by the walker and carried through the
+    scan pipeline, so each file is stat'ed exactly once.
+    inode is 0 where the directory listing does not provide it (Windows).
+    """
+    __slots__ = ('path', 'size', 'mtime_ns', 'inode')
+
+    def __init__(self, path, size, mtime_ns, inode):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.inode = inode
+
+    def __repr__(self):
+        return f"FileRecord({self.path!r}, size={self.size})"
+
+def scan_tree(folder, should_stop=None):
+    """
+    Walk a folder with os.scandir and yield a FileRecord per image.
+    Size and mtime come from the DirEntry (free on Windows, one stat on POSIX)
+    and are never looked up again. Directory symlinks are not followed,
+    like os.walk.
+    """
+    stack = [folder]
+    while stack:
+        if should_stop and should_stop(): return
+        try:
+            it = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with it:
+            subdirs = []
+            for entry in it:
+                if should_stop and should_stop(): return
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                        continue
+                    if os.path.splitext(entry.name)[1].lower() not in IMAGE_EXTENSIONS:
+                        continue
+                    if not entry.is_file():
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                # On Windows DirEntry.inode() costs an extra stat; the cache
+                # key falls back to (size, mtime) there.
+                yield FileRecord(entry.path, st.st_size, st.st_mtime_ns, 0 if os.name == 'nt' else entry.inode())
+        # Keep a top-down, in-order traversal like os.walk
+        stack.extend(reversed(subdirs))
+
+class TaskStream:
+    """
+    Producer side of the streaming scan: a daemon thread consumes `entries`
+    (typically the lazy directory walker), turns each one into a worker task
+    with `prepare` (None = nothing to do) and puts it into a bounded queue.
+    The queue size gives back-pressure, so a fast walker cannot run ahead of
+    the pool by more than STREAM_QUEUE_SIZE files.
+    """
+    _END = object()
+
+    def __init__(self, entries, prepare, should_stop):
+        self.entries = entries
+        self.prepare = prepare
+        self.should_stop = should_stop
+        self.queue = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+        self.discovered = 0
+        self.error = None
+        self._ended = False
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _produce(self):
+        try:
+            for entry in self.entries:
+                if self.should_stop(): break
+                self.discovered += 1
+                task = self.prepare(entry)
+                if task is not None and not self._put(task):
+                    break
+        except Exception as e:
+            self.error = e
+        finally:
+            self._put(self._END)
+
+    def _put(self, item):
+        # Never block forever: the consumer may have stopped reading
+        while True:
+            try:
+                self.queue.put(item, timeout=STREAM_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                if self.should_stop():
+                    return False
+
+    def take(self, max_items, block=False):
+        """Return up to max_items queued tasks (may be empty)."""
+        chunk = []
+        try:
+            item = self.queue.get(timeout=STREAM_POLL_INTERVAL) if block else self.queue.get_nowait()
+            while True:
+                if item is self._END:
+                    self._ended = True
+                    break
+                chunk.append(item)
+                if len(chunk) >= max_items:
+                    break
+                item = self.queue.get_nowait()
+        except queue.Empty:
+            pass
+        return chunk
+
+    def finished(self):
+        """True once the producer is done and every task has been taken."""
+        if self._ended and self.error is not None:
+            raise self.error
+        return self._ended
+
+class ReadAhead:
+    """
+    I/O tier of the two-tier hash executor (see ImageScanner._run_parallel).
+
+    A dispatcher thread takes task chunks from next_chunk(), splits them so
+    that no chunk holds more than max_bytes of file data, gives each chunk
+    one shared memory block sized for its files and queues one read job per
+    file on `threads` reader threads. Once all files of a chunk are in its
+    block the chunk is ready for the CPU tier, the process pool, which hashes
+    from the block instead of reading the files (see process_batch).
+
+    At most max_bytes of file data (in total, peak_bytes records the
+    highest) and max_chunks chunks are held between reading and release(),
+    so slow hashing throttles the readers while slow storage leaves the pool
+    waiting; both waits are measured (throttled / starved seconds) to show
+    which tier limits the scan.
+
+    next_chunk() returns a list of tasks, [] when none is available yet, or
+    None when there are no more. size_of(task) is the expected file size.
+    Empty files, files above SINGLE_READ_MAX or max_bytes and files that
+    changed size or could not be read get no span: the pool worker reads
+    them itself (and reports a failure if it still cannot).
+    """
+
+    def __init__(self, next_chunk, size_of, threads, max_bytes, max_chunks, should_stop):
+        self.next_chunk = next_chunk
+        self.size_of = size_of
+        self.threads = threads
+        self.max_bytes = max_bytes
+        self.max_chunks = max_chunks
+        self.should_stop = should_stop
+        self.error = None
+        # Statistics (seconds / counts), see ImageScanner._run_parallel
+        self.busy = 0.0
+        self.throttled = 0.0
+        self.starved = 0.0
+        self.files_read = 0
+        self.bytes_read = 0
+        self.fallback = 0
+        self.peak_bytes = 0
+
+        self._cond = threading.Condition()
+        self._bytes = 0
+        self._chunks = 0
+        self._reading = 0
+        self._blocks = {}  # name -> (SharedMemory, reserved bytes) not yet released
+        self._done = False
+        self._closed = False
+        self._ready = queue.Queue()
+        self._readers = ThreadPoolExecutor(max_workers=threads)
+        self._thread = threading.Thread(target=self._dispatch, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _dispatch(self):
+        try:
+            while not self._closed and not self.should_stop():
+                chunk = self.next_chunk()
+                if chunk is None:
+                    break
+                for piece, spans, nbytes in self._split(chunk):
+                    if not self._read_chunk(piece, spans, nbytes):
+                        break
+        except Exception as e:
+            self.error = e
+        finally:
+            with self._cond:
+                self._done = True
+
+    def _split(self, chunk):
+        """Yield (tasks, spans, bytes) pieces of a chunk, each holding at most max_bytes of file data."""
+        largest = min(SINGLE_READ_MAX, self.max_bytes)
+        tasks, spans, nbytes = [], [], 0
+        for task in chunk:
+            size = self.size_of(task)
+            if not 0 < size <= largest:
+                tasks.append(task)
+                spans.append(None)
+                continue
+            if nbytes + size > self.max_bytes:
+                yield self._counted(tasks, spans, nbytes)
+                tasks, spans, nbytes = [], [], 0
+            tasks.append(task)
+            spans.append((nbytes, size))
+            nbytes += size
+        if tasks:
+            yield self._counted(tasks, spans, nbytes)
+
+    def _counted(self, tasks, spans, nbytes):
+        """Count the files of a piece left to the workers; the I/O threads update fallback under the same lock."""
+        fallback = spans.count(None)
+        if fallback:
+            with self._cond:
+                self.fallback += fallback
+        return tasks, spans, nbytes
+
+    def _read_chunk(self, chunk, spans, nbytes):
+        """Reserve, allocate and start reading one piece of a chunk. False if stopped."""
+        if not self._reserve(nbytes):
+            return False
+
+        shm = shared_memory.SharedMemory(create=True, size=max(1, nbytes))
+        jobs = [k for k, span in enumerate(spans) if span is not None]
+        left = [len(jobs)]
+        with self._cond:
+            self._blocks[shm.name] = (shm, nbytes)
+            self._reading += 1
+
+        def on_read(k, job):
+            ok = not job.cancelled() and job.exception() is None and job.result()
+            with self._cond:
+                if not ok:
+                    spans[k] = None
+                    self.fallback += 1
+                left[0] -= 1
+                if left[0]:
+                    return
+                self._ready.put((chunk, shm, spans))
+                self._reading -= 1
+
+        if not jobs:
+            with self._cond:
+                self._ready.put((chunk, shm, spans))
+                self._reading -= 1
+        for k in jobs:
+            job = self._readers.submit(self._read, chunk[k][0], shm, spans[k])
+            job.add_done_callback(lambda job, k=k: on_read(k, job))
+        return True
+
+    def _reserve(self, nbytes):
+        """Wait for room in the read-ahead budget. False if stopped meanwhile."""
+        with self._cond:
+            # _split keeps nbytes <= max_bytes, so an empty budget always admits it
+            while self._chunks >= self.max_chunks or self._bytes + nbytes > self.max_bytes:
+                if self._closed or self.should_stop():
+                    return False
+                start = time.perf_counter()
+                self._cond.wait(STREAM_POLL_INTERVAL)
+                self.throttled += time.perf_counter() - start
+            self._bytes += nbytes
+            self._chunks += 1
+            self.peak_bytes = max(self.peak_bytes, self._bytes)
+            return True
+
+    def _read(self, path, shm, span):
+        """Read one whole file into its span of the block. False if it has to be left to the worker."""
+        offset, size = span
+        start = time.perf_counter()
+        try:
+            with open(path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size != size:
+                    return False
+                view = shm.buf[offset:offset + size]
+                try:
+                    filled = 0
+                    while filled < size:
+                        n = f.readinto(view[filled:])
+                        if not n:
+                            return False
+                        filled += n
+                finally:
+                    view.release()
+            with self._cond:
+                self.files_read += 1
+                self.bytes_read += size
+            return True
+        except Exception:
+            return False
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._cond:
+                self.busy += elapsed
+
+    def take(self, block=False):
+        """Next (chunk, shared memory, spans) ready for the pool, or None. block waits up to STREAM_POLL_INTERVAL."""
+        start = time.perf_counter()
+        try:
+            return self._ready.get(timeout=STREAM_POLL_INTERVAL) if block else self._ready.get_nowait()
+        except queue.Empty:
+            return None
+        finally:
+            if block:
+                self.starved += time.perf_counter() - start
+
+    def finished(self):
+        """True once every chunk has been read and taken."""
+        if self.error is not None:
+            raise self.error
+        with self._cond:
+            return self._done and not self._reading and self._ready.empty()
+
+    def release(self, shm):
+        """Free a chunk's block once the pool is done with it."""
+        with self._cond:
+            _, nbytes = self._blocks.pop(shm.name, (None, 0))
+            self._bytes -= nbytes
+            self._chunks -= 1
+            self._cond.notify_all()
+        _discard_shared_memory(shm)
+
+    def close(self):
+        """Stop reading and free every block still held (also those of cancelled chunks)."""
+        with self._cond:
+            self._closed = True
+            blocks = [shm for shm, _ in self._blocks.values()]
+            self._blocks.clear()
+            self._cond.notify_all()
+        self._readers.shutdown(wait=False, cancel_futures=True)
+        for shm in blocks:
+            _discard_shared_memory(shm)
+
+def _discard_shared_memory(shm):
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+    try:
+        shm.close()
+    except BufferError:
+        pass  # A reader thread still holds a view; the mapping goes with it
+
+class DestinationNamer:
+    """
+    Collision-free destination paths, shared by the copy threads:
+    name.jpg, name_copy.jpg, name_copy2.jpg, ... skipping paths that exist on
+    disk or were already handed out. Files are still created exclusively, so a
+    name taken by someone else in the meantime is simply claimed again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._taken = set()
+
+    def claim(self, path):
+        base, ext = os.path.splitext(path)
+        with self._lock:
+            n = 0
+            candidate = path
+            while candidate in self._taken or os.path.lexists(candidate):
+                n += 1
+                candidate = f"{base}_copy{ext}" if n == 1 else f"{base}_copy{n}{ext}"
+            self._taken.add(candidate)
+            return candidate
+
+def available_copy_modes(source_dirs, dest_dir):
+    """COPY_MODES usable from source_dirs to dest_dir (link modes need a single filesystem)."""
+    probe = os.path.abspath(dest_dir)
+    while not os.path.exists(probe) and os.path.dirname(probe) != probe:
+        probe = os.path.dirname(probe)  # dest_dir may not exist yet
+    try:
+        device = os.stat(probe).st_dev
+        same_fs = all(os.stat(folder).st_dev == device for folder in source_dirs)
+    except OSError:
+        same_fs = False
+    return [mode for mode in COPY_MODES if same_fs or mode not in LINK_MODES]
+
+def _copy_data(fsrc, fdst, reflink=False):
+    """
+    Copy between open files: FICLONE (reflink) if asked, else copy_file_range
+    (in-kernel, may still share extents), else plain reads. Returns the mode used.
+    """
+    if reflink and fcntl is not None:
+        try:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+            return 'reflink'
+        except OSError:
+            pass  # Other filesystem or no reflink support
+    if hasattr(os, 'copy_file_range'):
+        copied = 0
+        try:
+            while True:
+                n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), COPY_BLOCK)
+                if n == 0:
+                    return 'copy'
+                copied += n
+        except OSError as e:
+            # Not supported here (old kernel, cross-device, ...): only safe to retry from the start
+            if copied or e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EPERM):
+                raise
+    shutil.copyfileobj(fsrc, fdst, COPY_BLOCK)
+    return 'copy'
+
+def place_file(src, dst, mode='copy'):
+    """
+    Create dst from src according to mode (see COPY_MODES), never overwriting:
+    raises FileExistsError if dst exists. 'copy' and 'reflink' keep the
+    timestamps like shutil.copy2. A hard link that the filesystem refuses falls
+    back to a copy. Returns the mode actually used.
+    src is checked before anything is created, so a missing or unreadable
+    source never leaves a dangling link behind.
+    """
+    os.stat(src)
+    if not os.access(src, os.R_OK):
+        raise PermissionError(errno.EACCES, os.strerror(errno.EACCES), src)
+    if mode == 'symlink':
+        os.symlink(os.path.abspath(src), dst)
+        return 'symlink'
+    if mode == 'hardlink':
+        try:
+            os.link(src, dst)
+            return 'hardlink'
+        except FileExistsError:
+            raise
+        except OSError:
+            pass  # Cross-device, FAT, some network shares, ...
+
+    with open(src, 'rb') as fsrc:
+        with open(dst, 'xb') as fdst:
+            try:
+                used = _copy_data(fsrc, fdst, reflink=(mode == 'reflink'))
+            except BaseException:
+                fdst.close()
+                os.remove(dst)  # No half-written files
+                raise
+    try:
+        shutil.copystat(src, dst)
+    except BaseException:
+        os.remove(dst)
+        raise
+    return used
+
+def _layout_path(path, roots):
+    """Destination path relative to the target folder: the file name, or its layout below the root it came from."""
+    path = os.path.abspath(path)
+    best = None
+    for root in roots:
+        try:
+            if os.path.commonpath([root, path]) == root and (best is None or len(root) > len(best)):
+                best = root
+        except ValueError:
+            pass  # Different drives
+    if best is None:
+        return os.path.basename(path)
+    rel = os.path.relpath(path, best)
+    # Several roots: keep them apart by their folder name
+    if len(roots) > 1 and os.path.basename(best):
+        rel = os.path.join(os.path.basename(best), rel)
+    return rel
+
+def phash_to_int(h):
+    """Pack an imagehash.ImageHash (8x8 bits) into a 64-bit int."""
+    return int(str(h), 16)
+
+def shard_of(path, shards):
+    """
+    Shard (0 .. shards-1) of a file path for a sharded library build. Based on
+    a digest of the path, not hash(), so every process and machine that sees
+    the archive under the same paths agrees on it.
+    """
+    digest = hashlib.blake2b(path.encode("utf-8", "surrogateescape"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % shards
 
 class ImageScanner:
-    def __init__(self, callback_progress=None):
+    def __init__(self, callback_progress=None, cache_path=None, fast_decode=False, streaming=False,
+                 walk_threads=DEFAULT_WALK_THREADS, hash_algorithm=DEFAULT_HASH_ALGORITHM, single_read=True,
+                 workers=None, metrics_listener=None, progress=None, cascade=DEFAULT_CASCADE,
+                 cascade_radii=None, rotation_invariant=False, read_threads=DEFAULT_READ_THREADS,
+                 read_ahead_bytes=READ_AHEAD_MAX_BYTES):
+        # Progress consumers, both optional (see _report):
+        # progress is a progress.ProgressChannel polled by the consumer (GUI),
+        # callback_progress(current, total, message) is called at most every
+        # CALLBACK_MIN_INTERVAL seconds per stage (CLI)
         self.callback_progress = callback_progress
+        self.progress = progress
+        self._last_callback = (None, 0.0)
         self.stop_requested = False
+        # Similarity cascade: hash names, candidates from the first, verified by
+        # the rest in order (see _cascade_verify). Must include 'phash'.
+        cascade = tuple(cascade)
+        unknown = [name for name in cascade if name not in PERCEPTUAL_HASHES]
+        if unknown or 'phash' not in cascade or len(set(cascade)) != len(cascade):
+            raise ValueError(f"Invalid cascade {cascade}: distinct names from {', '.join(PERCEPTUAL_HASHES)}, "
+                             "including phash")
+        self.cascade = cascade
+        self.cascade_radii = dict(DEFAULT_CASCADE_RADII, **(cascade_radii or {}))
+        # Later cascade stages, computed next to the pHash (from the same decode)
+        self.cascade_extras = tuple(name for name in cascade if name != 'phash')
+        # Also match rotated / mirrored copies: every file gets the pHashes of
+        # its 8 orientations (see dihedral_phashes). pHash-only cascade.
+        if rotation_invariant and self.cascade_extras:
+            raise ValueError("rotation_invariant only works with the phash cascade")
+        self.rotation_invariant = rotation_invariant
+        # Content digest used for exact matching (see new_hasher)
+        new_hasher(hash_algorithm)  # fail early if the backend is not installed
+        self.hash_algorithm = hash_algorithm
+        # Opt-in reduced-resolution JPEG decode for pHash (see open_for_phash)
+        self.fast_decode = fast_decode
+        # Read each file once for both digest and pHash (see process_file_hashes)
+        self.single_read = single_read
+        # Overlap directory walking with hashing (see hash_files)
+        self.streaming = streaming
+        # Hashing processes (None: all cores but one, see _run_parallel)
+        self.workers = workers
+        # I/O tier in front of them: file reading threads (0: the processes
+        # read the files) and their read-ahead limit in bytes (see ReadAhead)
+        self.read_threads = read_threads
+        self.read_ahead_bytes = read_ahead_bytes
+        # Threads used to walk several root folders at once (see iter_files)
+        self.walk_threads = walk_threads
+        # Optional persistent hash cache (see hashcache.HashCache)
+        self.cache = HashCache(cache_path) if cache_path else None
+        # Counters of the last exact-match prefilter (see _exact_candidates)
+        self.exact_stats = {}
+        # Per-phase timings, counters and failures; reset by each comparison
+        # and each incremental rescan.
+        # metrics_listener(event_dict) receives them live (see metrics.ScanMetrics)
+        self.metrics = ScanMetrics(metrics_listener)
         # Create a manager event for stopping child processes if needed, 
         # but pure pool shutdown is usually easier.
 
+    @property
+    def extra_hashes(self):
+        """Hashes stored next to the pHash: later cascade stages, then the DIHEDRAL_HASHES if rotation_invariant."""
+        return self.cascade_extras + (DIHEDRAL_HASHES if self.rotation_invariant else ())
+
+    @property
+    def phash_mode(self):
+        """
+        Decode mode stored with the pHashes ('full' / 'fast'). Rotation invariant
+        pHashes honour the EXIF orientation and get an '-oriented' suffix, so
+        they never mix with plain ones in the cache or a library. A fast decode
+        for a colorhash cascade keeps the colours ('fast-color', see open_for_phash).
+        """
+        mode = 'fast' if self.fast_decode else 'full'
+        if self.fast_decode and 'colorhash' in self.cascade_extras:
+            mode = 'fast-color'
+        return mode + '-oriented' if self.rotation_invariant else mode
+
+    def _report(self, key, current=0, total=0):
+        """
+        Publish progress. key is a languages status key formatted with
+        (current, total); the text is only built for callback_progress. With no
+        consumer attached this is two attribute checks.
+        """
+        if self.progress is not None:
+            self.progress.publish(key, current, total)
+        if self.callback_progress is not None:
+            now = time.monotonic()
+            last_key, last_time = self._last_callback
+            # Stage changes and the final count always go through
+            if key != last_key or current == total or now - last_time >= CALLBACK_MIN_INTERVAL:
+                self._last_callback = (key, now)
+                import languages
+                self.callback_progress(current, total, languages.get_text(key, current, total))
+
     def find_images(self, folder):
         """Recursively find all images in a folder."""
-        images = []
-        for root, _, files in os.walk(folder):
-            for file in files:
-                if self.stop_requested: return []
-                if os.path.splitext(file)[1].lower() in IMAGE_EXTENSIONS:
-                    images.append(os.path.join(root, file))
-        return images
+        images = [rec.path for rec in scan_tree(folder, lambda: self.stop_requested)]
+        return [] if self.stop_requested else images
 
-    def scan_folders_parallel(self, folder_list, use_phash=True, min_size=0, max_size=None):
+    def iter_files(self, folder_list, min_size=0, max_size=None):
         """
-        Scan a LIST of folders using Multiprocessing.
-        Returns a dict mapping filepath -> {'size': int, 'md5': str, 'phash': hash object}.
+        Lazily yield a FileRecord for every image of a LIST of folders
+        (deduplicated) that passes the size filter. The record carries the
+        size / mtime / inode captured once by the walker (see scan_tree), which
+        later serve as size source and cache key without another stat.
+        Several root folders are walked in parallel threads.
         """
-        results = {}
-        all_files = []
-        
-        # 1. Gather all files (Deduplicated)
+        roots = [folder for folder in folder_list if os.path.isdir(folder)]
+        if len(roots) > 1 and self.walk_threads > 1:
+            records = self._walk_parallel(roots)
+        else:
+            records = (rec for folder in roots for rec in scan_tree(folder, lambda: self.stop_requested))
+
         seen_files = set()
-        for folder in folder_list:
-            if self.stop_requested: return {}
-            if os.path.isdir(folder):
-                for f in self.find_images(folder):
-                    if f not in seen_files:
-                        all_files.append(f)
-                        seen_files.add(f)
-        
-        # 2. Pre-filter by size (Quick check before hashing)
-        tasks = []
-        for f in all_files:
-            if self.stop_requested: return {}
-            try:
-                size = os.path.getsize(f)
-                if size < min_size:
+        kept = 0
+        try:
+            for rec in records:
+                if self.stop_requested: return
+                if rec.path in seen_files:
                     continue
-                if max_size is not None and size > max_size:
+                seen_files.add(rec.path)
+                if rec.size < min_size:
                     continue
-                tasks.append((f, use_phash))
-            except:
-                continue
-                
-        total = len(tasks)
-        if total == 0:
-            return {}
+                if max_size is not None and rec.size > max_size:
+                    continue
+                kept += 1
+                yield rec
+        finally:
+            self.metrics.add('files_walked', len(seen_files))
+            self.metrics.add('files_size_filtered', len(seen_files) - kept)
+
+    def _walk_parallel(self, roots):
+        """Walk several root folders in a thread pool, yielding records as they arrive."""
+        records = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+        done = object()
+        closed = threading.Event()
+
+        def should_stop():
+            return self.stop_requested or closed.is_set()
+
+        def put(item):
+            # Never block forever: the consumer may be gone
+            while not closed.is_set():
+                try:
+                    records.put(item, timeout=STREAM_POLL_INTERVAL)
+                    return
+                except queue.Full:
+                    pass
+
+        def walk(folder):
+            try:
+                for rec in scan_tree(folder, should_stop):
+                    put(rec)
+            finally:
+                put(done)
+
+        walkers = ThreadPoolExecutor(max_workers=min(len(roots), self.walk_threads))
+        try:
+            for folder in roots:
+                walkers.submit(walk, folder)
+
+            remaining = len(roots)
+            while remaining:
+                rec = records.get()
+                if rec is done:
+                    remaining -= 1
+                elif not self.stop_requested:
+                    yield rec
+        finally:
+            # Also reached when the consumer abandons the generator early
+            closed.set()
+            walkers.shutdown(wait=False)
+
+    def _new_store(self):
+        return ScanStore(digest_algo=self.hash_algorithm, phash_mode=self.phash_mode,
+                         extra_hashes=self.extra_hashes)
+
+    def collect_files(self, folder_list, min_size=0, max_size=None):
+        """
+        Gather all images of a LIST of folders (deduplicated) that pass the size filter.
+        Returns a list of FileRecord, see iter_files.
+        """
+        with self.metrics.phase('walk'):
+            entries = list(self.iter_files(folder_list, min_size=min_size, max_size=max_size))
+        return [] if self.stop_requested else entries
+
+    def scan_folders_parallel(self, folder_list, use_phash=True, min_size=0, max_size=None, streaming=None,
+                              shard=None):
+        """
+        Scan a LIST of folders using Multiprocessing.
+        streaming: overlap the directory walk with hashing (default: self.streaming).
+        shard: (index, count) to hash only the files with shard_of(path, count) == index;
+               the others are walked but never opened.
+        Returns a ScanStore (columnar: paths, sizes, digests, pHashes).
+        """
+        if streaming is None:
+            streaming = self.streaming
+        if streaming:
+            entries = self.iter_files(folder_list, min_size=min_size, max_size=max_size)
+            if shard:
+                entries = (rec for rec in entries if shard_of(rec.path, shard[1]) == shard[0])
+            return self.hash_files(entries, use_phash=use_phash, streaming=True)
+
+        entries = self.collect_files(folder_list, min_size=min_size, max_size=max_size)
+        if self.stop_requested: return self._new_store()
+        if shard:
+            walked = len(entries)
+            entries = [rec for rec in entries if shard_of(rec.path, shard[1]) == shard[0]]
+            self.metrics.add('shard_files_skipped', walked - len(entries))
+        return self.hash_files(entries, use_phash=use_phash)
+
+    def hash_files(self, entries, use_phash=True, digest_paths=None, known_digest=None, streaming=False):
+        with self.metrics.phase('hash'):
+            return self._hash_files(entries, use_phash, digest_paths, known_digest, streaming)
+
+    def _hash_files(self, entries, use_phash, digest_paths, known_digest, streaming):
+        """
+        Hash collected files (see collect_files) in parallel.
+        digest_paths: set of paths that need a full-content MD5 (None = all of them).
+        known_digest: path -> digest already computed elsewhere (e.g. by the prefilter).
+        streaming: entries is consumed by a producer thread feeding the pool
+                   through a bounded queue, so hashing starts with the first file
+                   found (use with the lazy iter_files walker).
+        Files needing neither hash are returned without being opened.
+        Returns a ScanStore (empty if stopped).
+        """
+        store = self._new_store()
+        # The streaming producer thread adds cache hits while results arrive here
+        store_lock = threading.Lock()
+        known_digest = known_digest or {}
+        phash_mode = self.phash_mode
+        file_stats = {}
+
+        def prepare(entry):
+            """Return the worker task for an entry, or None if it is already resolved."""
+            f = entry.path
+            fdigest = known_digest.get(f)
+            use_digest = fdigest is None and (digest_paths is None or f in digest_paths)
+
+            if not use_digest and not use_phash:
+                with store_lock:
+                    store.append(f, entry.size, fdigest)
+                return None
+
+            # Serve unchanged files from the cache
+            if self.cache:
+                cached = self.cache.lookup(f, entry.size, entry.mtime_ns, entry.inode, use_phash, use_digest,
+                                           phash_mode, self.hash_algorithm, self.extra_hashes)
+                self.metrics.add('cache_hits' if cached else 'cache_misses')
+                if cached:
+                    cdigest, phash_hex, extra_hex = cached
+                    phash = int(phash_hex, 16) if (use_phash and phash_hex) else None
+                    with store_lock:
+                        store.append(f, entry.size,
+                                     fdigest if fdigest is not None else (bytes.fromhex(cdigest) if cdigest else None),
+                                     phash, [int(extra_hex[name], 16) for name in self.extra_hashes] if phash is not None else None)
+                    return None
+
+            file_stats[f] = (entry, fdigest)
+            return (f, use_phash, use_digest, self.fast_decode, self.hash_algorithm, self.single_read,
+                    self.extra_hashes)
+
+        def size_of(task):
+            return file_stats[task[0]][0].size
+
+        cache_batch = []
+
+        def on_result(result):
+            nonlocal cache_batch
+            fpath, fsize, fdigest, fphash, fextra = result
+            rec, prev_digest = file_stats.pop(fpath)
+            self.metrics.add('files_hashed')
+            if fsize is not None:
+                self.metrics.add('bytes_hashed', fsize)
+            if fphash is not None:
+                self.metrics.add('phashes_computed')
+            fdigest = fdigest or prev_digest
+            with store_lock:
+                store.append(fpath, rec.size, fdigest, fphash, fextra)
+            if self.cache:
+                cache_batch.append((fpath, rec.size, rec.mtime_ns, rec.inode,
+                                    fdigest.hex() if fdigest is not None else None, self.hash_algorithm,
+                                    format(fphash, '016x') if fphash is not None else None, phash_mode,
+                                    encode_extra(self.extra_hashes, fextra) if fphash is not None else None))
+                if len(cache_batch) >= 500:
+                    self.cache.store(cache_batch)
+                    cache_batch = []
+
+        if streaming:
+            tasks = TaskStream(entries, prepare, lambda: self.stop_requested)
+            finished = self._run_parallel(process_file_hashes, tasks, on_result, "status_streaming", 'hash', size_of)
+        else:
+            tasks = []
+            for entry in entries:
+                if self.stop_requested: return self._new_store()
+                task = prepare(entry)
+                if task:
+                    tasks.append(task)
+            finished = self._run_parallel(process_file_hashes, tasks, on_result, "status_analyzing", 'hash', size_of)
+
+        # Whatever was hashed so far is still valid, even after a stop
+        if self.cache:
+            self.cache.store(cache_batch)
+
+        return store if finished and not self.stop_requested else self._new_store()
+
+    def _run_parallel(self, worker, tasks, on_result, status_key, stage, size_of=None):
+        """
+        Run a top-level worker function over tasks in the process pool.
+        stage names the work in the metrics (pool utilisation, failures).
+        tasks: a list, or a TaskStream whose length is not known up front.
+        Tasks are sent in chunks (one pool call per chunk, see process_batch) and
+        only a bounded number of chunks is in flight at any time, so memory does
+        not grow with the number of files.
+        size_of(task): expected size of the task's file. Given, and with
+        self.read_threads set, the files are read by a ReadAhead thread tier
+        into shared memory and the pool only decodes / hashes; the I/O tier
+        is reported as pool '<stage>_io' in the metrics.
+        Each non-None result is passed to on_result (in the calling thread).
+        Returns False if a stop was requested.
+        """
+        stream = tasks if isinstance(tasks, TaskStream) else None
+        if stream is None and len(tasks) == 0:
+            return True
 
-        # 3. Process in Parallel
         # Use slightly less than max cores to keep UI responsive
-        max_workers = max(1, multiprocessing.cpu_count() - 1)
-        
-        with ProcessPoolExecutor(max_workers=max_workers) as executor:
-            # Submit all
-            futures = [executor.submit(process_file_hashes, task) for task in tasks]
-            
-            for i, future in enumerate(as_completed(futures)):
-                if self.stop_requested:
-                    executor.shutdown(wait=False, cancel_futures=True)
-                    return {}
-                    
-                result = future.result()
-                if result:
-                    fpath, fsize, fmd5, fphash = result
-                    results[fpath] = {
-                        'path': fpath,
-                        'size': fsize,
-                        'md5': fmd5,
-                        'phash': fphash
-                    }
-                
-                if self.callback_progress:
-                    # Update progress every few items to avoid flooding UI queue
-                    if i % 5 == 0 or i == total - 1:
-                        import languages
-                        self.callback_progress(i + 1, total, languages.get_text("status_analyzing", i+1, total))
-
-        return results
-
-    def compare_folders(self, folders_a, folders_b, threshold=0.90, check_similar=True, min_size=0, max_size=None):
+        max_workers = self.workers or max(1, multiprocessing.cpu_count() - 1)
+        max_in_flight = max_workers * CHUNKS_IN_FLIGHT_PER_WORKER
+
+        if stream is None:
+            total = len(tasks)
+            # Small enough that every worker gets several chunks, big enough to
+            # amortize the per-call pickling / IPC overhead
+            chunk_size = max(1, min(MAX_CHUNK_SIZE, total // (max_workers * 4)))
+            chunks = (tasks[i:i + chunk_size] for i in range(0, total, chunk_size))
+        else:
+            total = None
+            stream.start()
+
+        reader = None
+        if size_of is not None and self.read_threads:
+            if stream is None:
+                next_chunk = lambda: next(chunks, None)
+            else:
+                next_chunk = lambda: None if stream.finished() else stream.take(MAX_CHUNK_SIZE, block=True)
+            # Read one window ahead of the chunks the pool is working on
+            reader = ReadAhead(next_chunk, size_of, self.read_threads, self.read_ahead_bytes, 2 * max_in_flight,
+                               lambda: self.stop_requested)
+
+        done_count = 0
+        started = time.perf_counter()
+        busy = 0.0
+
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                if reader is not None:
+                    # Fork the workers before the reader threads exist: a child forked
+                    # while a reader holds a lock (e.g. the shared memory tracker's)
+                    # would inherit it locked. The tracker itself must be running
+                    # first, or every worker starts its own one
+                    if os.name == 'posix':
+                        resource_tracker.ensure_running()
+                    executor.submit(int)
+                    reader.start()
+                in_flight = set()
+                chunk_of = {}
+                exhausted = False
+
+                while in_flight or not exhausted:
+                    # Top up the window
+                    while not exhausted and len(in_flight) < max_in_flight:
+                        shm = None
+                        if reader is not None:
+                            ready = reader.take(block=not in_flight)
+                            exhausted = ready is None and reader.finished()
+                            if ready is None:
+                                break
+                            chunk, shm, spans = ready
+                        elif stream is None:
+                            chunk = next(chunks, None)
+                            exhausted = chunk is None
+                        else:
+                            # Block briefly only when the pool would otherwise sit idle
+                            chunk = stream.take(MAX_CHUNK_SIZE, block=not in_flight)
+                            exhausted = stream.finished()
+                        if not chunk:
+                            break
+                        args = (worker, chunk) if shm is None else (worker, chunk, shm.name, spans)
+                        future = executor.submit(process_batch, args)
+                        chunk_of[future] = (chunk, shm)
+                        in_flight.add(future)
+
+                    if self.stop_requested:
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        return False
+
+                    if not in_flight:
+                        continue
+
+                    # While streaming, wake up regularly to pick up newly found files
+                    finished, in_flight = wait(in_flight, timeout=STREAM_POLL_INTERVAL if stream else None,
+                                               return_when=FIRST_COMPLETED)
+
+                    for future in finished:
+                        chunk, shm = chunk_of.pop(future)
+                        if shm is not None:
+                            reader.release(shm)
+                        results, chunk_busy, errors = future.result()
+                        busy += chunk_busy
+                        for path, exc_type, message in errors:
+                            self.metrics.failure(stage, path, exc_type, message)
+                        for task, result in zip(chunk, results):
+                            if result:
+                                on_result((task[0],) + result)
+                        done_count += len(chunk)
+
+                    if finished:
+                        self._report(status_key, done_count, total if stream is None else stream.discovered)
+        finally:
+            wall = time.perf_counter() - started
+            self.metrics.pool(stage, wall, busy, max_workers, done_count)
+            if reader is not None:
+                reader.close()
+                self.metrics.pool(stage + '_io', wall, reader.busy, reader.threads, reader.files_read)
+                self.metrics.add('read_ahead_bytes', reader.bytes_read)
+                self.metrics.add('read_ahead_fallback', reader.fallback)
+                self.metrics.add('read_ahead_peak_bytes', reader.peak_bytes)
+                # Which tier waited on the other: readers on the pool / the pool on the readers
+                self.metrics.add('read_ahead_throttled_ms', int(reader.throttled * 1000))
+                self.metrics.add('pool_starved_ms', int(reader.starved * 1000))
+
+        return True
+
+    def _exact_candidates(self, entries_a, entries_b=None):
         """
-        Optimized comparison.
-        1. Exact Match: Group by FILE SIZE first. MD5 compare only if size matches.
-           (Note: Since we already calculated MD5 for everything in scan phase, we can just map MD5->Files)
-        2. Similar Match: Optimized N*N loop (TODO: BK-Tree overkill for now, but skipping exact matches helps)
+        Exact-match prefilter: only files that can have an identical twin get a
+        full-content hash.
+        1. Group by size and drop sizes that cannot collide
+           (self compare: unique sizes; A vs B: sizes missing on one side).
+        2. Hash the first/last 64 KB of the remaining files.
+        3. Full hash only where (size, partial hash) still collides.
+        Returns (digest_paths, known_digest) for hash_files.
         """
-        # Scan A
-        if self.callback_progress:
-            import languages
-            self.callback_progress(0, 0, languages.get_text("status_scanning_a"))
-        data_a = self.scan_folders_parallel(folders_a, use_phash=check_similar, min_size=min_size, max_size=max_size)
-        if self.stop_requested: return [], []
+        groups = [entries_a] if entries_b is None else [entries_a, entries_b]
 
-        # Scan B or Self
-        self_compare = False
-        if folders_b:
-            if self.callback_progress:
-                import languages
-                self.callback_progress(0, 0, languages.get_text("status_scanning_b"))
-            data_b = self.scan_folders_parallel(folders_b, use_phash=check_similar, min_size=min_size, max_size=max_size)
-            if self.stop_requested: return [], []
-            
-            source_list = list(data_a.values())
-            target_list = list(data_b.values())
+        def collides(members):
+            if len(members) == 1:
+                return len(members[0]) >= 2
+            return all(members)
+
+        by_size = {}
+        for g, entries in enumerate(groups):
+            for rec in entries:
+                by_size.setdefault(rec.size, [[] for _ in groups])[g].append(rec)
+
+        digest_paths = set()
+        known_digest = {}
+        partial_tasks = []
+        partial_group = {}
+        candidates = 0
+
+        for size, members in by_size.items():
+            if not collides(members):
+                continue
+            bucket = [(g, rec) for g, group in enumerate(members) for rec in group]
+            candidates += len(bucket)
+
+            # A cached full hash in the bucket has no partial to compare with,
+            # so the whole bucket goes straight to the full-hash stage.
+            if self.cache and any(self.cache.peek(rec.path, rec.size, rec.mtime_ns, rec.inode, use_digest=True,
+                                                  digest_algo=self.hash_algorithm)
+                                  for _, rec in bucket):
+                digest_paths.update(rec.path for _, rec in bucket)
+                continue
+
+            for g, rec in bucket:
+                partial_group[rec.path] = (g, size)
+                partial_tasks.append((rec.path, size, self.hash_algorithm))
+
+        by_partial = {}
+
+        def on_result(result):
+            fpath, partial, full_digest = result
+            g, size = partial_group[fpath]
+            if full_digest:
+                known_digest[fpath] = full_digest
+            by_partial.setdefault((size, partial), [[] for _ in groups])[g].append(fpath)
+
+        if not self._run_parallel(process_partial_hash, partial_tasks, on_result, "status_prefilter", 'prefilter'):
+            return set(), {}
+
+        for members in by_partial.values():
+            if collides(members):
+                digest_paths.update(f for group in members for f in group if f not in known_digest)
+
+        self.exact_stats = {
+            'files': sum(len(entries) for entries in groups),
+            'size_candidates': candidates,
+            'partial_hashed': len(partial_tasks),
+            'full_hash_candidates': len(digest_paths),
+        }
+        return digest_paths, known_digest
+
+    def compare_folders(self, folders_a, folders_b, threshold=0.90, check_similar=True, min_size=0, max_size=None,
+                        index_type='auto', library=None):
+        """
+        Compare two folder groups (or group A with itself when folders_b is empty).
+        Returns (matches, unique_in_a); see iter_compare for the algorithm.
+        """
+        matches = []
+        unique_in_a = []
+        for kind, item in self.iter_compare(folders_a, folders_b, threshold, check_similar, min_size, max_size,
+                                            index_type, library):
+            if kind == 'match':
+                matches.append(item)
+            else:
+                unique_in_a.append(item)
+        return matches, unique_in_a
+
+    def iter_compare(self, folders_a, folders_b, threshold=0.90, check_similar=True, min_size=0, max_size=None,
+                     index_type='auto', library=None):
+        """
+        Streaming form of compare_folders: yields ('match', match_dict) as soon
+        as a match is found, then ('unique', path) for every file of A without
+        a match. Nothing is yielded when the scan is stopped before comparing.
+
+        library: a ScanStore loaded with load_library() used as group B instead
+        of scanning folders_b; B's files are not touched at all.
+
+        Optimized comparison.
+        1. Exact Match: Group by FILE SIZE first, then a head/tail partial hash.
+           Full content digest (self.hash_algorithm, MD5 by default) only for
+           files that still collide (see _exact_candidates), then map digest->Files.
+        2. Similar Match: Near-neighbour search over the 64-bit pHashes (see hashindex).
+           threshold maps to a Hamming radius; index_type is 'auto', 'mih', 'bktree',
+           'numpy' (vectorized exhaustive kernel) or 'linear'.
+           With a longer self.cascade (e.g. ('dhash', 'phash', 'whash')) the
+           search runs on the first hash and each later hash only checks the
+           pairs that survived the previous one (see _cascade_verify).
+           With self.rotation_invariant the pHashes of A are searched against
+           all 8 orientations of B; a match against a rotated / mirrored copy
+           carries match['orientation'] (the DIHEDRAL_VARIANTS name that turns
+           B into A).
+        """
+        self.metrics.reset()
+        if library is not None:
+            self._check_library(library, check_similar)
+            store_a, store_b = self._scan_against_library(folders_a, library, check_similar, min_size, max_size)
+        elif self.streaming:
+            # Streaming: hash while walking. There is no complete size table up
+            # front, so the exact-match prefilter is skipped (full MD5 for all).
+            store_a, store_b = self._scan_streaming(folders_a, folders_b, check_similar, min_size, max_size)
         else:
-            self_compare = True
-            source_list = list(data_a.values())
-            target_list = source_list
+            store_a, store_b = self._scan_prefiltered(folders_a, folders_b, check_similar, min_size, max_size)
+        if self.stop_requested: return
+
+        self_compare = store_b is None
+        if self_compare:
+            store_b = store_a
+        elif store_a.digest_algo != store_b.digest_algo:
+            raise ValueError(f"Cannot compare {store_a.digest_algo} digests with {store_b.digest_algo} digests")
         
-        matches = []
-        matched_a_paths = set()
+        matched_a_rows = set()
         
         # --- Comparison Logic ---
         
         # Strategy:
         # A. Find Exact Matches using Dictionary (O(N)) - Extremely Fast
-        # Map: MD5 -> [List of Files in B]
-        
-        map_b_md5 = {}
-        target_indices = range(len(target_list))
-        
-        # If self compare, we need careful indexing
-        # Construct index for B
-        if not self_compare:
-            for img in target_list:
-                if img['md5']:
-                    if img['md5'] not in map_b_md5:
-                        map_b_md5[img['md5']] = []
-                    map_b_md5[img['md5']].append(img)
-
-        total_comparisons = len(source_list) * len(target_list) if not self_compare else (len(source_list)**2)//2
-        processed = 0
-        
-        # We will iterate through A
-        for i, img1 in enumerate(source_list):
-            if self.stop_requested: break
-            
-            # --- 1. Exact Match Check (Fast) ---
-            found_exact = False
-            if img1['md5']:
+        # Map: digest -> [rows], one match group per shared digest
+        # B. Find Similar Matches with a Hamming-radius search over packed pHashes
+
+        # --- 1. Exact Match Check (Fast) ---
+        with self.metrics.phase('compare_exact'):
+            map_a_digest = store_a.digest_index()
+            map_b_digest = map_a_digest if self_compare else store_b.digest_index()
+
+            for digest, rows_a in map_a_digest.items():
+                if self.stop_requested: break
                 if self_compare:
-                    # Search rest of list
-                    for j in range(i + 1, len(source_list)):
-                        img2 = source_list[j]
-                        if img1['md5'] == img2['md5']:
-                            matches.append(self._make_match(img1, img2, "完全相同", 100.0))
-                            matched_a_paths.add(img1['path'])
-                            matched_a_paths.add(img2['path'])
+                    # Self compare: every digest shared by 2+ files is one group
+                    if len(rows_a) < 2:
+                        continue
+                    self.metrics.add('exact_groups')
+                    yield 'match', self._make_group([store_a.paths[r] for r in rows_a], [], "完全相同")
                 else:
-                    # Look up in map
-                    if img1['md5'] in map_b_md5:
-                        for img2 in map_b_md5[img1['md5']]:
-                            matches.append(self._make_match(img1, img2, "完全相同", 100.0))
-                            matched_a_paths.add(img1['path'])
-            
-            # --- 2. Similarity Check (Slow, O(N*N)) ---
-            # Only if requested AND (optionally skip if already exact match? Users might want both)
-            # Users usually care about similarity if *not* exact. 
-            # But let's check anyway or strictly follow mode.
-            if check_similar and img1['phash']:
-                # For self compare
-                start_idx = i + 1 if self_compare else 0
-                target_subset = source_list if self_compare else target_list
-                
-                # To speed up, we don't compare with self or exact matches again if possible?
-                # Actually, phash check is independent.
-                
-                for j in range(start_idx, len(target_subset)):
-                    if self_compare and i == j: continue # Should be covered by start_idx
-                    
-                    img2 = target_subset[j]
-                    
-                    # Optimization: If sizes are excessively different, visual similarity is unlikely to be high?
-                    # Not necessarily true (resize).
-                    
-                    # Optimization: Skip if we already found an Exact Match between these two?
-                    # We can't easily know if *this specific pair* was exact match without storing pairs.
-                    if img1['md5'] == img2['md5']:
-                        continue # Already captured as exact match (MD5 implies PHash sameness)
-
-                    if img2['phash']:
-                        score = self._calc_similarity(img1['phash'], img2['phash'])
-                        if score >= (threshold * 100):
-                            matches.append(self._make_match(img1, img2, "視覺相似", score))
-                            matched_a_paths.add(img1['path'])
-                            if self_compare:
-                                matched_a_paths.add(img2['path'])
-
-            # Rough progress update (batching)
-            processed += len(target_list) if not self_compare else (len(source_list) - i)
-            if i % 10 == 0 and self.callback_progress:
-                import languages
-                self.callback_progress(min(processed, total_comparisons), total_comparisons, languages.get_text("status_comparing", i, len(source_list)))
+                    rows_b = map_b_digest.get(digest)
+                    if not rows_b:
+                        continue
+                    self.metrics.add('exact_groups')
+                    yield 'match', self._make_group([store_a.paths[r] for r in rows_a],
+                                                     [store_b.paths[r] for r in rows_b], "完全相同")
+                matched_a_rows.update(rows_a)
+
+        total = len(store_a)
+
+        # --- 2. Similarity Check (Index / vectorized search) ---
+        # Users usually care about similarity if *not* exact, so pairs with the
+        # same digest are skipped below (MD5 implies PHash sameness).
+        if check_similar and not self.stop_requested:
+            with self.metrics.phase('compare_similar'):
+                radii = dict(self.cascade_radii, phash=threshold_to_radius(threshold))
+                first = self.cascade[0]
+                packed_a = store_a.packed_hashes(first)
+                packed_b = None if self_compare else store_b.packed_hashes(first)
+                n_a = len(packed_a[0])
+                n_b = n_a if self_compare else len(packed_b[0])
+                if self.rotation_invariant:
+                    # Target: every orientation of B, at position row * 8 + variant
+                    packed_b = store_b.packed_columns(('phash',) + DIHEDRAL_HASHES)
+                # Pairs an all-pairs comparison would have to check
+                self.metrics.add('similarity_pair_space', n_a * (n_a - 1) // 2 if self_compare else n_a * n_b)
+                # Full columns of the verification stages, indexed by row
+                columns = {}
+                for name in self.cascade[1:]:
+                    column_a = store_a.hashes(name)
+                    columns[name] = (column_a, column_a if self_compare else store_b.hashes(name))
+                pair_batches = search_pairs(index_type, packed_a, packed_b, radii[first],
+                                            self_compare=self_compare and not self.rotation_invariant)
+                if self.rotation_invariant:
+                    # Self compare: both directions of a pair are searched, keep the closer one
+                    pair_batches = fold_variant_batches(pair_batches, len(DIHEDRAL_VARIANTS),
+                                                        DIHEDRAL_INVERSE if self_compare else None)
+                last_done = -1
+                for done, pairs, *oriented in pair_batches:
+                    if self.stop_requested: break
+
+                    orientation = {}
+                    if self.rotation_invariant:
+                        orientation, hits = oriented
+                        self.metrics.add('oriented_candidates', hits)
+
+                    for i, j, dist in self._cascade_verify(pairs, columns, radii):
+                        digest = store_a.digest(i)
+                        if digest is not None and digest == store_b.digest(j):
+                            self.metrics.add('similar_pairs_skipped_exact')
+                            continue # Already captured as exact match
+
+                        self.metrics.add('similar_pairs')
+                        score = self._score_from_distance(dist)
+                        match = self._make_match(store_a.paths[i], store_b.paths[j], "視覺相似", score)
+                        if orientation.get((i, j)):
+                            self.metrics.add('similar_pairs_oriented')
+                            match['orientation'] = DIHEDRAL_VARIANTS[orientation[(i, j)]]
+                        yield 'match', match
+                        matched_a_rows.add(i)
+                        if self_compare:
+                            matched_a_rows.add(j)
+
+                    if done != last_done:
+                        last_done = done
+                        self._report("status_comparing", done, total)
         
-        if self.callback_progress:
-            import languages
-            self.callback_progress(total_comparisons, total_comparisons, languages.get_text("status_finished"))
+        self._report("status_finished", total, total)
 
-        unique_in_a = [img['path'] for img in source_list if img['path'] not in matched_a_paths]
-        return matches, unique_in_a
+        for row, path in enumerate(store_a.paths):
+            if row not in matched_a_rows:
+                yield 'unique', path
+
+    def _cascade_verify(self, pairs, columns, radii):
+        """
+        Run candidate pairs (i, j, distance of the first cascade hash) through
+        the later cascade stages, each stage only checking the survivors of the
+        previous one (vectorized per batch). Counts the pairs entering and
+        pruned by every stage in the metrics (cascade_<hash>_candidates /
+        cascade_<hash>_pruned). Returns (i, j, pHash distance) of the pairs
+        that pass every stage.
+        """
+        first = self.cascade[0]
+        self.metrics.add(f'cascade_{first}_candidates', len(pairs))
+        if len(self.cascade) == 1 or not pairs:
+            return pairs
+
+        ii = np.fromiter((p[0] for p in pairs), dtype=np.int64, count=len(pairs))
+        jj = np.fromiter((p[1] for p in pairs), dtype=np.int64, count=len(pairs))
+        phash_dist = np.fromiter((p[2] for p in pairs), dtype=np.int64, count=len(pairs)) if first == 'phash' else None
+        for name in self.cascade[1:]:
+            column_a, column_b = columns[name]
+            dist = popcount64(column_a[ii] ^ column_b[jj])
+            keep = dist <= radii[name]
+            self.metrics.add(f'cascade_{name}_candidates', len(ii))
+            self.metrics.add(f'cascade_{name}_pruned', len(ii) - int(keep.sum()))
+            ii, jj = ii[keep], jj[keep]
+            phash_dist = dist[keep] if name == 'phash' else (phash_dist[keep] if phash_dist is not None else None)
+            if not len(ii):
+                return []
+        return list(zip(ii.tolist(), jj.tolist(), phash_dist.tolist()))
 
-    def _make_match(self, img1, img2, mtype, score):
+    def _scan_prefiltered(self, folders_a, folders_b, check_similar, min_size, max_size):
+        """Walk both groups, run the exact-match prefilter, then hash. Returns (store_a, store_b or None)."""
+        # Gather A and B (walk + stat only, nothing is read yet)
+        self._report("status_scanning_a")
+        entries_a = self.collect_files(folders_a, min_size=min_size, max_size=max_size)
+        if self.stop_requested: return self._new_store(), None
+
+        # Scan B or Self
+        entries_b = None
+        if folders_b:
+            self._report("status_scanning_b")
+            entries_b = self.collect_files(folders_b, min_size=min_size, max_size=max_size)
+            if self.stop_requested: return self._new_store(), None
+
+        # Exact-match prefilter: decide which files need a full-content hash
+        with self.metrics.phase('prefilter'):
+            digest_paths, known_digest = self._exact_candidates(entries_a, entries_b)
+        if self.stop_requested: return self._new_store(), None
+
+        # Hash A
+        self._report("status_scanning_a")
+        data_a = self.hash_files(entries_a, use_phash=check_similar, digest_paths=digest_paths, known_digest=known_digest)
+        if self.stop_requested or entries_b is None: return data_a, None
+
+        # Hash B
+        self._report("status_scanning_b")
+        data_b = self.hash_files(entries_b, use_phash=check_similar, digest_paths=digest_paths, known_digest=known_digest)
+        return data_a, data_b
+
+    def _scan_against_library(self, folders_a, library, check_similar, min_size, max_size):
+        """
+        Walk and hash group A only. The library already holds every digest of B,
+        so A needs a full-content hash only where its size occurs in the library.
+        Returns (store_a, library).
+        """
+        self._report("status_scanning_a")
+        entries_a = self.collect_files(folders_a, min_size=min_size, max_size=max_size)
+        if self.stop_requested: return self._new_store(), None
+
+        library_sizes = set(library.sizes()[library.digest_mask()].tolist())
+        digest_paths = {rec.path for rec in entries_a if rec.size in library_sizes}
+        self.exact_stats = {
+            'files': len(entries_a),
+            'size_candidates': len(digest_paths),
+            'partial_hashed': 0,
+            'full_hash_candidates': len(digest_paths),
+        }
+        data_a = self.hash_files(entries_a, use_phash=check_similar, digest_paths=digest_paths)
+        return data_a, library
+
+    def _check_library(self, library, check_similar):
+        if library.digest_algo != self.hash_algorithm:
+            raise ValueError(f"Library was built with {library.digest_algo}, scanner uses {self.hash_algorithm}")
+        if check_similar and library.phash_mode != self.phash_mode:
+            raise ValueError(f"Library pHashes use {library.phash_mode} decode; rebuild it or match fast_decode "
+                             "and rotation_invariant")
+        use_phash = library.meta.get('use_phash')
+        if use_phash is None:
+            use_phash = not len(library) or bool(library.phash_mask().any())  # Index written before use_phash was kept
+        if check_similar and not use_phash:
+            raise ValueError("Library was built without pHashes (exact only); rebuild it with pHashes "
+                             "or compare exact only")
+        missing = [name for name in self.extra_hashes if name not in library.extra_hashes]
+        if check_similar and missing:
+            raise ValueError(f"Library has no {', '.join(missing)} hashes; rebuild it with the same cascade "
+                             "and rotation_invariant")
+
+    def build_library(self, folder_list, path, min_size=0, max_size=None, use_phash=True, shard=None):
+        """
+        Scan a folder set (typically the archive, group B) and save it as a
+        library index file (see ScanStore.save). Returns the ScanStore, or None
+        if stopped.
+
+        shard: (index, count) to index only that shard of the files (see
+        shard_of), so count processes or machines can each build one part
+        side by side; merge_libraries() then joins the parts.
+        """
+        if shard is not None:
+            index, count = shard
+            if not 0 <= index < count:
+                raise ValueError(f"Invalid shard {index}/{count}")
+        store = self.scan_folders_parallel(folder_list, use_phash=use_phash, min_size=min_size, max_size=max_size,
+                                           shard=shard)
+        if self.stop_requested:
+            return None
+        meta = {'folders': list(folder_list), 'min_size': min_size, 'max_size': max_size, 'use_phash': use_phash}
+        if shard is not None:
+            meta['shard'] = list(shard)
+        store.save(path, meta=meta)
+        return store
+
+    def merge_libraries(self, part_paths, path):
+        """
+        Join the shard parts written by build_library(shard=...) into one
+        library index file at path, usable as compare_folders(library=...).
+        The parts must be the complete set 0 .. count-1 of one sharded build
+        (same folders and size filter). Returns the merged ScanStore.
+        """
+        if not part_paths:
+            raise ValueError("No shard parts to merge")
+        parts = [ScanStore.load(part) for part in part_paths]
+        try:
+            by_index = {}
+            for part_path, part in zip(part_paths, parts):
+                shard = part.meta.get('shard')
+                if shard is None:
+                    raise ValueError(f"{part_path} is not a shard part (built without a shard)")
+                if shard[0] in by_index:
+                    raise ValueError(f"Shard {shard[0]}/{shard[1]} given twice")
+                by_index[shard[0]] = part
+            first = parts[0].meta
+            count = first['shard'][1]
+            for part_path, part in zip(part_paths, parts):
+                meta = part.meta
+                if meta['shard'][1] != count or any(meta.get(key) != first.get(key)
+                                                    for key in ('folders', 'min_size', 'max_size', 'use_phash')):
+                    raise ValueError(f"{part_path} belongs to a different sharded build")
+            missing = [str(index) for index in range(count) if index not in by_index]
+            if missing:
+                raise ValueError(f"Missing shard part(s) {', '.join(missing)} of {count}")
+
+            store = ScanStore.merge(by_index[index] for index in range(count))
+            store.save(path, meta={'folders': first.get('folders'), 'min_size': first.get('min_size'),
+                                   'max_size': first.get('max_size'), 'use_phash': first.get('use_phash'),
+                                   'shards': count})
+        finally:
+            for part in parts:
+                part.close()
+        return store
+
+    def load_library(self, path):
+        """Open a library index file (mmap, near-instant). Pass it to compare_folders(library=...)."""
+        return ScanStore.load(path)
+
+    def _scan_streaming(self, folders_a, folders_b, check_similar, min_size, max_size):
+        """Walk and hash each group in one streaming pass. Returns (store_a, store_b or None)."""
+        self._report("status_scanning_a")
+        data_a = self.scan_folders_parallel(folders_a, use_phash=check_similar, min_size=min_size,
+                                            max_size=max_size, streaming=True)
+        if self.stop_requested or not folders_b: return data_a, None
+
+        self._report("status_scanning_b")
+        data_b = self.scan_folders_parallel(folders_b, use_phash=check_similar, min_size=min_size,
+                                            max_size=max_size, streaming=True)
+        return data_a, data_b
+
+    def copy_files(self, paths, dest_dir, mode='copy', roots=None, threads=DEFAULT_COPY_THREADS):
+        """
+        Copy (or link, see COPY_MODES / place_file) files into dest_dir on a
+        thread pool, e.g. the unique files of group A into group B.
+        - Never overwrites: name collisions get _copy, _copy2, ... suffixes.
+        - roots: keep each file's folder layout below the root folder it was
+          found in (None: everything flat in dest_dir).
+        - At most 2 x threads files are queued; stop_requested cancels the rest
+          (files already placed stay).
+        Progress goes through _report. Per-file errors are collected, not raised.
+        Returns {'dest_dir', 'total', 'copied', 'bytes', 'modes': {mode: count},
+        'failed': [(path, message)], 'cancelled'}. 'bytes' only counts data that
+        was written ('copy' / 'reflink'), links add nothing.
+        """
+        if mode not in COPY_MODES:
+            raise ValueError(f"Unknown copy mode: {mode}")
+        os.makedirs(dest_dir, exist_ok=True)
+        abs_roots = [os.path.abspath(r) for r in roots] if roots else []
+        namer = DestinationNamer()
+        total = len(paths)
+        summary = {'dest_dir': dest_dir, 'total': total, 'copied': 0, 'bytes': 0, 'modes': {},
+                   'failed': [], 'cancelled': False}
+
+        def place(src):
+            size = os.path.getsize(src)
+            target = os.path.join(dest_dir, _layout_path(src, abs_roots))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            for _ in range(COPY_NAME_RETRIES):
+                dst = namer.claim(target)
+                try:
+                    used = place_file(src, dst, mode)
+                    return used, size if used in ('copy', 'reflink') else 0
+                except FileExistsError:
+                    continue  # Created by someone else since claim()
+            raise FileExistsError(errno.EEXIST, "No free destination name", target)
+
+        self._report("status_copying", 0, total)
+        with self.metrics.phase('copy'), ThreadPoolExecutor(max_workers=threads) as executor:
+            tasks = iter(paths)
+            in_flight = {}
+            done = 0
+            while True:
+                while not self.stop_requested and len(in_flight) < threads * 2:
+                    src = next(tasks, None)
+                    if src is None:
+                        break
+                    in_flight[executor.submit(place, src)] = src
+                if not in_flight:
+                    break
+
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    src = in_flight.pop(future)
+                    try:
+                        used, size = future.result()
+                    except Exception as e:
+                        summary['failed'].append((src, str(e)))
+                        self.metrics.failure('copy', src, type(e).__name__, str(e))
+                        continue
+                    summary['copied'] += 1
+                    summary['bytes'] += size
+                    summary['modes'][used] = summary['modes'].get(used, 0) + 1
+                done += len(finished)
+                self._report("status_copying", done, total)
+
+        summary['cancelled'] = self.stop_requested and done < total
+        self.metrics.add('files_copied', summary['copied'])
+        self.metrics.add('bytes_copied', summary['bytes'])
+        return summary
+
+    def _make_group(self, paths_a, paths_b, mtype):
+        """
+        One match for a whole set of identical files.
+        file_a / file_b hold a representative pair, 'group' lists every member
+        (A side first). Self compare passes all members in paths_a.
+        """
+        first_b = paths_b[0] if paths_b else paths_a[1]
+        match = self._make_match(paths_a[0], first_b, mtype, 100.0)
+        match['group'] = list(paths_a) + list(paths_b)
+        return match
+
+    def _make_match(self, path_a, path_b, mtype, score):
         return {
-            'file_a': img1['path'],
-            'file_b': img2['path'],
+            'file_a': path_a,
+            'file_b': path_b,
             'type': mtype,
             'score': round(score, 1)
         }
 
     def _calc_similarity(self, h1, h2):
-        diff = h1 - h2
+        return self._score_from_distance(hamming_distance(h1, h2))
+
+    def _score_from_distance(self, diff):
         # Normalized 0-100
-        return max(0, (64 - diff) / 64) * 100
+        return max(0, (HASH_BITS - diff) / HASH_BITS) * 100
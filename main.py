@@ -2,14 +2,24 @@ import tkinter as tk
 from tkinter import filedialog, messagebox
 import customtkinter as ctk
 import threading
-from PIL import Image, ImageTk
+import queue
 import os
+import tempfile
 import logic
 import languages
+from thumbnails import ThumbnailService
+from progress import ProgressChannel, format_duration
 
 # Copyright (c) 2025 Photo Comparator. All rights reserved.
 # Licensed under the MIT License. See LICENSE file in the project root for full license information.
 
+# Status bar refresh period while scanning (the scanner never schedules Tk callbacks itself)
+PROGRESS_POLL_MS = 100
+
+# Preview thumbnails: neighbouring rows prefetched around the one being viewed
+PREFETCH_ROWS = 3
+THUMB_CACHE_DIR = os.path.join(tempfile.gettempdir(), "photo_comparator_thumbs")
+
 # Set default theme
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
@@ -68,9 +78,15 @@ class App(ctk.CTk):
         self.clear_b_btn.pack(side="left")
 
         # Options
+        self.options_frame = ctk.CTkFrame(self.sidebar_frame, fg_color="transparent")
+        self.options_frame.grid(row=7, column=0, padx=20, pady=10, sticky="ew")
+
         self.check_similar_var = ctk.BooleanVar(value=True)
-        self.check_similar_switch = ctk.CTkSwitch(self.sidebar_frame, text="尋找相似圖片", variable=self.check_similar_var)
-        self.check_similar_switch.grid(row=7, column=0, padx=20, pady=10, sticky="w")
+        self.check_similar_switch = ctk.CTkSwitch(self.options_frame, text="尋找相似圖片", variable=self.check_similar_var)
+        self.check_similar_switch.pack(anchor="w")
+        self.check_rotated_var = ctk.BooleanVar(value=False)
+        self.check_rotated_switch = ctk.CTkSwitch(self.options_frame, text=languages.get_text("check_rotated"), variable=self.check_rotated_var)
+        self.check_rotated_switch.pack(anchor="w", pady=(5, 0))
 
         # Size Filter
         self.size_frame = ctk.CTkFrame(self.sidebar_frame, fg_color="transparent")
@@ -94,25 +110,39 @@ class App(ctk.CTk):
         self.stop_btn = ctk.CTkButton(self.sidebar_frame, text="停止", fg_color="darkred", hover_color="red", state="disabled", command=self.stop_scan)
         self.stop_btn.grid(row=10, column=0, padx=20, pady=(0, 20))
 
+        # Copy Options
+        self.copy_opts_frame = ctk.CTkFrame(self.sidebar_frame, fg_color="transparent")
+        self.copy_opts_frame.grid(row=11, column=0, padx=20, pady=(0, 5), sticky="ew")
+
+        self.copy_mode_label = ctk.CTkLabel(self.copy_opts_frame, text=languages.get_text("copy_mode_label"))
+        self.copy_mode_label.pack(side="left")
+        self.copy_mode = "copy"
+        self.copy_mode_menu = ctk.CTkOptionMenu(self.copy_opts_frame, width=120, values=[""], command=self.change_copy_mode)
+        self.copy_mode_menu.pack(side="left", padx=5)
+
+        self.keep_layout_var = ctk.BooleanVar(value=False)
+        self.keep_layout_check = ctk.CTkCheckBox(self.sidebar_frame, text=languages.get_text("copy_keep_layout"), variable=self.keep_layout_var)
+        self.keep_layout_check.grid(row=12, column=0, padx=20, pady=(0, 5), sticky="w")
+
         # Copy Unique Button
         self.copy_btn = ctk.CTkButton(self.sidebar_frame, text=languages.get_text("btn_copy_unique"), fg_color="gray", state="disabled", command=self.copy_unique)
-        self.copy_btn.grid(row=11, column=0, padx=20, pady=(0, 20))
+        self.copy_btn.grid(row=13, column=0, padx=20, pady=(0, 20))
 
         # Language Select
         self.lang_label = ctk.CTkLabel(self.sidebar_frame, text=languages.get_text("lang_label"), anchor="w")
-        self.lang_label.grid(row=12, column=0, padx=20, pady=(10, 0), sticky="w")
+        self.lang_label.grid(row=14, column=0, padx=20, pady=(10, 0), sticky="w")
         
         self.lang_menu = ctk.CTkOptionMenu(self.sidebar_frame, values=["繁體中文", "English"], command=self.change_language)
         self.lang_menu.set("繁體中文" if languages.get_current_language() == "zh_TW" else "English")
-        self.lang_menu.grid(row=13, column=0, padx=20, pady=(0, 20))
+        self.lang_menu.grid(row=15, column=0, padx=20, pady=(0, 20))
 
         # --- Main Content (Results) ---
         self.main_frame = ctk.CTkFrame(self, corner_radius=10)
         self.main_frame.grid(row=0, column=1, rowspan=2, padx=20, pady=20, sticky="nsew")
 
-        # Result List (Scrollable)
-        self.result_scroll = ctk.CTkScrollableFrame(self.main_frame, label_text="比對結果")
-        self.result_scroll.pack(fill="both", expand=True, padx=10, pady=10)
+        # Result List (virtualized: only the visible rows exist as widgets)
+        self.result_list = ResultList(self.main_frame, on_view=self.open_preview, on_settle=self.prefetch_visible)
+        self.result_list.pack(fill="both", expand=True, padx=10, pady=10)
 
         # --- Status Bar ---
         self.status_frame = ctk.CTkFrame(self, height=40, corner_radius=0)
@@ -126,10 +156,22 @@ class App(ctk.CTk):
         self.status_label.pack(side="right", padx=20)
 
         # --- Helper Variables ---
-        self.scanner = logic.ImageScanner(callback_progress=self.update_progress)
+        self.progress = ProgressChannel()
+        self.scanner = logic.ImageScanner(progress=self.progress)
+        self._progress_version = -1
+        self.thumbs = ThumbnailService(cache_dir=THUMB_CACHE_DIR)
         self.scanning = False
+        self.copying = False
+        self._ui_calls = queue.Queue()  # Work from other threads, run by poll_progress
 
         self.refresh_text() # Initial text set
+        self.poll_progress()
+
+    def change_copy_mode(self, choice):
+        # The menu shows translated names; keep the mode key
+        for mode in logic.COPY_MODES:
+            if languages.get_text("copy_mode_" + mode) == choice:
+                self.copy_mode = mode
 
     def change_language(self, choice):
         code = "zh_TW" if choice == "繁體中文" else "en_US"
@@ -150,6 +192,7 @@ class App(ctk.CTk):
         self.clear_b_btn.configure(text=languages.get_text("btn_clear"))
         
         self.check_similar_switch.configure(text=languages.get_text("check_similar"))
+        self.check_rotated_switch.configure(text=languages.get_text("check_rotated"))
         self.lbl_min_kb.configure(text=languages.get_text("size_filter_min"))
         self.lbl_max_kb.configure(text=languages.get_text("size_filter_max")) # Need to save ref to labels
         
@@ -166,25 +209,15 @@ class App(ctk.CTk):
         else:
              self.copy_btn.configure(text=languages.get_text("btn_no_unique") if not hasattr(self, 'unique_files') else languages.get_text("btn_no_unique"))
              
-        self.result_scroll.configure(label_text=languages.get_text("app_title")) # Scrollable frame label? No, label_text is for frame title usually... wait, ctk scrollable frame has label_text
-        self.result_scroll.configure(label_text="Results") # Or dynamic
+        self.copy_mode_label.configure(text=languages.get_text("copy_mode_label"))
+        self.copy_mode_menu.configure(values=[languages.get_text("copy_mode_" + m) for m in logic.COPY_MODES])
+        self.copy_mode_menu.set(languages.get_text("copy_mode_" + self.copy_mode))
+        self.keep_layout_check.configure(text=languages.get_text("copy_keep_layout"))
+
+        # Toolbar, header and the visible rows are re-labelled in place
+        self.result_list.refresh_text()
         
         self.lang_label.configure(text=languages.get_text("lang_label"))
-        
-        # We need to refresh results header if possible?
-        # The result headers are labels inside a frame. 
-        # Ideally we rebuild the header or keep references.
-        # For simplicity, we might just clear results when language changes? Or just leave them until next scan? 
-        # User might want to see existing results translated.
-        # Let's try to update header labels if we kept references. We didn't.
-        # So we might need to recreate the header.
-        
-        # Re-create header
-        for widget in self.result_scroll.winfo_children():
-             # Hacky way to find header frame?
-             # Probably easier to just clear results or accept that old results stay in old language until rescan/refresh.
-             # Or we can clear results for now to avoid confusion.
-             pass
 
 
     def add_folder(self, listbox):
@@ -221,7 +254,7 @@ class App(ctk.CTk):
         MultiSelectDialog(self, languages.get_text("msg_title_batch"), subdirs, on_confirm)
 
     def start_scan(self):
-        if self.scanning:
+        if self.scanning or self.copying:
             return
 
         folders_a = self.list_a.get(0, tk.END)
@@ -243,20 +276,22 @@ class App(ctk.CTk):
             return
 
         # Clear previous results
-        for widget in self.result_scroll.winfo_children():
-            widget.destroy()
+        self.result_list.clear()
 
         self.scanning = True
         self.start_btn.configure(state="disabled", text=languages.get_text("btn_scanning"))
         self.stop_btn.configure(state="normal", text=languages.get_text("btn_stop"))
         self.progress_bar.set(0)
         self.scanner.stop_requested = False
+        self.scanner.rotation_invariant = self.check_rotated_var.get()
+        self.progress.reset()
 
         # Run in thread
         threading.Thread(target=self.run_logic, args=(folders_a, folders_b, min_bytes, max_bytes), daemon=True).start()
 
     def stop_scan(self):
-        if self.scanning:
+        # Also cancels a running copy (copy_files checks the same flag)
+        if self.scanning or self.copying:
             if messagebox.askyesno(languages.get_text("msg_title_stop"), languages.get_text("msg_confirm_stop")):
                 self.scanner.stop_requested = True
                 self.status_label.configure(text=languages.get_text("status_stopping"))
@@ -274,27 +309,54 @@ class App(ctk.CTk):
             )
             
             if self.scanner.stop_requested:
-                self.after(0, lambda: messagebox.showinfo(languages.get_text("msg_title_stop"), languages.get_text("msg_scan_aborted")))
-                self.after(0, self.reset_ui) # Reset without showing partial results? Or show?
+                self.call_on_ui(lambda: messagebox.showinfo(languages.get_text("msg_title_stop"), languages.get_text("msg_scan_aborted")))
+                self.call_on_ui(self.reset_ui) # Reset without showing partial results? Or show?
                 # User usually wants to see partial, but our parallel logic returns partial?
                 # Logic returns [], [] if stopped. So clear results.
                 self.unique_files = [] 
             else:
                 self.unique_files = unique_files 
-                self.after(0, self.show_results, results)
+                self.call_on_ui(self.show_results, results)
                 
         except Exception as e:
             print(f"Error: {e}")
-            self.after(0, lambda: messagebox.showerror(languages.get_text("msg_title_error"), str(e)))
+            self.call_on_ui(lambda e=e: messagebox.showerror(languages.get_text("msg_title_error"), str(e)))
         finally:
             self.scanning = False
-            self.after(0, self.reset_ui)
-
-    def update_progress(self, current, total, message):
-        self.after(0, lambda: self.status_label.configure(text=message))
-        if total > 0:
-            progress = current / total
-            self.after(0, lambda: self.progress_bar.set(progress))
+            self.call_on_ui(self.reset_ui)
+
+    def call_on_ui(self, func, *args):
+        # Tk is not thread-safe, not even after(): worker threads queue their UI
+        # updates and poll_progress runs them on the Tk thread
+        self._ui_calls.put((func, args))
+
+    def poll_progress(self):
+        # Runs on the Tk thread at a fixed rate for the whole session: runs the
+        # queued worker calls, and while scanning or copying shows only the
+        # latest progress state; reset_ui sets the final text.
+        self.after(PROGRESS_POLL_MS, self.poll_progress)
+        while True:
+            try:
+                func, args = self._ui_calls.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                func(*args)
+            except tk.TclError:
+                pass  # The target window was closed meanwhile
+        if not (self.scanning or self.copying):
+            return
+        state = self.progress.snapshot()
+        if state.version != self._progress_version and state.key and not self.scanner.stop_requested:
+            self._progress_version = state.version
+            text = languages.get_text(state.key, state.current, state.total)
+            if state.rate:
+                text += "  " + languages.get_text("status_rate", state.rate)
+                if state.eta is not None:
+                    text += "  " + languages.get_text("status_eta", format_duration(state.eta))
+            self.status_label.configure(text=text)
+            if state.total > 0:
+                self.progress_bar.set(state.current / state.total)
 
     def reset_ui(self):
         self.start_btn.configure(state="normal", text=languages.get_text("btn_start"))
@@ -307,56 +369,27 @@ class App(ctk.CTk):
             self.copy_btn.configure(state="disabled", text=languages.get_text("btn_no_unique"))
 
         if not self.scanner.stop_requested:
+            self.progress_bar.set(1)
             self.status_label.configure(text=languages.get_text("status_complete"))
         else:
             self.status_label.configure(text=languages.get_text("status_stopped"))
 
     def show_results(self, results):
-        if not results:
-            lbl = ctk.CTkLabel(self.result_scroll, text=languages.get_text("res_no_match"), font=("Arial", 16))
-            lbl.pack(pady=20)
-            return
-
-        # Header
-        header = ctk.CTkFrame(self.result_scroll, fg_color="transparent")
-        header.pack(fill="x", pady=(0, 5))
-        ctk.CTkLabel(header, text=languages.get_text("res_header_type"), width=80, anchor="w", font=("Arial", 12, "bold")).pack(side="left", padx=5)
-        ctk.CTkLabel(header, text=languages.get_text("res_header_score"), width=60, anchor="w", font=("Arial", 12, "bold")).pack(side="left", padx=5)
-        ctk.CTkLabel(header, text=languages.get_text("res_header_files"), anchor="w", font=("Arial", 12, "bold")).pack(side="left", padx=5)
-
-        for match in results:
-            row = ctk.CTkFrame(self.result_scroll)
-            row.pack(fill="x", pady=2)
-            
-            # Translate type
-            type_text = languages.get_text("res_type_exact") if match['type'] == "完全相同" or match['type'] == "Exact Match" else languages.get_text("res_type_similar")
-            # Note: logic.py originally returned "完全相同" or "視覺相似". Now we need to be careful.
-            # logic.py still uses hardcoded types in _make_match? 
-            # Ideally logic.py should return codes like "EXACT", "SIMILAR".
-            # But let's check logic.py again. 
-            
-            color = "orange" if match['type'] in ["完全相同", "Exact Match", "EXACT"] else "lightblue"
-            type_lbl = ctk.CTkLabel(row, text=type_text, text_color=color, width=80, anchor="w")
-            type_lbl.pack(side="left", padx=5)
-
-            score_lbl = ctk.CTkLabel(row, text=f"{match['score']}%", width=60, anchor="w")
-            score_lbl.pack(side="left", padx=5)
-
-            # File info
-            name_a = os.path.basename(match['file_a'])
-            name_b = os.path.basename(match['file_b'])
-            info_lbl = ctk.CTkLabel(row, text=f"A: {name_a}\nB: {name_b}", anchor="w", justify="left")
-            info_lbl.pack(side="left", padx=5, fill="x", expand=True)
-
-            # View Button
-            view_btn = ctk.CTkButton(row, text=languages.get_text("btn_view"), width=60, height=25, 
-                                     command=lambda m=match: self.open_preview(m))
-            view_btn.pack(side="right", padx=10, pady=5)
+        # The list only keeps a reference to the data; widgets are created for visible rows only
+        self.result_list.set_results(results)
 
     def open_preview(self, match):
-        PreviewWindow(self, match)
+        PreviewWindow(self, match, self.thumbs)
+        # Next / previous rows are the likely next clicks
+        self.thumbs.prefetch(_match_paths(self.result_list.neighbours(match, PREFETCH_ROWS)))
+
+    def prefetch_visible(self, matches):
+        # The list stopped scrolling: warm the thumbnails of the rows on screen
+        self.thumbs.prefetch(_match_paths(matches))
 
     def copy_unique(self):
+        if self.scanning or self.copying:
+            return
         folders_b = self.list_b.get(0, tk.END)
         if not folders_b:
             messagebox.showerror(languages.get_text("msg_title_error"), languages.get_text("msg_err_b_empty_copy"))
@@ -379,24 +412,324 @@ class App(ctk.CTk):
             messagebox.showerror(languages.get_text("msg_title_error"), languages.get_text("msg_err_create_dir", e))
             return
 
-        count = 0
-        import shutil
+        folders_a = self.list_a.get(0, tk.END)
+        if self.copy_mode not in logic.available_copy_modes(folders_a, target_dir):
+            messagebox.showerror(languages.get_text("msg_title_error"), languages.get_text("msg_err_copy_mode"))
+            return
+
+        self.copying = True
+        self.copy_btn.configure(state="disabled")
+        self.start_btn.configure(state="disabled")
+        self.stop_btn.configure(state="normal", text=languages.get_text("btn_stop"))
+        self.progress_bar.set(0)
+        self.scanner.stop_requested = False
+        self.progress.reset()
+
+        roots = folders_a if self.keep_layout_var.get() else None
+        threading.Thread(target=self.run_copy, args=(list(self.unique_files), target_dir, self.copy_mode, roots), daemon=True).start()
+
+    def run_copy(self, files, target_dir, mode, roots):
+        summary = None
         try:
-            for filepath in self.unique_files:
-                filename = os.path.basename(filepath)
-                dest = os.path.join(target_dir, filename)
-                
-                # Handle duplicate names
-                if os.path.exists(dest):
-                    base, ext = os.path.splitext(filename)
-                    dest = os.path.join(target_dir, f"{base}_copy{ext}")
-                    
-                shutil.copy2(filepath, dest)
-                count += 1
-            
-            messagebox.showinfo(languages.get_text("msg_title_success"), languages.get_text("msg_copy_success", count, target_dir))
+            summary = self.scanner.copy_files(files, target_dir, mode=mode, roots=roots)
         except Exception as e:
-            messagebox.showerror(languages.get_text("msg_title_error"), languages.get_text("msg_err_copy_fail", e))
+            self.call_on_ui(lambda e=e: messagebox.showerror(languages.get_text("msg_title_error"), languages.get_text("msg_err_copy_fail", e)))
+        finally:
+            self.copying = False
+            self.call_on_ui(self.finish_copy, summary)
+
+    def finish_copy(self, summary):
+        self.reset_ui()
+        if summary is None:
+            return
+        if summary['cancelled']:
+            messagebox.showinfo(languages.get_text("msg_title_stop"), languages.get_text("msg_copy_cancelled", summary['copied'], summary['total']))
+        elif summary['failed']:
+            examples = "\n".join(f"{os.path.basename(path)}: {message}" for path, message in summary['failed'][:5])
+            messagebox.showwarning(languages.get_text("msg_title_error"), languages.get_text("msg_copy_partial", summary['copied'], summary['dest_dir'], len(summary['failed']), examples))
+        else:
+            messagebox.showinfo(languages.get_text("msg_title_success"), languages.get_text("msg_copy_success", summary['copied'], summary['dest_dir']))
+
+# Virtualized result list: fixed row height, rows recycled while scrolling
+RESULT_ROW_HEIGHT = 52
+RESULT_WHEEL_ROWS = 3
+RESULT_SETTLE_MS = 300  # Quiet time after scrolling before on_settle fires
+
+# match['type'] as produced by logic.py
+TYPE_EXACT = "完全相同"
+TYPE_SIMILAR = "視覺相似"
+
+RESULT_FILTERS = ["all", "exact", "similar"]
+RESULT_SORTS = ["score_desc", "score_asc", "type", "name"]
+
+
+class ResultRow(ctk.CTkFrame):
+    """One recycled row of ResultList; show() binds it to a match."""
+
+    def __init__(self, parent, on_view):
+        super().__init__(parent, height=RESULT_ROW_HEIGHT - 4)
+        self.pack_propagate(False)
+        self.match = None
+
+        self.type_lbl = ctk.CTkLabel(self, text="", width=80, anchor="w")
+        self.type_lbl.pack(side="left", padx=5)
+        self.score_lbl = ctk.CTkLabel(self, text="", width=60, anchor="w")
+        self.score_lbl.pack(side="left", padx=5)
+        self.view_btn = ctk.CTkButton(self, text=languages.get_text("btn_view"), width=60, height=25,
+                                      command=lambda: self.match and on_view(self.match))
+        self.view_btn.pack(side="right", padx=10, pady=5)
+        self.info_lbl = ctk.CTkLabel(self, text="", anchor="w", justify="left")
+        self.info_lbl.pack(side="left", padx=5, fill="x", expand=True)
+
+    def show(self, match):
+        self.match = match
+        exact = match['type'] == TYPE_EXACT
+        self.type_lbl.configure(text=languages.get_text("res_type_exact" if exact else "res_type_similar"),
+                                text_color="orange" if exact else "lightblue")
+        self.score_lbl.configure(text=f"{match['score']}%")
+
+        info_text = f"A: {os.path.basename(match['file_a'])}\nB: {os.path.basename(match['file_b'])}"
+        # Exact duplicates come back as one group per identical file set
+        if len(match.get('group', ())) > 2:
+            info_text += "  " + languages.get_text("res_group_more", len(match['group']) - 2)
+        # Similar to a rotated / mirrored copy (rotation invariant scans)
+        if match.get('orientation'):
+            info_text += "  " + languages.get_text("res_orientation", match['orientation'])
+        self.info_lbl.configure(text=info_text)
+        self.view_btn.configure(text=languages.get_text("btn_view"))
+
+
+class ResultList(ctk.CTkFrame):
+    """
+    Virtualized result list.
+    The matches stay plain data; filtering and sorting only reorder a list of
+    indices, and just enough ResultRow widgets to fill the visible area are
+    created and re-bound while scrolling. Rendering cost depends on the window
+    height, not on the number of matches.
+    """
+
+    def __init__(self, parent, on_view, on_settle=None):
+        super().__init__(parent)
+        self.on_view = on_view
+        self.on_settle = on_settle  # on_settle(visible matches), once scrolling has paused
+        self._settle_job = None
+        self.matches = []
+        self.loaded = False  # set_results() was called (the "no match" text is only shown after a scan)
+        self.view = []      # indices into self.matches after filter + sort
+        self.first = 0      # index in self.view of the top visible row
+        self.rows = []
+        self._filter, self._sort = "all", "score_desc"
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(2, weight=1)
+
+        # --- Toolbar: filter / sort ---
+        self.toolbar = ctk.CTkFrame(self, fg_color="transparent")
+        self.toolbar.grid(row=0, column=0, columnspan=2, sticky="ew", padx=5, pady=(5, 0))
+
+        self.title_lbl = ctk.CTkLabel(self.toolbar, text="", font=("Arial", 14, "bold"))
+        self.title_lbl.pack(side="left", padx=(5, 15))
+        self.filter_lbl = ctk.CTkLabel(self.toolbar, text="")
+        self.filter_lbl.pack(side="left", padx=(5, 2))
+        self.filter_menu = ctk.CTkOptionMenu(self.toolbar, width=110, values=[""], command=lambda _: self.apply())
+        self.filter_menu.pack(side="left", padx=(0, 10))
+
+        self.min_score_lbl = ctk.CTkLabel(self.toolbar, text="")
+        self.min_score_lbl.pack(side="left", padx=(5, 2))
+        self.min_score_entry = ctk.CTkEntry(self.toolbar, width=50)
+        self.min_score_entry.insert(0, "0")
+        self.min_score_entry.pack(side="left", padx=(0, 10))
+        self.min_score_entry.bind("<Return>", lambda e: self.apply())
+        self.min_score_entry.bind("<FocusOut>", lambda e: self.apply())
+
+        self.sort_lbl = ctk.CTkLabel(self.toolbar, text="")
+        self.sort_lbl.pack(side="left", padx=(5, 2))
+        self.sort_menu = ctk.CTkOptionMenu(self.toolbar, width=150, values=[""], command=lambda _: self.apply())
+        self.sort_menu.pack(side="left")
+
+        self.count_lbl = ctk.CTkLabel(self.toolbar, text="")
+        self.count_lbl.pack(side="right", padx=5)
+
+        # --- Column header ---
+        self.header = ctk.CTkFrame(self, fg_color="transparent")
+        self.header.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(5, 0))
+        self.header_type = ctk.CTkLabel(self.header, text="", width=80, anchor="w", font=("Arial", 12, "bold"))
+        self.header_type.pack(side="left", padx=5)
+        self.header_score = ctk.CTkLabel(self.header, text="", width=60, anchor="w", font=("Arial", 12, "bold"))
+        self.header_score.pack(side="left", padx=5)
+        self.header_files = ctk.CTkLabel(self.header, text="", anchor="w", font=("Arial", 12, "bold"))
+        self.header_files.pack(side="left", padx=5)
+
+        # --- Viewport + scrollbar ---
+        self.body = ctk.CTkFrame(self, fg_color="transparent")
+        self.body.grid(row=2, column=0, sticky="nsew")
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=2, column=1, sticky="ns")
+        self.empty_lbl = ctk.CTkLabel(self.body, text="", font=("Arial", 16))
+
+        self.body.bind("<Configure>", self._on_resize)
+        # Wheel events go to whatever widget is under the pointer, so grab them
+        # while the pointer is over the list
+        self.body.bind("<Enter>", lambda e: self._bind_wheel(True))
+        self.body.bind("<Leave>", lambda e: self._bind_wheel(False))
+
+        self.refresh_text()
+
+    # --- Data ---
+    def set_results(self, matches):
+        self.matches = list(matches)
+        self.loaded = True
+        self.first = 0
+        self.apply()
+
+    def clear(self):
+        self.set_results([])
+        self.loaded = False
+        self.render()
+
+    def apply(self):
+        """Rebuild the filtered / sorted index list and redraw."""
+        wanted = self._filter_keys.get(self.filter_menu.get(), "all")
+        try:
+            min_score = float(self.min_score_entry.get() or 0)
+        except ValueError:
+            min_score = 0.0
+            self.min_score_entry.delete(0, tk.END)
+            self.min_score_entry.insert(0, "0")
+
+        matches = self.matches
+        view = [i for i, m in enumerate(matches)
+                if m['score'] >= min_score
+                and (wanted == "all" or (m['type'] == TYPE_EXACT) == (wanted == "exact"))]
+
+        order = self._sort_keys.get(self.sort_menu.get(), "score_desc")
+        if order == "score_desc":
+            view.sort(key=lambda i: -matches[i]['score'])
+        elif order == "score_asc":
+            view.sort(key=lambda i: matches[i]['score'])
+        elif order == "type":
+            view.sort(key=lambda i: (matches[i]['type'] != TYPE_EXACT, -matches[i]['score']))
+        elif order == "name":
+            view.sort(key=lambda i: os.path.basename(matches[i]['file_a']).lower())
+
+        self.view = view
+        self.first = 0
+        self._filter, self._sort = wanted, order
+        self.count_lbl.configure(text=languages.get_text("res_count", len(view), len(matches)))
+        self.render()
+
+    # --- Drawing ---
+    def _visible_count(self):
+        return max(1, self.body.winfo_height() // RESULT_ROW_HEIGHT)
+
+    def render(self):
+        total = len(self.view)
+        visible = self._visible_count()
+        self.first = max(0, min(self.first, total - visible))
+
+        for k, row in enumerate(self.rows):
+            pos = self.first + k
+            if pos < total:
+                row.show(self.matches[self.view[pos]])
+                row.place(x=0, y=k * RESULT_ROW_HEIGHT, relwidth=1.0)
+            else:
+                row.place_forget()
+
+        if total:
+            self.empty_lbl.place_forget()
+            self.scrollbar.set(self.first / total, min(1.0, (self.first + visible) / total))
+            if self.on_settle:
+                if self._settle_job:
+                    self.after_cancel(self._settle_job)
+                self._settle_job = self.after(RESULT_SETTLE_MS, self._settled)
+        else:
+            if self.loaded:
+                self.empty_lbl.place(relx=0.5, y=20, anchor="n")
+            else:
+                self.empty_lbl.place_forget()
+            self.scrollbar.set(0.0, 1.0)
+
+    def _settled(self):
+        self._settle_job = None
+        self.on_settle(self.visible_matches())
+
+    def visible_matches(self):
+        return [self.matches[i] for i in self.view[self.first:self.first + len(self.rows)]]
+
+    def neighbours(self, match, radius):
+        """Matches up to radius rows above and below match in the current view."""
+        for pos, i in enumerate(self.view):
+            if self.matches[i] is match:
+                return [self.matches[j] for j in self.view[max(0, pos - radius):pos + radius + 1] if j != i]
+        return []
+
+    def _on_resize(self, event):
+        # One spare row for the partially visible one at the bottom
+        needed = event.height // RESULT_ROW_HEIGHT + 1
+        while len(self.rows) < needed:
+            self.rows.append(ResultRow(self.body, self.on_view))
+        while len(self.rows) > needed:
+            self.rows.pop().destroy()
+        self.render()
+
+    # --- Scrolling ---
+    def scroll_to(self, first):
+        self.first = first
+        self.render()
+
+    def _on_scrollbar(self, *args):
+        if not self.view:
+            return
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * len(self.view)))
+        elif args[0] == "scroll":
+            step = self._visible_count() if args[2] == "pages" else 1
+            self.scroll_to(self.first + int(float(args[1])) * step)
+
+    def _on_wheel(self, event):
+        if event.num == 4:
+            direction = -1
+        elif event.num == 5:
+            direction = 1
+        else:
+            direction = -1 if event.delta > 0 else 1
+        self.scroll_to(self.first + direction * RESULT_WHEEL_ROWS)
+
+    def _bind_wheel(self, active):
+        if active:
+            self.bind_all("<MouseWheel>", self._on_wheel)
+            self.bind_all("<Button-4>", self._on_wheel)
+            self.bind_all("<Button-5>", self._on_wheel)
+        else:
+            self.unbind_all("<MouseWheel>")
+            self.unbind_all("<Button-4>")
+            self.unbind_all("<Button-5>")
+
+    # --- Language ---
+    def refresh_text(self):
+        self._filter_keys = {languages.get_text("res_filter_all"): "all",
+                             languages.get_text("res_type_exact"): "exact",
+                             languages.get_text("res_type_similar"): "similar"}
+        self._sort_keys = {languages.get_text("res_sort_" + key): key for key in RESULT_SORTS}
+
+        # Keep the current choices across a language switch
+        filter_labels = {v: k for k, v in self._filter_keys.items()}
+        sort_labels = {v: k for k, v in self._sort_keys.items()}
+        self.filter_menu.configure(values=[filter_labels[k] for k in RESULT_FILTERS])
+        self.filter_menu.set(filter_labels[self._filter])
+        self.sort_menu.configure(values=[sort_labels[k] for k in RESULT_SORTS])
+        self.sort_menu.set(sort_labels[self._sort])
+
+        self.title_lbl.configure(text=languages.get_text("res_title"))
+        self.filter_lbl.configure(text=languages.get_text("res_filter_type"))
+        self.min_score_lbl.configure(text=languages.get_text("res_min_score"))
+        self.sort_lbl.configure(text=languages.get_text("res_sort"))
+        self.header_type.configure(text=languages.get_text("res_header_type"))
+        self.header_score.configure(text=languages.get_text("res_header_score"))
+        self.header_files.configure(text=languages.get_text("res_header_files"))
+        self.empty_lbl.configure(text=languages.get_text("res_no_match"))
+        self.count_lbl.configure(text=languages.get_text("res_count", len(self.view), len(self.matches)))
+        self.render()
 
 class MultiSelectDialog(ctk.CTkToplevel):
     def __init__(self, parent, title, options, callback):
@@ -445,7 +778,7 @@ class MultiSelectDialog(ctk.CTkToplevel):
         self.destroy()
 
 class PreviewWindow(ctk.CTkToplevel):
-    def __init__(self, parent, match):
+    def __init__(self, parent, match, thumbs):
         super().__init__(parent)
         self.title(languages.get_text("msg_title_preview"))
         self.geometry("800x500")
@@ -454,14 +787,12 @@ class PreviewWindow(ctk.CTkToplevel):
         self.grid_columnconfigure(1, weight=1)
         self.grid_rowconfigure(0, weight=1)
 
-        # Load images
-        self.img_a = self.load_image(match['file_a'])
-        self.img_b = self.load_image(match['file_b'])
+        self.images = {}  # Keep CTkImage references alive
 
-        lbl_a = ctk.CTkLabel(self, text=languages.get_text("res_col_file_a") + f"\n{os.path.basename(match['file_a'])}", image=self.img_a, compound="bottom")
+        lbl_a = ctk.CTkLabel(self, compound="bottom")
         lbl_a.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
 
-        lbl_b = ctk.CTkLabel(self, text=languages.get_text("res_col_file_b") + f"\n{os.path.basename(match['file_b'])}", image=self.img_b, compound="bottom")
+        lbl_b = ctk.CTkLabel(self, compound="bottom")
         lbl_b.grid(row=0, column=1, padx=10, pady=10, sticky="nsew")
         
         # Determine strict type
@@ -469,15 +800,32 @@ class PreviewWindow(ctk.CTkToplevel):
         info = ctk.CTkLabel(self, text=languages.get_text("res_info_match", strict_type, match['score']), font=("Arial", 16, "bold"))
         info.grid(row=1, column=0, columnspan=2, pady=10)
 
-    def load_image(self, path):
-        try:
-            img = Image.open(path)
-            # Resize logic
-            img.thumbnail((380, 400))
-            return ctk.CTkImage(light_image=img, dark_image=img, size=img.size)
-        except Exception as e:
-            print(e)
-            return None
+        # Thumbnails are decoded by the service's worker threads; cached ones show immediately
+        for lbl, col_key, path in ((lbl_a, "res_col_file_a", match['file_a']), (lbl_b, "res_col_file_b", match['file_b'])):
+            caption = languages.get_text(col_key) + f"\n{os.path.basename(path)}"
+            img = thumbs.get(path)
+            if img is not None:
+                self.show_image(lbl, caption, img)
+            else:
+                lbl.configure(text=caption + "\n" + languages.get_text("preview_loading"))
+                thumbs.request(path, lambda p, img, lbl=lbl, caption=caption: parent.call_on_ui(self.show_image, lbl, caption, img))
+
+    def show_image(self, lbl, caption, img):
+        if not self.winfo_exists():
+            return
+        if img is None:
+            lbl.configure(text=caption + "\n" + languages.get_text("preview_failed"))
+            return
+        self.images[lbl] = ctk.CTkImage(light_image=img, dark_image=img, size=img.size)
+        lbl.configure(text=caption, image=self.images[lbl])
+
+
+def _match_paths(matches):
+    paths = []
+    for m in matches:
+        paths.append(m['file_a'])
+        paths.append(m['file_b'])
+    return paths
 
 import multiprocessing
 
@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Copyright (c) 2025 Photo Comparator. All rights reserved.
+# Licensed under the MIT License. See LICENSE file in the project root for full license information.
+
+# Failures kept with path and message (the per-type counts are always complete)
+MAX_FAILURE_SAMPLES = 50
+
+
+def _cpu_times():
+    """(this process, reaped child processes) CPU seconds. Child time is 0 on Windows."""
+    t = os.times()
+    return t.user + t.system, t.children_user + t.children_system
+
+
+class ScanMetrics:
+    """
+    Structured instrumentation of a scan, filled in by ImageScanner.
+
+    - phases:   name -> wall / CPU seconds (main process and pool workers) and call count
+    - counters: name -> int (files walked, files hashed, bytes hashed, cache hits, pairs, ...)
+    - failures: stage -> {exception type: count}, plus a few samples with path and message
+    - pools:    stage -> process pool wall time, summed worker busy time, workers and tasks,
+                giving the worker utilisation. With read-ahead the file reading
+                threads are a pool of their own ('<stage>_io', see logic.ReadAhead)
+
+    listener (optional) receives every event as a dict while the scan runs:
+    {'event': 'phase', ...}, {'event': 'failure', ...}, {'event': 'pool', ...}.
+    Pool worker CPU time is only known once the pool has exited, so it is
+    attributed to the phase that ran the pool.
+    """
+
+    def __init__(self, listener=None):
+        self.listener = listener
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.phases = {}
+            self.counters = {}
+            self.failures = {}
+            self.failure_samples = []
+            self.pools = {}
+
+    def _emit(self, event):
+        if self.listener:
+            try:
+                self.listener(event)
+            except Exception:
+                pass  # A broken listener must not break the scan
+
+    @contextmanager
+    def phase(self, name):
+        """Time a block: with metrics.phase('hash'): ..."""
+        wall0 = time.perf_counter()
+        cpu0, children0 = _cpu_times()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall0
+            cpu1, children1 = _cpu_times()
+            with self._lock:
+                p = self.phases.setdefault(name, {'wall': 0.0, 'cpu': 0.0, 'cpu_workers': 0.0, 'calls': 0})
+                p['wall'] += wall
+                p['cpu'] += cpu1 - cpu0
+                p['cpu_workers'] += children1 - children0
+                p['calls'] += 1
+            self._emit({'event': 'phase', 'name': name, 'wall': wall, 'cpu': cpu1 - cpu0,
+                        'cpu_workers': children1 - children0})
+
+    def add(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def failure(self, stage, path, exc_type, message=""):
+        with self._lock:
+            by_type = self.failures.setdefault(stage, {})
+            by_type[exc_type] = by_type.get(exc_type, 0) + 1
+            if len(self.failure_samples) < MAX_FAILURE_SAMPLES:
+                self.failure_samples.append({'stage': stage, 'path': path, 'type': exc_type, 'message': message})
+        self._emit({'event': 'failure', 'stage': stage, 'path': path, 'type': exc_type, 'message': message})
+
+    def pool(self, stage, wall, busy, workers, tasks):
+        """Record one process pool run: busy is the summed time workers spent on tasks."""
+        with self._lock:
+            p = self.pools.setdefault(stage, {'wall': 0.0, 'busy': 0.0, 'workers': workers, 'tasks': 0})
+            p['wall'] += wall
+            p['busy'] += busy
+            p['workers'] = workers
+            p['tasks'] += tasks
+        self._emit({'event': 'pool', 'stage': stage, 'wall': wall, 'busy': busy, 'workers': workers,
+                    'tasks': tasks})
+
+    def to_dict(self, cache_stats=None):
+        """Snapshot as plain data (JSON-serializable), with derived rates."""
+        with self._lock:
+            pools = {}
+            for stage, p in self.pools.items():
+                capacity = p['wall'] * p['workers']
+                pools[stage] = dict(p, wall=round(p['wall'], 4), busy=round(p['busy'], 4),
+                                    utilisation=round(p['busy'] / capacity, 3) if capacity else None)
+            report = {
+                'started': self.started,
+                'phases': {name: {k: round(v, 4) if isinstance(v, float) else v for k, v in p.items()}
+                           for name, p in self.phases.items()},
+                'counters': dict(self.counters),
+                'failures': {stage: dict(by_type) for stage, by_type in self.failures.items()},
+                'failure_count': sum(sum(by_type.values()) for by_type in self.failures.values()),
+                'failure_samples': list(self.failure_samples),
+                'pools': pools,
+            }
+        hits = report['counters'].get('cache_hits', 0)
+        lookups = hits + report['counters'].get('cache_misses', 0)
+        report['cache_hit_rate'] = round(hits / lookups, 4) if lookups else None
+        if cache_stats is not None:
+            report['cache'] = cache_stats
+        return report
+
+    def save(self, path, cache_stats=None, extra=None):
+        """Write the JSON run report."""
+        report = self.to_dict(cache_stats)
+        if extra:
+            report.update(extra)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        return report
@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+# Copyright (c) 2025 Photo Comparator. All rights reserved.
+# Licensed under the MIT License. See LICENSE file in the project root for full license information.
+
+# Seconds of history used for the throughput / ETA estimate
+RATE_WINDOW = 5.0
+
+# key: languages key of the status text, formatted with (current, total)
+# rate: items per second over the last RATE_WINDOW seconds (None until known)
+# eta: seconds left at that rate (None when the total or the rate is unknown)
+# version: increases with every publish, so a poller can skip unchanged states
+ProgressState = namedtuple('ProgressState', 'key current total rate eta elapsed version')
+
+
+class ProgressChannel:
+    """
+    Latest-value progress state shared between scanner threads and the UI.
+
+    The scanner publishes as often as it likes; publishing only replaces the
+    stored state under a lock, so nothing is queued. The consumer polls
+    snapshot() at its own frame rate (the GUI every PROGRESS_POLL_MS) and
+    therefore sees at most one update per frame however fast the scan runs.
+    """
+
+    def __init__(self, window=RATE_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._key = None
+        self._current = 0
+        self._total = 0
+        self._started = time.monotonic()
+        self._samples = deque()  # (time, current) of the running stage, trimmed to window
+        self._version = 0
+
+    def publish(self, key, current=0, total=0):
+        now = time.monotonic()
+        with self._lock:
+            if key != self._key:
+                # New stage: its rate has nothing to do with the previous one
+                self._key = key
+                self._started = now
+                self._samples.clear()
+            self._current = current
+            self._total = total
+            samples = self._samples
+            samples.append((now, current))
+            while len(samples) > 2 and now - samples[0][0] > self.window:
+                samples.popleft()
+            self._version += 1
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            key, current, total, version = self._key, self._current, self._total, self._version
+            started = self._started
+            first = self._samples[0] if self._samples else None
+            last = self._samples[-1] if self._samples else None
+
+        rate = eta = None
+        if first and last[0] > first[0] and last[1] >= first[1]:
+            rate = (last[1] - first[1]) / (last[0] - first[0])
+            if rate > 0 and total and total > current:
+                eta = (total - current) / rate
+        return ProgressState(key, current, total, rate, eta, now - started, version)
+
+    def reset(self):
+        with self._lock:
+            self._key = None
+            self._current = self._total = 0
+            self._started = time.monotonic()
+            self._samples.clear()
+            self._version += 1
+
+
+def format_duration(seconds):
+    """1:05 / 1:02:03 style text for an ETA."""
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
@@ -0,0 +1,374 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+import numpy as np
+
+# Copyright (c) 2025 Photo Comparator. All rights reserved.
+# Licensed under the MIT License. See LICENSE file in the project root for full license information.
+
+DIGEST_SIZE = 16
+
+# Saved store (library index) layout, all little endian, sections 8-byte aligned:
+#   header:  magic, format version, meta length, row count
+#   meta:    JSON (digest_algo, phash_mode, extra_hashes, caller metadata)
+#   columns: sizes u64[N], phashes u64[N], digests u8[N*16], has_digest u8[N],
+#            has_phash u8[N], one u64[N] per extra hash (version 2),
+#            path offsets u64[N+1], UTF-8 path blob
+LIBRARY_MAGIC = b"PCLIBIDX"
+LIBRARY_VERSION = 2
+LIBRARY_READABLE_VERSIONS = (1, 2)
+_HEADER = struct.Struct("<8sIIQ")
+
+
+def _align(n):
+    return (n + 7) & ~7
+
+
+class ScanStore:
+    """
+    Columnar scan result: one row per file.
+    - paths:   interned path table (list of str)
+    - sizes:   uint64 column
+    - digests: 16-byte binary content digests, packed back to back
+    - phashes: uint64 pHash column
+    - extra:   one uint64 column per extra perceptual hash of the similarity
+               cascade (extra_hashes, e.g. ('dhash', 'whash')), computed from
+               the same decode as the pHash and present exactly when it is
+    Missing digests / pHashes are tracked by per-row flags, so a row costs
+    ~40 bytes plus its path instead of a dict holding hex strings and hash
+    objects. Rows are read through lightweight ScanRecord views.
+    digest_algo names the content-hash backend behind the digests and
+    phash_mode the decode used for the pHashes ('full' / 'fast'); stores that
+    differ in either must not be compared.
+
+    A store can be saved to a library index file and loaded back through mmap
+    (see save / load); a loaded store is read-only.
+    """
+
+    def __init__(self, digest_algo='md5', phash_mode='full', extra_hashes=()):
+        self.digest_algo = digest_algo
+        self.phash_mode = phash_mode
+        self.extra_hashes = tuple(extra_hashes)
+        self.meta = {}
+        self.paths = []
+        self._sizes = array('Q')
+        self._digests = bytearray()
+        self._has_digest = bytearray()
+        self._phashes = array('Q')
+        self._has_phash = bytearray()
+        self._extra = {name: array('Q') for name in self.extra_hashes}
+        self._row_of = None
+        self._mmap = None
+
+    def append(self, path, size, digest=None, phash=None, extra=None):
+        """
+        Add a file. digest: 16 raw bytes or None; phash: 64-bit int or None;
+        extra: values aligned with extra_hashes (required with a pHash). Returns the row.
+        """
+        if self._mmap is not None:
+            raise ValueError("A loaded library index is read-only")
+        row = len(self.paths)
+        self.paths.append(sys.intern(path))
+        self._sizes.append(size)
+        if digest is None:
+            self._digests.extend(bytes(DIGEST_SIZE))
+            self._has_digest.append(0)
+        else:
+            if len(digest) != DIGEST_SIZE:
+                raise ValueError(f"digest must be {DIGEST_SIZE} bytes")
+            self._digests.extend(digest)
+            self._has_digest.append(1)
+        self._phashes.append(phash if phash is not None else 0)
+        self._has_phash.append(0 if phash is None else 1)
+        if self.extra_hashes:
+            if phash is not None and (extra is None or len(extra) != len(self.extra_hashes)):
+                raise ValueError(f"extra must hold {', '.join(self.extra_hashes)}")
+            for k, name in enumerate(self.extra_hashes):
+                self._extra[name].append(extra[k] if phash is not None else 0)
+        self._row_of = None
+        return row
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __iter__(self):
+        for row in range(len(self.paths)):
+            yield ScanRecord(self, row)
+
+    def record(self, row):
+        return ScanRecord(self, row)
+
+    def find(self, path):
+        """ScanRecord for a path, or None. Builds a path -> row map on first use."""
+        if self._row_of is None:
+            self._row_of = {p: row for row, p in enumerate(self.paths)}
+        row = self._row_of.get(path)
+        return None if row is None else ScanRecord(self, row)
+
+    # --- Per-row access ---
+    def size(self, row):
+        return self._sizes[row]
+
+    def digest(self, row):
+        if not self._has_digest[row]:
+            return None
+        start = row * DIGEST_SIZE
+        return bytes(self._digests[start:start + DIGEST_SIZE])
+
+    def phash(self, row):
+        return self._phashes[row] if self._has_phash[row] else None
+
+    def hash(self, name, row):
+        """Perceptual hash of a row by name ('phash' or one of extra_hashes), None if missing."""
+        if not self._has_phash[row]:
+            return None
+        return self._phashes[row] if name == 'phash' else self._extra[name][row]
+
+    # --- Column access (NumPy copies, safe to keep while the store grows) ---
+    def sizes(self):
+        return np.frombuffer(self._sizes, dtype=np.uint64).copy()
+
+    def digests(self):
+        """(N, 16) uint8 array; rows without a digest are zero, see digest_mask()."""
+        return np.frombuffer(self._digests, dtype=np.uint8).reshape(-1, DIGEST_SIZE).copy()
+
+    def digest_mask(self):
+        return np.frombuffer(self._has_digest, dtype=np.uint8).astype(bool)
+
+    def phashes(self):
+        return np.frombuffer(self._phashes, dtype=np.uint64).copy()
+
+    def phash_mask(self):
+        return np.frombuffer(self._has_phash, dtype=np.uint8).astype(bool)
+
+    def hashes(self, name='phash'):
+        """uint64 column of a perceptual hash ('phash' or one of extra_hashes); see phash_mask()."""
+        if name == 'phash':
+            return self.phashes()
+        if name not in self._extra:
+            raise KeyError(f"Store has no {name} column (extra hashes: {', '.join(self.extra_hashes) or 'none'})")
+        return np.frombuffer(self._extra[name], dtype=np.uint64).copy()
+
+    def packed_phashes(self):
+        """(packed uint64 array, row positions) of the rows that have a pHash (see hashindex)."""
+        return self.packed_hashes('phash')
+
+    def packed_hashes(self, name):
+        """Like packed_phashes() for any hash of hashes()."""
+        mask = self.phash_mask()
+        return self.hashes(name)[mask], np.nonzero(mask)[0]
+
+    def packed_columns(self, names):
+        """
+        Several hashes per row packed into one array, row after row: the hash
+        names[k] of a row sits at position row * len(names) + k.
+        """
+        mask = self.phash_mask()
+        rows = np.nonzero(mask)[0]
+        packed = np.stack([self.hashes(name)[mask] for name in names], axis=1).ravel()
+        positions = (rows[:, np.newaxis] * len(names) + np.arange(len(names))).ravel()
+        return packed, positions
+
+    def digest_index(self):
+        """Map: digest -> [rows] (rows without a digest are left out)."""
+        index = {}
+        digests = self._digests
+        for row, has in enumerate(self._has_digest):
+            if has:
+                start = row * DIGEST_SIZE
+                index.setdefault(bytes(digests[start:start + DIGEST_SIZE]), []).append(row)
+        return index
+
+    def nbytes(self):
+        """Approximate memory of the columns (path strings not included)."""
+        return (self._sizes.itemsize * len(self._sizes) + len(self._digests) + len(self._has_digest)
+                + self._phashes.itemsize * len(self._phashes) + len(self._has_phash)
+                + sum(8 * len(column) for column in self._extra.values()))
+
+    # --- Library index file ---
+    def save(self, path, meta=None):
+        """
+        Write the store as a library index file (written to a temp file, then
+        renamed). meta: extra JSON-serializable info kept in the header
+        (e.g. the scanned folders).
+        """
+        header_meta = dict(meta or {}, digest_algo=self.digest_algo, phash_mode=self.phash_mode,
+                           extra_hashes=list(self.extra_hashes))
+        meta_bytes = json.dumps(header_meta, ensure_ascii=False).encode("utf-8")
+
+        encoded = [p.encode("utf-8", "surrogateescape") for p in self.paths]
+        offsets = array('Q', [0])
+        for raw in encoded:
+            offsets.append(offsets[-1] + len(raw))
+
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            def write_aligned(data):
+                f.write(data)
+                f.write(bytes(_align(f.tell()) - f.tell()))
+
+            write_aligned(_HEADER.pack(LIBRARY_MAGIC, LIBRARY_VERSION, len(meta_bytes), len(self.paths)))
+            write_aligned(meta_bytes)
+            columns = [self._sizes, self._phashes, self._digests, self._has_digest, self._has_phash]
+            columns += [self._extra[name] for name in self.extra_hashes]
+            for column in columns + [offsets]:
+                write_aligned(bytes(column) if not isinstance(column, array) else column.tobytes())
+            for raw in encoded:
+                f.write(raw)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Open a library index file written by save(). The columns and the path
+        table are views into an mmap, so loading costs no parsing and pages are
+        only read when used. Call close() to release the file.
+        """
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, meta_len, count = _HEADER.unpack_from(mm, 0)
+            if magic != LIBRARY_MAGIC or version not in LIBRARY_READABLE_VERSIONS:
+                raise ValueError(f"Not a library index file (or unsupported version): {path}")
+            view = memoryview(mm)
+            pos = _align(_HEADER.size)
+            meta = json.loads(bytes(view[pos:pos + meta_len]).decode("utf-8"))
+            pos = _align(pos + meta_len)
+
+            def take(nbytes):
+                nonlocal pos
+                section = view[pos:pos + nbytes]
+                pos = _align(pos + nbytes)
+                return section
+
+            store = cls(digest_algo=meta.pop('digest_algo'), phash_mode=meta.pop('phash_mode'),
+                        extra_hashes=meta.pop('extra_hashes', ()))
+            store.meta = meta
+            store._sizes = take(8 * count).cast('Q')
+            store._phashes = take(8 * count).cast('Q')
+            store._digests = take(DIGEST_SIZE * count)
+            store._has_digest = take(count)
+            store._has_phash = take(count)
+            store._extra = {name: take(8 * count).cast('Q') for name in store.extra_hashes}
+            offsets = take(8 * (count + 1)).cast('Q')
+            store.paths = _PathTable(view[pos:pos + (offsets[count] if count else 0)], offsets)
+        except Exception:
+            mm.close()
+            raise
+        store._mmap = mm
+        return store
+
+    @classmethod
+    def merge(cls, stores):
+        """
+        Concatenate stores (e.g. the shard parts of a library index, see
+        ImageScanner.merge_libraries) into a new in-memory store, rows in
+        order store after store. All must share digest_algo, phash_mode and
+        extra_hashes; duplicate paths are not checked.
+        """
+        stores = list(stores)
+        if not stores:
+            raise ValueError("Nothing to merge")
+        first = stores[0]
+        for other in stores[1:]:
+            if (other.digest_algo, other.phash_mode, other.extra_hashes) != \
+                    (first.digest_algo, first.phash_mode, first.extra_hashes):
+                raise ValueError(f"Cannot merge a {other.digest_algo} / {other.phash_mode} store into a "
+                                 f"{first.digest_algo} / {first.phash_mode} one (or their extra hashes differ)")
+
+        def raw(column):
+            return bytes(column) if not isinstance(column, array) else column.tobytes()
+
+        merged = cls(digest_algo=first.digest_algo, phash_mode=first.phash_mode, extra_hashes=first.extra_hashes)
+        for store in stores:
+            merged.paths.extend(sys.intern(p) for p in store.paths)
+            merged._sizes.frombytes(raw(store._sizes))
+            merged._phashes.frombytes(raw(store._phashes))
+            merged._digests.extend(raw(store._digests))
+            merged._has_digest.extend(raw(store._has_digest))
+            merged._has_phash.extend(raw(store._has_phash))
+            for name in merged.extra_hashes:
+                merged._extra[name].frombytes(raw(store._extra[name]))
+        return merged
+
+    def close(self):
+        """Release the mmap of a loaded store (no-op for in-memory stores)."""
+        if self._mmap is not None:
+            self._sizes = self._phashes = self._digests = self._has_digest = self._has_phash = None
+            self._extra = {}
+            self.paths = []
+            self._row_of = None
+            mm, self._mmap = self._mmap, None
+            try:
+                mm.close()
+            except BufferError:
+                pass  # Still exported to NumPy arrays; released when they are
+
+
+class _PathTable:
+    """Read-only sequence of paths decoded on access from a UTF-8 blob + offsets."""
+    __slots__ = ('_blob', '_offsets')
+
+    def __init__(self, blob, offsets):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        start, end = self._offsets[row], self._offsets[row + 1]
+        return str(self._blob[start:end], "utf-8", "surrogateescape")
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+
+class ScanRecord:
+    """
+    Read-only view of one ScanStore row.
+    Also supports record['path'] style access for code written against the
+    old per-file dicts.
+    """
+    __slots__ = ('store', 'row')
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    @property
+    def path(self):
+        return self.store.paths[self.row]
+
+    @property
+    def size(self):
+        return self.store.size(self.row)
+
+    @property
+    def digest(self):
+        return self.store.digest(self.row)
+
+    @property
+    def md5(self):
+        """Hex form of the content digest (None if not computed), whatever the store's digest_algo."""
+        digest = self.store.digest(self.row)
+        return digest.hex() if digest is not None else None
+
+    @property
+    def phash(self):
+        return self.store.phash(self.row)
+
+    def __getitem__(self, key):
+        if key not in ('path', 'size', 'digest', 'md5', 'phash'):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __repr__(self):
+        return f"ScanRecord({self.path!r}, size={self.size})"
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root (flat layout, no package)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(1, os.path.join(ROOT, "benchmarks"))
+
+from corpus import generate_corpus  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def corpus(tmp_path_factory):
+    """Small synthetic corpus (see benchmarks/corpus.py): (root, truth). Read-only, shared by all tests."""
+    root = str(tmp_path_factory.mktemp("corpus"))
+    truth = generate_corpus(root, originals=12, exact=2, resized=2, recompressed=2, cropped=2, unique=3,
+                            size=(256, 192))
+    return root, truth
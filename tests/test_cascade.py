@@ -0,0 +1,56 @@
+import os
+import random
+
+import imagehash
+import pytest
+
+from corpus import make_image
+from hashindex import hamming_distance
+from logic import ImageScanner, process_file_hashes, phash_to_int
+
+# Copyright (c) 2025 Photo Comparator. All rights reserved.
+# Licensed under the MIT License. See LICENSE file in the project root for full license information.
+
+
+def similar_pairs(matches):
+    return sorted(tuple(sorted((m['file_a'], m['file_b']))) for m in matches if m['type'] == '視覺相似')
+
+
+def test_cascade_keeps_true_pairs_and_tight_radii_prune(corpus):
+    root, truth = corpus
+    folders = ([os.path.join(root, "a")], [os.path.join(root, "b")])
+    near = sorted(tuple(sorted((a, b))) for a, b, kind in truth['pairs'] if kind != 'exact')
+
+    phash_only, _ = ImageScanner(workers=1).compare_folders(*folders)
+    scanner = ImageScanner(workers=1, cascade=('dhash', 'phash', 'whash'))
+    cascaded, _ = scanner.compare_folders(*folders)
+    assert similar_pairs(cascaded) == similar_pairs(phash_only)
+    assert set(similar_pairs(cascaded)) >= set(near)
+    assert scanner.metrics.counters['cascade_dhash_candidates'] >= len(near)
+
+    strict = ImageScanner(workers=1, cascade=('phash', 'whash'), cascade_radii={'whash': 0})
+    pruned, _ = strict.compare_folders(*folders)
+    assert len(similar_pairs(pruned)) < len(similar_pairs(phash_only))
+    assert strict.metrics.counters['cascade_whash_pruned'] > 0
+
+
+def test_invalid_cascade_is_rejected():
+    with pytest.raises(ValueError):
+        ImageScanner(cascade=('dhash', 'whash'))
+    with pytest.raises(ValueError):
+        ImageScanner(cascade=('phash', 'nohash'))
+
+
+def test_fast_decode_keeps_colours_for_colorhash(tmp_path):
+    path = str(tmp_path / "photo.jpg")
+    img = make_image(random.Random(5), (1024, 768))
+    img.save(path, quality=90)
+
+    _, _, _, phash, (colorhash,) = process_file_hashes((path, True, False, True, 'md5', False, ('colorhash',)))
+    full = phash_to_int(imagehash.colorhash(img, binbits=4))
+    gray = phash_to_int(imagehash.colorhash(img.convert("L"), binbits=4))
+    assert hamming_distance(colorhash, full) < hamming_distance(colorhash, gray)
+    assert hamming_distance(phash, phash_to_int(imagehash.phash(img))) <= 4
+
+    assert ImageScanner(fast_decode=True, cascade=('phash', 'colorhash')).phash_mode == 'fast-color'
+    assert ImageScanner(fast_decode=True, cascade=('phash', 'whash')).phash_mode == 'fast'
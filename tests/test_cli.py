@@ -0,0 +1,24 @@
+import pytest
+
+import cli
+
+# Copyright (c) 2025 Photo Comparator. All rights reserved.
+# Licensed under the MIT License. See LICENSE file in the project root for full license information.
+
+
+@pytest.mark.parametrize("extra, message", [
+    (["-a", "{folder}"], "do not pass -a"),
+    (["--state", "{folder}/state.db"], "cannot be combined"),
+    (["--watch"], "cannot be combined"),
+    (["--library", "{folder}/other.idx"], "cannot be combined"),
+])
+def test_build_library_rejects_options_it_would_ignore(tmp_path, capsys, extra, message):
+    folder = str(tmp_path)
+    argv = ["-b", folder, "--build-library", str(tmp_path / "lib.idx")] + [arg.format(folder=folder) for arg in extra]
+
+    with pytest.raises(SystemExit) as exc:
+        cli.main(argv)
+
+    assert exc.value.code == 2
+    assert message in capsys.readouterr().err
+    assert not (tmp_path / "lib.idx").exists()
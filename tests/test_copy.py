@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from logic import DestinationNamer, ImageScanner, place_file
+
+# Copyright (c) 2025 Photo Comparator. All rights reserved.
+# Licensed under the MIT License. See LICENSE file in the project root for full license information.
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def test_namer_adds_copy_suffixes(tmp_path):
+    target = write(str(tmp_path / "photo.jpg"), b"on disk")
+    namer = DestinationNamer()
+
+    assert namer.claim(target) == str(tmp_path / "photo_copy.jpg")
+    assert namer.claim(target) == str(tmp_path / "photo_copy2.jpg")
+    assert namer.claim(str(tmp_path / "other.jpg")) == str(tmp_path / "other.jpg")
+
+
+@pytest.mark.parametrize("mode", ["copy", "hardlink", "symlink"])
+def test_place_file_never_overwrites(tmp_path, mode):
+    src = write(str(tmp_path / "src.jpg"), b"new")
+    dst = write(str(tmp_path / "dst.jpg"), b"old")
+
+    with pytest.raises(FileExistsError):
+        place_file(src, dst, mode)
+    with open(dst, "rb") as f:
+        assert f.read() == b"old"
+
+
+@pytest.mark.parametrize("mode", ["copy", "hardlink", "symlink"])
+def test_missing_source_leaves_nothing_behind(tmp_path, mode):
+    dst = str(tmp_path / "dst.jpg")
+
+    with pytest.raises(FileNotFoundError):
+        place_file(str(tmp_path / "gone.jpg"), dst, mode)
+    assert not os.path.lexists(dst)
+
+
+def test_copy_files_keeps_both_names_and_counts_written_bytes(tmp_path):
+    a = write(str(tmp_path / "a" / "x" / "photo.jpg"), b"1" * 100)
+    b = write(str(tmp_path / "a" / "y" / "photo.jpg"), b"2" * 50)
+    missing = str(tmp_path / "a" / "missing.jpg")
+    dest = str(tmp_path / "dest")
+
+    summary = ImageScanner().copy_files([a, b, missing], dest)
+    assert summary['copied'] == 2 and summary['bytes'] == 150
+    assert [path for path, _ in summary['failed']] == [missing]
+    assert sorted(os.listdir(dest)) == ["photo.jpg", "photo_copy.jpg"]
+
+    linked = ImageScanner().copy_files([a, missing], str(tmp_path / "links"), mode='symlink')
+    assert linked['copied'] == 1 and linked['bytes'] == 0
+    assert os.listdir(str(tmp_path / "links")) == ["photo.jpg"]
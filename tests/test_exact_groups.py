@@ -0,0 +1,48 @@
+import os
+
+from logic import ImageScanner
+
+# Copyright (c) 2025 Photo Comparator. All rights reserved.
+# Licensed under the MIT License. See LICENSE file in the project root for full license information.
+
+
+def copies(folder, name, data, count):
+    paths = []
+    for k in range(count):
+        path = os.path.join(str(folder), f"{name}{k}.jpg")
+        with open(path, "wb") as f:
+            f.write(data)
+        paths.append(path)
+    return paths
+
+
+def test_self_compare_reports_one_group_per_content(tmp_path):
+    many = copies(tmp_path, "many", b"x" * 5000, 50)
+    pair = copies(tmp_path, "pair", b"y" * 5000, 2)
+    lonely = copies(tmp_path, "lonely", b"z" * 5000, 1)
+
+    matches, unique = ImageScanner(workers=1).compare_folders([str(tmp_path)], [], check_similar=False)
+
+    assert sorted(sorted(m['group']) for m in matches) == sorted([sorted(many), sorted(pair)])
+    for m in matches:
+        assert m['type'] == '完全相同' and m['score'] == 100.0
+        assert {m['file_a'], m['file_b']} <= set(m['group']) and m['file_a'] != m['file_b']
+    assert unique == lonely
+
+
+def test_a_versus_b_group_lists_a_members_first(tmp_path):
+    folder_a, folder_b = tmp_path / "a", tmp_path / "b"
+    folder_a.mkdir()
+    folder_b.mkdir()
+    in_a = copies(folder_a, "photo", b"same" * 1000, 3)
+    in_b = copies(folder_b, "archived", b"same" * 1000, 2)
+    only_a = copies(folder_a, "only", b"other" * 1000, 2)  # Duplicates inside A do not match B
+
+    matches, unique = ImageScanner(workers=1).compare_folders([str(folder_a)], [str(folder_b)],
+                                                              check_similar=False)
+
+    assert len(matches) == 1
+    group = matches[0]['group']
+    assert sorted(group[:3]) == sorted(in_a) and sorted(group[3:]) == sorted(in_b)
+    assert matches[0]['file_a'] in in_a and matches[0]['file_b'] in in_b
+    assert sorted(unique) == sorted(only_a)
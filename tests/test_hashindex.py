@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+from hashindex import INDEX_TYPES, search_pairs, hamming_distance
+
+# Copyright (c) 2025 Photo Comparator. All rights reserved.
+# Licensed under the MIT License. See LICENSE file in the project root for full license information.
+
+
+def near(h, rng, bits):
+    for bit in rng.sample(range(64), bits):
+        h ^= 1 << bit
+    return h
+
+
+def make_hashes(seed, count):
+    """Clusters of near-duplicates around a few centres, plus exact repeats and missing hashes."""
+    rng = random.Random(seed)
+    centres = [rng.getrandbits(64) for _ in range(12)] + [0, 2 ** 64 - 1]
+    hashes = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.1:
+            hashes.append(None)
+        elif roll < 0.2 and hashes:
+            hashes.append(rng.choice(hashes))
+        else:
+            hashes.append(near(rng.choice(centres), rng, rng.randint(0, 14)))
+    return hashes
+
+
+def collect(index_type, source, target, radius, self_compare=False):
+    found = []
+    for _, pairs in search_pairs(index_type, source, target, radius, self_compare=self_compare, tile=16, batch=7):
+        found.extend(pairs)
+    return sorted(found)
+
+
+@pytest.mark.parametrize("radius", [0, 3, 6, 10])
+@pytest.mark.parametrize("index_type", [name for name in INDEX_TYPES if name != 'linear'])
+def test_indexes_agree_with_linear_scan(index_type, radius):
+    source, target = make_hashes(1, 150), make_hashes(2, 200)
+
+    expected = collect('linear', source, target, radius)
+    assert expected  # The data must actually produce pairs at every radius
+    assert collect(index_type, source, target, radius) == expected
+    for i, j, d in expected:
+        assert d == hamming_distance(source[i], target[j]) <= radius
+
+
+@pytest.mark.parametrize("radius", [0, 6])
+@pytest.mark.parametrize("index_type", [name for name in INDEX_TYPES if name != 'linear'])
+def test_indexes_agree_with_linear_scan_on_self_compare(index_type, radius):
+    hashes = make_hashes(3, 200)
+
+    expected = collect('linear', hashes, None, radius, self_compare=True)
+    assert expected
+    assert all(i < j for i, j, _ in expected)
+    assert collect(index_type, hashes, None, radius, self_compare=True) == expected
@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+from logic import ImageScanner
+
+# Copyright (c) 2025 Photo Comparator. All rights reserved.
+# Licensed under the MIT License. See LICENSE file in the project root for full license information.
+
+
+def normalize(matches):
+    return sorted((m['type'], tuple(sorted(m.get('group') or (m['file_a'], m['file_b'])))) for m in matches)
+
+
+def test_compare_against_library_equals_folder_compare(corpus, tmp_path):
+    root, _ = corpus
+    folder_a, folder_b = os.path.join(root, "a"), os.path.join(root, "b")
+    path = str(tmp_path / "b.idx")
+    scanner = ImageScanner(workers=1)
+    scanner.build_library([folder_b], path)
+
+    library = scanner.load_library(path)
+    try:
+        assert library.meta['use_phash'] is True
+        with_library, unique = scanner.compare_folders([folder_a], [], library=library)
+    finally:
+        library.close()
+    direct, direct_unique = scanner.compare_folders([folder_a], [folder_b])
+    assert normalize(with_library) == normalize(direct)
+    assert sorted(unique) == sorted(direct_unique)
+
+
+def test_exact_only_library_rejects_a_similarity_compare(corpus, tmp_path):
+    root, truth = corpus
+    path = str(tmp_path / "exact.idx")
+    scanner = ImageScanner(workers=1)
+    scanner.build_library([os.path.join(root, "b")], path, use_phash=False)
+
+    library = scanner.load_library(path)
+    try:
+        with pytest.raises(ValueError, match="without pHashes"):
+            scanner.compare_folders([os.path.join(root, "a")], [], check_similar=True, library=library)
+        matches, _ = scanner.compare_folders([os.path.join(root, "a")], [], check_similar=False, library=library)
+    finally:
+        library.close()
+    exact = sum(1 for _, _, kind in truth['pairs'] if kind == 'exact')
+    assert len(matches) == exact
@@ -0,0 +1,72 @@
+import json
+import os
+import shutil
+
+from incremental import IncrementalScanner
+from logic import ImageScanner
+from metrics import ScanMetrics
+
+# Copyright (c) 2025 Photo Comparator. All rights reserved.
+# Licensed under the MIT License. See LICENSE file in the project root for full license information.
+
+
+def files_in(folder):
+    return [os.path.join(dirpath, name) for dirpath, _, names in os.walk(folder) for name in names]
+
+
+def test_scan_counters_phases_and_failures(corpus, tmp_path):
+    root, _ = corpus
+    broken = tmp_path / "broken"
+    broken.mkdir()
+    (broken / "not_an_image.jpg").write_bytes(b"definitely not a JPEG")
+    folder_a = os.path.join(root, "a")
+
+    events = []
+    scanner = ImageScanner(workers=1, metrics_listener=events.append)
+    scanner.compare_folders([folder_a, str(broken)], [os.path.join(root, "b")])
+    report = scanner.metrics.to_dict()
+
+    walked = len(files_in(folder_a)) + 1 + len(files_in(os.path.join(root, "b")))
+    assert report['counters']['files_walked'] == walked
+    assert report['counters']['files_hashed'] <= walked
+    assert {'walk', 'hash', 'compare_exact', 'compare_similar'} <= set(report['phases'])
+    assert report['failure_count'] == 1
+    assert report['failure_samples'][0]['path'] == str(broken / "not_an_image.jpg")
+    assert {event['event'] for event in events} >= {'phase', 'failure'}
+
+    scanner.compare_folders([folder_a], [])
+    assert scanner.metrics.to_dict()['failure_count'] == 0  # Reset by each comparison
+
+
+def test_report_file_and_cache_hit_rate(tmp_path):
+    metrics = ScanMetrics()
+    metrics.add('cache_hits', 3)
+    metrics.add('cache_misses')
+    with metrics.phase('walk'):
+        pass
+    path = str(tmp_path / "report.json")
+    metrics.save(path, extra={'exit_code': 0})
+
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+    assert report['cache_hit_rate'] == 0.75
+    assert report['phases']['walk']['calls'] == 1
+    assert report['exit_code'] == 0
+
+
+def test_each_rescan_starts_a_new_report(corpus, tmp_path):
+    root, _ = corpus
+    folder = tmp_path / "a"
+    shutil.copytree(os.path.join(root, "a"), str(folder))
+    scanner = ImageScanner(workers=1)
+    inc = IncrementalScanner(scanner, [str(folder)])
+
+    inc.rescan()
+    first = scanner.metrics.to_dict()['counters']
+    assert first['files_hashed'] == len(files_in(str(folder)))
+
+    shutil.copy(files_in(str(folder))[0], str(folder / "new.jpg"))
+    inc.rescan()
+    second = scanner.metrics.to_dict()['counters']
+    assert second['files_hashed'] == 1
+    assert second['files_walked'] == first['files_walked'] + 1
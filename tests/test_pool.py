@@ -0,0 +1,58 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import logic
+from logic import CHUNKS_IN_FLIGHT_PER_WORKER, MAX_CHUNK_SIZE, ImageScanner
+
+# Copyright (c) 2025 Photo Comparator. All rights reserved.
+# Licensed under the MIT License. See LICENSE file in the project root for full license information.
+
+
+def square(task):
+    path, n = task
+    if n % 97 == 13:
+        raise ValueError(f"bad task {n}")
+    return (path, n * n)
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    """Thread pool in place of the process pool, recording how many chunks were outstanding at once."""
+    peak = 0
+    chunk_sizes = []
+
+    def __init__(self, max_workers):
+        super().__init__(max_workers=max_workers)
+        self._lock = threading.Lock()
+        self._outstanding = 0
+
+    def submit(self, fn, *args):
+        with self._lock:
+            self._outstanding += 1
+            CountingExecutor.peak = max(CountingExecutor.peak, self._outstanding)
+            if args:
+                CountingExecutor.chunk_sizes.append(len(args[0][1]))
+        future = super().submit(fn, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self._outstanding -= 1
+
+
+def test_chunks_in_flight_stay_bounded(monkeypatch):
+    monkeypatch.setattr(logic, "ProcessPoolExecutor", CountingExecutor)
+    CountingExecutor.peak, CountingExecutor.chunk_sizes = 0, []
+    tasks = [(f"/photos/{n}.jpg", n) for n in range(5000)]
+    results = {}
+
+    scanner = ImageScanner(workers=3)
+    assert scanner._run_parallel(square, tasks, lambda r: results.__setitem__(r[0], r[1]), "status_analyzing",
+                                 'hash')
+
+    failed = {path for path, n in tasks if n % 97 == 13}
+    assert results == {path: n * n for path, n in tasks if path not in failed}
+    assert scanner.metrics.failures['hash'] == {'ValueError': len(failed)}
+    assert CountingExecutor.peak <= 3 * CHUNKS_IN_FLIGHT_PER_WORKER
+    assert max(CountingExecutor.chunk_sizes) <= MAX_CHUNK_SIZE
+    assert sum(CountingExecutor.chunk_sizes) == len(tasks)
@@ -0,0 +1,64 @@
+import os
+
+from logic import ImageScanner, PARTIAL_BLOCK, process_partial_hash
+
+# Copyright (c) 2025 Photo Comparator. All rights reserved.
+# Licensed under the MIT License. See LICENSE file in the project root for full license information.
+
+SIZE = 3 * PARTIAL_BLOCK
+
+
+def write(folder, name, data):
+    path = os.path.join(str(folder), name)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def test_only_colliding_files_get_a_full_hash(tmp_path):
+    body = os.urandom(SIZE)
+    write(tmp_path, "lonely.jpg", os.urandom(SIZE + 1))                     # Unique size: never read
+    write(tmp_path, "head_a.jpg", b"a" + body[1:])                          # Same size, other head
+    write(tmp_path, "head_b.jpg", b"b" + body[1:])
+    middle = body[:SIZE // 2] + bytes([body[SIZE // 2] ^ 1]) + body[SIZE // 2 + 1:]
+    write(tmp_path, "middle.jpg", middle)                                   # Same head and tail as body
+    copy_1 = write(tmp_path, "copy1.jpg", body)
+    copy_2 = write(tmp_path, "copy2.jpg", body)
+
+    scanner = ImageScanner(workers=1)
+    matches, unique = scanner.compare_folders([str(tmp_path)], [], check_similar=False)
+
+    assert [sorted(m['group']) for m in matches] == [sorted([copy_1, copy_2])]
+    assert len(unique) == 4
+    assert scanner.exact_stats == {'files': 6, 'size_candidates': 5, 'partial_hashed': 5,
+                                   'full_hash_candidates': 3}
+
+
+def test_small_files_are_fully_hashed_by_the_partial_pass(tmp_path):
+    small = write(tmp_path, "small.jpg", os.urandom(2 * PARTIAL_BLOCK))
+    large = write(tmp_path, "large.jpg", os.urandom(2 * PARTIAL_BLOCK + 1))
+
+    _, partial, digest = process_partial_hash((small, 2 * PARTIAL_BLOCK))
+    assert digest == partial is not None
+    _, partial, digest = process_partial_hash((large, 2 * PARTIAL_BLOCK + 1))
+    assert partial is not None and digest is None
+
+
+def test_a_versus_b_skips_sizes_missing_on_one_side(tmp_path):
+    folder_a, folder_b = tmp_path / "a", tmp_path / "b"
+    folder_a.mkdir()
+    folder_b.mkdir()
+    body = os.urandom(SIZE)
+    write(folder_a, "twin_a1.jpg", body)
+    write(folder_a, "twin_a2.jpg", body)  # Duplicates inside A only: not an A vs B candidate
+    write(folder_a, "match.jpg", body[::-1])
+    write(folder_b, "match.jpg", body[::-1])
+    write(folder_b, "other.jpg", os.urandom(SIZE + 7))
+
+    scanner = ImageScanner(workers=1)
+    matches, _ = scanner.compare_folders([str(folder_a)], [str(folder_b)], check_similar=False)
+
+    assert [(os.path.basename(m['file_a']), os.path.basename(m['file_b'])) for m in matches] == \
+        [("match.jpg", "match.jpg")]
+    assert scanner.exact_stats['size_candidates'] == 4
+    assert scanner.exact_stats['full_hash_candidates'] == 2
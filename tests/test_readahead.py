@@ -0,0 +1,62 @@
+import os
+
+from logic import ReadAhead
+
+# Copyright (c) 2025 Photo Comparator. All rights reserved.
+# Licensed under the MIT License. See LICENSE file in the project root for full license information.
+
+MB = 1024 * 1024
+
+
+def run_reader(chunks, max_bytes, threads=4):
+    """Drive a ReadAhead like ImageScanner._run_parallel does; returns (reader, {path: span bytes or None})."""
+    chunks = iter(chunks)
+    reader = ReadAhead(lambda: next(chunks, None), lambda task: os.path.getsize(task[0]), threads, max_bytes, 8,
+                       lambda: False)
+    reader.start()
+    got = {}
+    try:
+        while not reader.finished():
+            ready = reader.take(block=True)
+            if ready is None:
+                continue
+            chunk, shm, spans = ready
+            assert shm.size <= max(max_bytes, 4096)
+            for task, span in zip(chunk, spans):
+                got[task[0]] = None if span is None else bytes(shm.buf[span[0]:span[0] + span[1]])
+            reader.release(shm)
+    finally:
+        reader.close()
+    return reader, got
+
+
+def test_read_ahead_stays_within_budget(tmp_path):
+    contents = {}
+    for k in range(24):
+        path = str(tmp_path / f"{k}.bin")
+        contents[path] = os.urandom(3 * MB + k)
+        with open(path, "wb") as f:
+            f.write(contents[path])
+    tasks = [(path,) for path in contents]
+
+    budget = 4 * MB
+    # Chunks far larger than the budget, as the pool's 64-task chunks can be
+    reader, got = run_reader([tasks[:16], tasks[16:]], budget)
+
+    assert reader.peak_bytes <= budget
+    assert got == contents
+    assert reader.fallback == 0
+
+
+def test_files_above_the_budget_are_left_to_the_workers(tmp_path):
+    small, large = str(tmp_path / "small.bin"), str(tmp_path / "large.bin")
+    with open(small, "wb") as f:
+        f.write(b"x" * 1000)
+    with open(large, "wb") as f:
+        f.write(b"y" * (2 * MB))
+
+    reader, got = run_reader([[(small,), (large,)]], MB)
+
+    assert got == {small: b"x" * 1000, large: None}
+    assert reader.fallback == 1
+    assert reader.peak_bytes <= MB
@@ -0,0 +1,141 @@
+import os
+import random
+
+import imagehash
+import pytest
+from PIL import Image
+
+from corpus import make_image
+from hashindex import INDEX_TYPES, fold_variant_batches, hamming_distance, search_pairs
+from incremental import IncrementalScanner
+from logic import DIHEDRAL_INVERSE, DIHEDRAL_VARIANTS, ImageScanner, dihedral_phashes, phash_to_int
+
+# Copyright (c) 2025 Photo Comparator. All rights reserved.
+# Licensed under the MIT License. See LICENSE file in the project root for full license information.
+
+TRANSPOSE = {
+    'rot90': Image.Transpose.ROTATE_90,
+    'rot180': Image.Transpose.ROTATE_180,
+    'rot270': Image.Transpose.ROTATE_270,
+}
+
+
+def apply_variant(img, name):
+    """DIHEDRAL_VARIANTS operation with PIL: mirror left-right first, then turn counter-clockwise."""
+    if name.startswith('flip'):
+        img = img.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+        name = name[len('flip_'):]
+    return img.transpose(TRANSPOSE[name]) if name in TRANSPOSE else img
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_dihedral_phashes_match_phash_of_the_transposed_image(seed):
+    img = make_image(random.Random(seed), (320, 240))
+    hashes = dihedral_phashes(img)
+
+    assert hashes[0] == phash_to_int(imagehash.phash(img))
+    for variant, name in enumerate(DIHEDRAL_VARIANTS):
+        # Each variant is thresholded at its own median; ties may flip a bit or two
+        assert hamming_distance(hashes[variant], phash_to_int(imagehash.phash(apply_variant(img, name)))) <= 2
+
+
+def far_apart(rng, count, min_distance=16):
+    values = []
+    while len(values) < count:
+        h = rng.getrandbits(64)
+        if all(hamming_distance(h, other) >= min_distance for other in values):
+            values.append(h)
+    return values
+
+
+@pytest.mark.parametrize("reverse_only", [True, False])
+def test_self_compare_keeps_a_pair_matching_in_one_direction(reverse_only):
+    rng = random.Random(7)
+    variants = far_apart(rng, 16)
+    originals = [variants[0], variants[8]]
+    # Source 1 is 3 bits from the rot90 variant of item 0 ...
+    originals[1] = variants[8] = variants[1] ^ 0b111
+    if not reverse_only:
+        # ... and source 0 is 1 bit from the rot270 variant of item 1, the same pair seen the other way
+        variants[8 + 3] = originals[0] ^ 1
+    targets = [variants[0]] + variants[1:8] + [variants[8]] + variants[9:]
+
+    batches = search_pairs('linear', originals, targets, 4, batch=1)
+    found = {}
+    for _, pairs, orientation, _ in fold_variant_batches(batches, len(DIHEDRAL_VARIANTS), DIHEDRAL_INVERSE):
+        for i, j, d in pairs:
+            assert (i, j) not in found
+            found[(i, j)] = (d, DIHEDRAL_VARIANTS[orientation[(i, j)]])
+
+    # Either way the pair is (0, 1), turning item 1 by rot270 gives item 0
+    assert found == {(0, 1): (3 if reverse_only else 1, 'rot270')}
+
+
+@pytest.fixture(scope="module")
+def rotated(corpus, tmp_path_factory):
+    """Originals in b/, rotated / mirrored copies of some of them in a/: {a path: (b path, variant name)}."""
+    root, _ = corpus
+    originals = sorted(os.path.join(dirpath, name) for dirpath, _, names in os.walk(os.path.join(root, "b"))
+                       for name in names)[:8]
+    folder = str(tmp_path_factory.mktemp("rotated"))
+    os.makedirs(os.path.join(folder, "a"))
+    os.makedirs(os.path.join(folder, "b"))
+    expected = {}
+    for k, src in enumerate(originals):
+        with Image.open(src) as img:
+            img = img.convert("RGB")
+        b_path = os.path.join(folder, "b", f"{k}.jpg")
+        img.save(b_path, quality=92)
+        name = DIHEDRAL_VARIANTS[1 + k % 7]
+        a_path = os.path.join(folder, "a", f"{k}_{name}.jpg")
+        apply_variant(img, name).save(a_path, quality=85)
+        expected[a_path] = (b_path, name)
+    return folder, expected
+
+
+def test_rotated_copies_are_found_with_their_orientation(rotated):
+    folder, expected = rotated
+    folders = ([os.path.join(folder, "a")], [os.path.join(folder, "b")])
+
+    matches, _ = ImageScanner(workers=1, rotation_invariant=True).compare_folders(*folders)
+    found = {m['file_a']: (m['file_b'], m.get('orientation')) for m in matches}
+    for a_path, (b_path, name) in expected.items():
+        assert found[a_path][0] == b_path
+        # orientation turns file_b into file_a
+        with Image.open(a_path) as a_img, Image.open(b_path) as b_img:
+            turned = apply_variant(b_img, found[a_path][1])
+            assert hamming_distance(dihedral_phashes(a_img)[0], dihedral_phashes(turned)[0]) <= 10
+
+    plain, _ = ImageScanner(workers=1).compare_folders(*folders)
+    assert len(plain) < len(matches)
+
+
+def test_rotation_invariant_self_compare_agrees_across_indexes(rotated):
+    folder, expected = rotated
+    scanner = ImageScanner(workers=1, rotation_invariant=True)
+    results = {}
+    for index_type in INDEX_TYPES:
+        matches, _ = scanner.compare_folders([os.path.join(folder, "a"), os.path.join(folder, "b")], [],
+                                             index_type=index_type)
+        results[index_type] = sorted((m['file_a'], m['file_b'], m.get('orientation'), m['score']) for m in matches)
+        assert len(results[index_type]) == len(set((a, b) for a, b, _, _ in results[index_type]))
+    assert all(result == results['linear'] for result in results.values())
+    pairs = {frozenset((a, b)) for a, b, _, _ in results['linear']}
+    assert all(frozenset((a_path, b_path)) in pairs for a_path, (b_path, _) in expected.items())
+
+
+@pytest.mark.parametrize("self_compare", [False, True])
+def test_incremental_rescan_matches_a_full_scan(rotated, tmp_path, self_compare):
+    folder, _ = rotated
+    folders_a = [os.path.join(folder, "a")] + ([os.path.join(folder, "b")] if self_compare else [])
+    folders_b = [] if self_compare else [os.path.join(folder, "b")]
+    scanner = ImageScanner(workers=1, rotation_invariant=True)
+    full, _ = scanner.compare_folders(folders_a, folders_b)
+
+    inc = IncrementalScanner(scanner, folders_a, folders_b, state_path=str(tmp_path / "state.json"))
+    inc.rescan()
+
+    def normalize(matches):
+        return sorted((m['file_a'], m['file_b'], m.get('orientation'), m['score'])
+                      for m in matches if m['type'] == '視覺相似')
+    assert normalize(inc.matches()) == normalize(full)
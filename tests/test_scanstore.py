@@ -0,0 +1,106 @@
+import json
+import struct
+from array import array
+
+import pytest
+
+from scanstore import ScanStore, LIBRARY_MAGIC, LIBRARY_VERSION, DIGEST_SIZE
+
+# Copyright (c) 2025 Photo Comparator. All rights reserved.
+# Licensed under the MIT License. See LICENSE file in the project root for full license information.
+
+ROWS = [
+    # path, size, digest, phash, extra (dhash, whash)
+    ("/photos/a.jpg", 1234, bytes(range(16)), 0x0123456789ABCDEF, (0xFFFFFFFFFFFFFFFF, 7)),
+    ("/photos/été/ß.png", 0, None, 0x8000000000000001, (1, 2)),
+    ("/photos/broken.gif", 2 ** 40, b"\xff" * DIGEST_SIZE, None, None),
+    ("/photos/undecodable\udcff.jpg", 99, None, None, None),
+]
+
+
+def make_store(extra_hashes=()):
+    store = ScanStore(digest_algo='blake2b', phash_mode='fast', extra_hashes=extra_hashes)
+    for path, size, digest, phash, extra in ROWS:
+        store.append(path, size, digest=digest, phash=phash, extra=extra[:len(extra_hashes)] if extra else None)
+    return store
+
+
+def content(store):
+    return [(rec.path, rec.size, rec.digest, rec.phash, tuple(store.hash(name, rec.row) for name in store.extra_hashes))
+            for rec in store]
+
+
+def write_v1(store, path, meta):
+    """Library index as written before the extra hash columns existed (format version 1)."""
+    def aligned(data):
+        return data + bytes(-len(data) % 8)
+
+    meta_bytes = json.dumps(dict(meta, digest_algo=store.digest_algo, phash_mode=store.phash_mode)).encode("utf-8")
+    encoded = [p.encode("utf-8", "surrogateescape") for p in store.paths]
+    offsets = array('Q', [0])
+    for raw in encoded:
+        offsets.append(offsets[-1] + len(raw))
+    with open(path, "wb") as f:
+        f.write(aligned(struct.pack("<8sIIQ", LIBRARY_MAGIC, 1, len(meta_bytes), len(store))))
+        f.write(aligned(meta_bytes))
+        for column in (store._sizes.tobytes(), store._phashes.tobytes(), bytes(store._digests),
+                       bytes(store._has_digest), bytes(store._has_phash), offsets.tobytes()):
+            f.write(aligned(column))
+        f.write(b"".join(encoded))
+
+
+@pytest.mark.parametrize("extra_hashes", [(), ('dhash', 'whash')])
+def test_library_round_trip(tmp_path, extra_hashes):
+    store = make_store(extra_hashes)
+    path = str(tmp_path / "library.idx")
+    store.save(path, meta={'folders': ["/photos"]})
+
+    with open(path, "rb") as f:
+        assert struct.unpack("<8sI", f.read(12)) == (LIBRARY_MAGIC, LIBRARY_VERSION)
+    loaded = ScanStore.load(path)
+    try:
+        assert (loaded.digest_algo, loaded.phash_mode, loaded.extra_hashes) == ('blake2b', 'fast', extra_hashes)
+        assert loaded.meta == {'folders': ["/photos"]}
+        assert content(loaded) == content(store)
+        assert loaded.find("/photos/été/ß.png").row == 1
+        for name in ('phash',) + extra_hashes:
+            assert loaded.hashes(name).tolist() == store.hashes(name).tolist()
+        assert loaded.phash_mask().tolist() == [True, True, False, False]
+        with pytest.raises(ValueError):
+            loaded.append("/photos/new.jpg", 1)
+    finally:
+        loaded.close()
+
+
+def test_version_1_library_still_loads(tmp_path):
+    store = make_store()
+    path = str(tmp_path / "old.idx")
+    write_v1(store, path, {'folders': ["/photos"]})
+
+    loaded = ScanStore.load(path)
+    try:
+        assert loaded.extra_hashes == ()
+        assert loaded.meta == {'folders': ["/photos"]}
+        assert content(loaded) == content(store)
+    finally:
+        loaded.close()
+
+
+def test_empty_library_round_trip(tmp_path):
+    path = str(tmp_path / "empty.idx")
+    ScanStore(extra_hashes=('dhash',)).save(path)
+    loaded = ScanStore.load(path)
+    try:
+        assert len(loaded) == 0 and list(loaded) == []
+    finally:
+        loaded.close()
+
+
+def test_unknown_file_is_rejected(tmp_path):
+    path = tmp_path / "other.idx"
+    path.write_bytes(struct.pack("<8sIIQ", LIBRARY_MAGIC, LIBRARY_VERSION + 1, 0, 0))
+    with pytest.raises(ValueError):
+        ScanStore.load(str(path))
+    path.write_bytes(b"not an index at all, just some bytes")
+    with pytest.raises(ValueError):
+        ScanStore.load(str(path))
@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from logic import ImageScanner, shard_of
+
+# Copyright (c) 2025 Photo Comparator. All rights reserved.
+# Licensed under the MIT License. See LICENSE file in the project root for full license information.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def rows(store):
+    """Order-independent content of a library: path -> (size, digest, pHash)."""
+    return {rec.path: (rec.size, rec.digest, rec.phash) for rec in store}
+
+
+def test_shard_of_is_stable_and_spreads_paths():
+    paths = [f"/archive/{n // 100}/IMG_{n:05d}.jpg" for n in range(4000)]
+    shards = [shard_of(path, 4) for path in paths]
+
+    assert all(0 <= s < 4 for s in shards)
+    assert all(900 < shards.count(s) < 1100 for s in range(4))
+    # Same answer in another interpreter (hash() would be salted per process)
+    code = "import sys; from logic import shard_of; print([shard_of(p, 4) for p in sys.argv[1:]])"
+    out = subprocess.run([sys.executable, "-c", code] + paths[:50], cwd=ROOT, capture_output=True, text=True,
+                         check=True).stdout
+    assert out.strip() == str(shards[:50])
+
+
+def test_merged_shards_equal_a_full_build(corpus, tmp_path):
+    root, _ = corpus
+    folder_b = os.path.join(root, "b")
+    scanner = ImageScanner(workers=1)
+    parts = [str(tmp_path / f"part{i}.idx") for i in range(3)]
+    for i, part in enumerate(parts):
+        scanner.build_library([folder_b], part, shard=(i, 3))
+    scanner.merge_libraries(parts, str(tmp_path / "merged.idx"))
+    scanner.build_library([folder_b], str(tmp_path / "full.idx"))
+
+    merged = scanner.load_library(str(tmp_path / "merged.idx"))
+    full = scanner.load_library(str(tmp_path / "full.idx"))
+    try:
+        assert rows(merged) == rows(full)
+        assert merged.meta['shards'] == 3
+        for i, part in enumerate(parts):
+            store = scanner.load_library(part)
+            try:
+                assert all(shard_of(path, 3) == i for path in store.paths)
+            finally:
+                store.close()
+    finally:
+        merged.close()
+        full.close()
+
+
+def test_incomplete_or_mixed_parts_are_rejected(corpus, tmp_path):
+    root, _ = corpus
+    scanner = ImageScanner(workers=1)
+    part0, part1 = str(tmp_path / "part0.idx"), str(tmp_path / "part1.idx")
+    scanner.build_library([os.path.join(root, "b")], part0, shard=(0, 2))
+    scanner.build_library([os.path.join(root, "a")], part1, shard=(1, 2))  # Another folder set
+
+    with pytest.raises(ValueError, match="Missing shard"):
+        scanner.merge_libraries([part0], str(tmp_path / "merged.idx"))
+    with pytest.raises(ValueError, match="different sharded build"):
+        scanner.merge_libraries([part0, part1], str(tmp_path / "merged.idx"))
+    with pytest.raises(ValueError, match="given twice"):
+        scanner.merge_libraries([part0, part0], str(tmp_path / "merged.idx"))
@@ -0,0 +1,59 @@
+import os
+import time
+
+import logic
+from logic import ImageScanner, TaskStream
+
+# Copyright (c) 2025 Photo Comparator. All rights reserved.
+# Licensed under the MIT License. See LICENSE file in the project root for full license information.
+
+
+class Recorder:
+    """Stands in for a ProgressChannel: keeps every published state."""
+
+    def __init__(self):
+        self.events = []
+
+    def publish(self, key, current=0, total=0):
+        self.events.append((key, current, total))
+
+
+def normalize(matches):
+    return sorted((m['type'], tuple(sorted(m.get('group') or (m['file_a'], m['file_b']))), m['score'])
+                  for m in matches)
+
+
+def test_streaming_scan_equals_the_batch_scan(corpus):
+    root, _ = corpus
+    folders = ([os.path.join(root, "a")], [os.path.join(root, "b")])
+    recorder = Recorder()
+
+    batch, batch_unique = ImageScanner(workers=2).compare_folders(*folders)
+    streaming, streaming_unique = ImageScanner(workers=2, streaming=True, progress=recorder).compare_folders(*folders)
+
+    assert normalize(streaming) == normalize(batch)
+    assert sorted(streaming_unique) == sorted(batch_unique)
+
+    # Processed vs discovered: never ahead, and both sides end complete
+    counts = [(current, total) for key, current, total in recorder.events if key == 'status_streaming']
+    assert counts and all(current <= total for current, total in counts)
+    walked = [sum(len(names) for _, _, names in os.walk(folder[0])) for folder in folders]
+    finals = [(current, total) for current, total in counts if current == total]
+    assert {walked[0], walked[1]} <= {total for _, total in finals}
+
+
+def test_task_stream_applies_back_pressure(monkeypatch):
+    monkeypatch.setattr(logic, "STREAM_QUEUE_SIZE", 16)
+    stream = TaskStream(iter([(f"/photos/{n}.jpg",) for n in range(300)]), lambda rec: rec, lambda: False)
+    stream.start()
+    time.sleep(0.3)
+    # The walker waits for the consumer: one task in hand beyond the full queue
+    assert stream.discovered <= 16 + 1
+
+    taken = []
+    while not stream.finished():
+        chunk = stream.take(64, block=True)
+        assert len(chunk) <= 64
+        taken.extend(chunk)
+    assert taken == [(f"/photos/{n}.jpg",) for n in range(300)]
+    assert stream.discovered == 300
@@ -0,0 +1,67 @@
+import os
+import threading
+
+from PIL import Image
+
+import thumbnails
+from thumbnails import ThumbnailService
+
+# Copyright (c) 2025 Photo Comparator. All rights reserved.
+# Licensed under the MIT License. See LICENSE file in the project root for full license information.
+
+
+def fetch(service, path):
+    """request() and wait for its callback: (callback thread, image)."""
+    done = threading.Event()
+    result = []
+
+    def callback(p, img):
+        assert p == path
+        result.extend((threading.current_thread(), img))
+        done.set()
+
+    service.request(path, callback)
+    assert done.wait(10)
+    return result
+
+
+def test_callers_never_stat_and_changed_files_are_decoded_again(tmp_path, monkeypatch):
+    path = str(tmp_path / "photo.jpg")
+    Image.new("RGB", (800, 600), "red").save(path)
+    service = ThumbnailService(size=(100, 100))
+
+    stat_threads = []
+    real_stat = os.stat
+
+    def recording_stat(p, *args, **kwargs):
+        if p == path:
+            stat_threads.append(threading.current_thread())
+        return real_stat(p, *args, **kwargs)
+
+    monkeypatch.setattr(thumbnails.os, "stat", recording_stat)
+
+    assert service.get(path) is None
+    service.prefetch([path])
+    thread, img = fetch(service, path)
+    assert thread is not threading.current_thread() and img.size == (100, 75)
+    assert service.get(path) is img
+    assert stat_threads and threading.current_thread() not in stat_threads
+
+    # Changed file: the worker notices, get() keeps the old one until then
+    Image.new("RGB", (600, 800), "blue").save(path)
+    os.utime(path, ns=(0, 0))
+    stat_threads.clear()
+    _, img = fetch(service, path)
+    assert img.size == (75, 100) and service.get(path) is img
+    assert threading.current_thread() not in stat_threads
+
+
+def test_missing_and_broken_files_call_back_with_none(tmp_path):
+    broken = tmp_path / "broken.jpg"
+    broken.write_bytes(b"not an image")
+    service = ThumbnailService(size=(100, 100))
+
+    assert fetch(service, str(tmp_path / "missing.jpg"))[1] is None
+    assert fetch(service, str(broken))[1] is None
+    assert service.get(str(broken)) is None
+    assert service.stats()['failures'] == 2 and service.stats()['items'] == 0
@@ -0,0 +1,194 @@
+import hashlib
+import itertools
+import os
+import queue
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+# Copyright (c) 2025 Photo Comparator. All rights reserved.
+# Licensed under the MIT License. See LICENSE file in the project root for full license information.
+
+THUMB_SIZE = (380, 400)            # Bounding box of the preview images
+THUMB_MEMORY_BYTES = 64 * 1024 * 1024
+THUMB_WORKERS = 2
+
+# Queue priorities: an explicit request always goes before queued prefetches
+PRIORITY_REQUEST = 0
+PRIORITY_PREFETCH = 1
+
+
+class ThumbnailService:
+    """
+    Decodes preview thumbnails off the UI thread.
+
+    - Memory: LRU of PIL images bounded by decoded size (max_bytes).
+    - Disk (optional): cache_dir holds PNG thumbnails named after
+      (path, size, mtime), so a changed file is simply a miss.
+    - Workers: daemon threads serving a priority queue. request() jumps ahead
+      of prefetch(); every prefetch() call supersedes the previous one, so
+      thumbnails for rows the user already scrolled past are not decoded.
+      Only the workers stat the files: get(), request() and prefetch() never
+      touch the disk, so they do not stall the UI on a slow share.
+
+    Callbacks run on a worker thread as callback(path, image_or_None); Tk
+    callers must hand the result to the main thread (see App.call_on_ui).
+    """
+
+    def __init__(self, size=THUMB_SIZE, max_bytes=THUMB_MEMORY_BYTES, cache_dir=None, workers=THUMB_WORKERS):
+        self.size = tuple(size)
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0  # Files that could not be stat'ed or decoded
+
+        self._lock = threading.Lock()
+        self._images = OrderedDict()   # key -> PIL image, most recently used last
+        self._keys = {}                # path -> key of its cached image, as a worker last saw the file
+        self._bytes = 0
+        self._pending = {}             # path -> callbacks waiting for the decode
+        self._generation = 0           # bumped by prefetch(); older prefetches are dropped
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()  # FIFO order within one priority
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        for _ in range(max(1, workers)):
+            threading.Thread(target=self._worker, daemon=True).start()
+
+    def _key(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (path, st.st_size, st.st_mtime_ns)
+
+    def get(self, path):
+        """
+        Cached thumbnail or None; never decodes nor stats. The file is taken as
+        a worker last saw it, request() checks it again.
+        """
+        with self._lock:
+            return self._cached(self._keys.get(path))
+
+    def request(self, path, callback):
+        """Thumbnail for path, checked and decoded (if not cached) in the background."""
+        self._submit(path, callback, PRIORITY_REQUEST, None)
+
+    def prefetch(self, paths):
+        """Warm the cache for paths (e.g. neighbouring result rows), replacing earlier prefetches."""
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+        for path in paths:
+            self._submit(path, None, PRIORITY_PREFETCH, generation)
+
+    def _submit(self, path, callback, priority, generation):
+        with self._lock:
+            if path in self._pending:
+                # Already queued (maybe as a prefetch): just wait for it, and make
+                # sure an explicit request is not dropped as a stale prefetch
+                if callback:
+                    self._pending[path].append(callback)
+                if priority == PRIORITY_REQUEST:
+                    self._queue.put((priority, next(self._seq), path, None))
+                return
+            self._pending[path] = [callback] if callback else []
+            self._queue.put((priority, next(self._seq), path, generation))
+
+    def _cached(self, key):
+        """LRU lookup (lock held), counting hits."""
+        img = self._images.get(key) if key else None
+        if img is not None:
+            self._images.move_to_end(key)
+            self.hits += 1
+        return img
+
+    def _worker(self):
+        while True:
+            _, _, path, generation = self._queue.get()
+            with self._lock:
+                if path not in self._pending:
+                    continue  # Served by an earlier queue entry
+                if generation is not None and generation != self._generation and not self._pending[path]:
+                    del self._pending[path]  # Stale prefetch nobody waits for
+                    continue
+
+            key = self._key(path)
+            with self._lock:
+                img = self._cached(key)
+            if img is None and key is not None:
+                img = self._load(key)
+
+            with self._lock:
+                callbacks = self._pending.pop(path, [])
+                if key is None or img is None:
+                    self.failures += 1
+                elif key not in self._images:
+                    self.misses += 1
+                    self._store(key, img)
+                if img is not None:
+                    self._keys[path] = key
+            for callback in callbacks:
+                try:
+                    callback(path, img)
+                except Exception:
+                    pass  # e.g. the preview window was closed meanwhile
+
+    def _store(self, key, img):
+        """Insert into the LRU (lock held) and evict down to max_bytes."""
+        if key in self._images:
+            return
+        self._images[key] = img
+        self._bytes += _image_bytes(img)
+        while self._bytes > self.max_bytes and len(self._images) > 1:
+            old_key, old = self._images.popitem(last=False)
+            self._bytes -= _image_bytes(old)
+            if self._keys.get(old_key[0]) == old_key:
+                del self._keys[old_key[0]]
+
+    def _disk_path(self, key):
+        name = hashlib.sha1(f"{key[0]}|{key[1]}|{key[2]}|{self.size}".encode("utf-8", "surrogatepass")).hexdigest()
+        return os.path.join(self.cache_dir, name[:2], name + ".png")
+
+    def _load(self, key):
+        disk_path = self._disk_path(key) if self.cache_dir else None
+        if disk_path and os.path.exists(disk_path):
+            try:
+                with Image.open(disk_path) as img:
+                    img.load()
+                    return img.copy()
+            except Exception:
+                pass  # Corrupt cache file: decode the original again
+
+        try:
+            with Image.open(key[0]) as img:
+                # thumbnail() uses draft() / reduce() so big JPEGs and TIFFs are not fully decoded
+                img.thumbnail(self.size)
+                if img.mode not in ("RGB", "RGBA", "L"):
+                    img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+                else:
+                    img = img.copy()
+        except Exception:
+            return None  # Unreadable image: counted in stats(), the caller shows no preview
+
+        if disk_path:
+            try:
+                os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+                tmp = disk_path + f".{os.getpid()}.{threading.get_ident()}.tmp"
+                img.save(tmp, format="PNG")
+                os.replace(tmp, disk_path)
+            except Exception:
+                pass  # The disk cache is only an optimisation
+        return img
+
+    def stats(self):
+        with self._lock:
+            return {'items': len(self._images), 'bytes': self._bytes, 'hits': self.hits, 'misses': self.misses,
+                    'failures': self.failures}
+
+
+def _image_bytes(img):
+    return img.width * img.height * len(img.getbands())